@@ -0,0 +1,122 @@
+"""Benchmarks `KerasClassifier._post_process_y` against the implementation
+it replaced, which copied the outputs of the model and stacked temporaries.
+
+Usage:
+    python benchmarks/bench_post_process_y.py [n_samples]
+"""
+import copy
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+import numpy as np
+
+from sklearn_keras_wrap.wrappers import KerasClassifier
+
+
+def reference_post_process_y(self, y):
+    """The previous implementation of `KerasClassifier._post_process_y`."""
+    if not isinstance(y, list):
+        y = [y]
+    if self.n_outputs_ == 1:
+        cls_ = [self.classes_]
+    else:
+        cls_ = self.classes_
+    y = copy.deepcopy(y)
+    cls_type_ = self.cls_type_
+    class_predictions = []
+    for i, (y_, classes_) in enumerate(zip(y, cls_)):
+        if cls_type_ == "binary":
+            if y_.shape[1] == 1:
+                class_predictions.append(classes_[np.where(y_ > 0.5, 1, 0)])
+                y[i] = np.concatenate([1 - y_, y_], axis=1)
+            else:
+                class_predictions.append(
+                    classes_[np.argmax(np.where(y_ > 0.5, 1, 0), axis=1)]
+                )
+        elif cls_type_ in ("multiclass", "multiclass-multioutput"):
+            class_predictions.append(classes_[np.argmax(y_, axis=1)])
+        elif cls_type_ == "multilabel-indicator":
+            class_predictions.append(np.where(y_ > 0.5, 1, 0))
+    class_probabilities = np.squeeze(np.column_stack(y))
+    y = np.squeeze(np.column_stack(class_predictions))
+    return y, {"class_probabilities": class_probabilities}
+
+
+def make_case(cls_type, n_samples, rng):
+    """Returns a fitted-like estimator and model outputs for `cls_type`."""
+    if cls_type == "binary":
+        outputs = rng.random_sample((n_samples, 1)).astype("float32")
+        est = SimpleNamespace(
+            n_outputs_=1, classes_=np.array(["no", "yes"]), cls_type_=cls_type
+        )
+    elif cls_type == "multiclass":
+        outputs = rng.random_sample((n_samples, 10)).astype("float32")
+        est = SimpleNamespace(
+            n_outputs_=1, classes_=np.arange(10), cls_type_=cls_type
+        )
+    elif cls_type == "multilabel-indicator":
+        outputs = rng.random_sample((n_samples, 5)).astype("float32")
+        est = SimpleNamespace(
+            n_outputs_=1, classes_=np.arange(5), cls_type_=cls_type
+        )
+    else:
+        outputs = [
+            rng.random_sample((n_samples, 4)).astype("float32")
+            for _ in range(3)
+        ]
+        est = SimpleNamespace(
+            n_outputs_=3, classes_=[np.arange(4)] * 3, cls_type_=cls_type
+        )
+    return est, outputs
+
+
+def measure(fn, est, outputs):
+    """Returns the wall time and the peak of traced memory of one call."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(est, outputs)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main(n_samples=1000000):
+    rng = np.random.RandomState(0)
+    print(
+        "%-24s %12s %12s %12s %12s"
+        % ("task", "old time", "new time", "old peak", "new peak")
+    )
+    for cls_type in (
+        "binary",
+        "multiclass",
+        "multilabel-indicator",
+        "multiclass-multioutput",
+    ):
+        est, outputs = make_case(cls_type, n_samples, rng)
+        old, old_time, old_peak = measure(
+            reference_post_process_y, est, outputs
+        )
+        new, new_time, new_peak = measure(
+            KerasClassifier._post_process_y, est, outputs
+        )
+        np.testing.assert_array_equal(old[0], new[0])
+        np.testing.assert_array_equal(
+            old[1]["class_probabilities"], new[1]["class_probabilities"]
+        )
+        print(
+            "%-24s %11.3fs %11.3fs %10.1fMB %10.1fMB"
+            % (
+                cls_type,
+                old_time,
+                new_time,
+                old_peak / 2 ** 20,
+                new_peak / 2 ** 20,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
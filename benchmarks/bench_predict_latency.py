@@ -0,0 +1,59 @@
+"""Benchmarks the latency of `predict` on small batches, with the fast path
+(a traced function of the model) and with `model_.predict`.
+
+Usage:
+    python benchmarks/bench_predict_latency.py [n_repeats]
+"""
+import sys
+import timeit
+
+import numpy as np
+from tensorflow.python.keras.layers import Dense
+from tensorflow.python.keras.models import Sequential
+
+from sklearn_keras_wrap.wrappers import KerasClassifier
+
+N_FEATURES = 20
+N_CLASSES = 5
+BATCH_SIZES = (1, 8, 64)
+
+
+def build_fn(X, n_classes_):
+    model = Sequential(
+        [
+            Dense(64, activation="relu", input_shape=X.shape[1:]),
+            Dense(64, activation="relu"),
+            Dense(n_classes_, activation="softmax"),
+        ]
+    )
+    model.compile("adam", loss="categorical_crossentropy")
+    return model
+
+
+def median_latency(clf, X, n_repeats):
+    """Returns the median latency of `clf.predict(X)` in milliseconds."""
+    clf.predict(X)  # warm up, traces the fast path
+    times = timeit.repeat(lambda: clf.predict(X), number=1, repeat=n_repeats)
+    return 1000 * np.median(times)
+
+
+def main(n_repeats=200):
+    rng = np.random.RandomState(0)
+    X = rng.random_sample((1000, N_FEATURES)).astype("float32")
+    y = rng.randint(N_CLASSES, size=1000)
+    clf = KerasClassifier(build_fn=build_fn, epochs=1, verbose=0).fit(X, y)
+    print("%-12s %14s %14s %8s" % ("batch size", "predict", "fast path", ""))
+    for batch_size in BATCH_SIZES:
+        batch = X[:batch_size]
+        clf.fast_predict_max_samples = 0
+        slow = median_latency(clf, batch, n_repeats)
+        clf.fast_predict_max_samples = max(BATCH_SIZES)
+        fast = median_latency(clf, batch, n_repeats)
+        print(
+            "%-12d %12.3fms %12.3fms %7.1fx"
+            % (batch_size, slow, fast, slow / fast)
+        )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,81 @@
+"""Benchmarks the throughput of `serving.ReplicaPool` with an increasing
+number of concurrent requests, against calling `predict` from a single
+thread.
+
+TensorFlow is limited to a single thread per operation, so that the scaling
+comes from the concurrent requests alone. Requests can only run in parallel
+on several cores: on a single core, the pool is at best as fast as
+`predict`.
+
+Usage:
+    python benchmarks/bench_replica_pool.py [n_requests] [batch_size]
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from tensorflow.python.framework import config
+from tensorflow.python.keras.layers import Dense
+from tensorflow.python.keras.models import Sequential
+
+from sklearn_keras_wrap.serving import ReplicaPool
+from sklearn_keras_wrap.wrappers import KerasClassifier
+
+N_FEATURES = 100
+N_CLASSES = 10
+
+
+def build_fn(X, n_classes_):
+    model = Sequential(
+        [
+            Dense(512, activation="relu", input_shape=X.shape[1:]),
+            Dense(512, activation="relu"),
+            Dense(n_classes_, activation="softmax"),
+        ]
+    )
+    model.compile("adam", loss="categorical_crossentropy")
+    return model
+
+
+def throughput(predict, requests, n_threads):
+    """Returns the number of requests per second served by `n_threads`."""
+    predict(requests[0])  # warm up
+    start = time.perf_counter()
+    with ThreadPoolExecutor(n_threads) as executor:
+        list(executor.map(predict, requests))
+    return len(requests) / (time.perf_counter() - start)
+
+
+def main(n_requests=2000, batch_size=16):
+    config.set_intra_op_parallelism_threads(1)
+    rng = np.random.RandomState(0)
+    X = rng.random_sample((1000, N_FEATURES)).astype("float32")
+    y = rng.randint(N_CLASSES, size=1000)
+    clf = KerasClassifier(build_fn=build_fn, epochs=1, verbose=0).fit(X, y)
+    requests = [
+        X[rng.randint(1000 - batch_size) :][:batch_size]
+        for _ in range(n_requests)
+    ]
+    base = throughput(clf.predict, requests, 1)
+    print(
+        "%d cpus, %d requests of %d samples"
+        % (os.cpu_count(), n_requests, batch_size)
+    )
+    print("%-24s %10.0f req/s" % ("predict, 1 thread", base))
+    if (os.cpu_count() or 1) == 1:
+        print("single cpu: requests can not run in parallel")
+    n_replicas = 1
+    while n_replicas <= (os.cpu_count() or 1):
+        with ReplicaPool(clf, n_replicas=n_replicas) as pool:
+            rate = throughput(pool.predict, requests, n_replicas)
+        print(
+            "%-24s %10.0f req/s %6.2fx"
+            % ("pool, %d replicas" % n_replicas, rate, rate / base)
+        )
+        n_replicas *= 2
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,245 @@
+"""Benchmarks the hot paths of `KerasClassifier` and `KerasRegressor`.
+
+Records the wall time (median over repeats) and the peak of traced memory of
+`fit`, `predict`, `predict_proba`, `score`, `get_params`, `set_params`,
+`sklearn.clone`, pickling and unpickling, for several data sizes and target
+types. `fit`, `predict`, `predict_proba` and `score` are also timed on the
+plain Keras model (building it, `fit`, `predict` and `evaluate`) to show the
+overhead of the wrapper itself.
+
+Peak memory is measured with `tracemalloc`, which sees numpy and Python
+allocations but not the buffers allocated by TensorFlow.
+
+Usage:
+    python benchmarks/bench_wrappers.py [--sizes 1000 10000]
+        [--targets binary ...] [--repeat 3] [--save-baseline FILE]
+        [--baseline FILE] [--tolerance 0.2]
+
+With `--baseline`, each measure is compared to the stored one and the script
+exits with status 1 if any of them is more than `tolerance` slower (or
+larger) than the baseline.
+"""
+import argparse
+import json
+import pickle
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from sklearn.base import clone
+from tensorflow.python.keras.layers import Dense, Input
+from tensorflow.python.keras.models import Model
+
+from sklearn_keras_wrap.wrappers import KerasClassifier, KerasRegressor
+
+N_FEATURES = 20
+EPOCHS = 1
+BATCH_SIZE = 128
+
+
+def build_classifier(X, cls_type_, n_classes_, n_outputs_keras_):
+    inp = Input(shape=X.shape[1:])
+    hidden = Dense(64, activation="relu")(inp)
+    if cls_type_ == "binary":
+        loss = "binary_crossentropy"
+        out = [Dense(1, activation="sigmoid")(hidden)]
+    elif cls_type_ == "multilabel-indicator":
+        loss = "binary_crossentropy"
+        out = [
+            Dense(1, activation="sigmoid")(hidden)
+            for _ in range(n_outputs_keras_)
+        ]
+    elif cls_type_ == "multiclass-multioutput":
+        loss = "sparse_categorical_crossentropy"
+        out = [Dense(n, activation="softmax")(hidden) for n in n_classes_]
+    else:
+        loss = "categorical_crossentropy"
+        out = [Dense(n_classes_, activation="softmax")(hidden)]
+    model = Model([inp], out)
+    model.compile("adam", loss=loss)
+    return model
+
+
+def build_regressor(X, n_outputs_):
+    inp = Input(shape=X.shape[1:])
+    hidden = Dense(64, activation="relu")(inp)
+    model = Model([inp], [Dense(n_outputs_)(hidden)])
+    model.compile("adam", loss="mean_squared_error")
+    return model
+
+
+def make_target(target, n_samples, rng):
+    """Returns the estimator class, build function and `y` of a case."""
+    if target == "binary":
+        y = rng.choice(["no", "yes"], size=n_samples)
+    elif target == "multiclass":
+        y = rng.randint(10, size=n_samples)
+    elif target == "multilabel-indicator":
+        y = rng.randint(2, size=(n_samples, 5))
+    elif target == "multiclass-multioutput":
+        y = rng.randint(4, size=(n_samples, 3))
+    elif target == "regression":
+        return KerasRegressor, build_regressor, rng.random_sample(n_samples)
+    else:  # multi-output regression
+        y = rng.random_sample((n_samples, 3))
+        return KerasRegressor, build_regressor, y
+    return KerasClassifier, build_classifier, y
+
+
+TARGETS = (
+    "binary",
+    "multiclass",
+    "multilabel-indicator",
+    "multiclass-multioutput",
+    "regression",
+    "multioutput-regression",
+)
+
+
+def measure(fn, repeat):
+    """Returns the median wall time and the largest peak of traced memory of
+    `repeat` calls to `fn`.
+    """
+    times, peaks = [], []
+    for _ in range(repeat):
+        tracemalloc.start()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return float(np.median(times)), max(peaks)
+
+
+def keras_model_and_target(est, build_fn, X, y):
+    """Returns a new Keras model built like the one of the fitted `est`, and
+    `y` encoded for Keras.
+    """
+    y_keras, _ = est._pre_process_y(y)
+    y_keras = est._check_output_model_compatibility(y_keras)
+    build_args = est._filter_params(build_fn)
+    build_args = {**build_args, **est._filter_params(build_fn, {"X": X})}
+    return lambda: build_fn(**build_args), y_keras
+
+
+def bench_case(target, n_samples, repeat, rng):
+    """Returns `{operation: (time, peak, keras_time)}` for a case."""
+    X = rng.random_sample((n_samples, N_FEATURES)).astype("float32")
+    estimator_cls, build_fn, y = make_target(target, n_samples, rng)
+    est = estimator_cls(
+        build_fn=build_fn, epochs=EPOCHS, batch_size=BATCH_SIZE, verbose=0
+    )
+    est.fit(X, y)
+    build, y_keras = keras_model_and_target(est, build_fn, X, y)
+    model = build()
+    model.fit(X, y_keras, epochs=EPOCHS, batch_size=BATCH_SIZE, verbose=0)
+    pickled = pickle.dumps(est)
+
+    def keras_fit():
+        build().fit(
+            X, y_keras, epochs=EPOCHS, batch_size=BATCH_SIZE, verbose=0
+        )
+
+    operations = [
+        ("fit", lambda: est.fit(X, y), keras_fit),
+        ("predict", lambda: est.predict(X), lambda: model.predict(X)),
+        (
+            "score",
+            lambda: est.score(X, y),
+            lambda: model.evaluate(X, y_keras, verbose=0),
+        ),
+        ("get_params", lambda: est.get_params(), None),
+        ("set_params", lambda: est.set_params(epochs=EPOCHS), None),
+        ("clone", lambda: clone(est), None),
+        ("pickle", lambda: pickle.dumps(est), None),
+        ("unpickle", lambda: pickle.loads(pickled), None),
+    ]
+    if estimator_cls is KerasClassifier:
+        operations.insert(
+            2,
+            (
+                "predict_proba",
+                lambda: est.predict_proba(X),
+                lambda: model.predict(X),
+            ),
+        )
+    results = dict()
+    for name, fn, keras_fn in operations:
+        elapsed, peak = measure(fn, repeat)
+        keras_time = measure(keras_fn, repeat)[0] if keras_fn else None
+        results[name] = (elapsed, peak, keras_time)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Returns the `(case, operation, measure, ratio)` of the measures more
+    than `tolerance` above `baseline`.
+    """
+    regressions = []
+    for case, operations in results.items():
+        for name, (elapsed, peak, _) in operations.items():
+            try:
+                old_time, old_peak, _ = baseline[case][name]
+            except KeyError:
+                continue
+            for measure_name, new, old in (
+                ("time", elapsed, old_time),
+                ("peak", peak, old_peak),
+            ):
+                if old and new > old * (1 + tolerance):
+                    regressions.append((case, name, measure_name, new / old))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--targets", nargs="+", default=list(TARGETS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save-baseline", metavar="FILE")
+    parser.add_argument("--baseline", metavar="FILE")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    rng = np.random.RandomState(0)
+    results = dict()
+    print(
+        "%-34s %-14s %11s %11s %11s %11s"
+        % ("case", "operation", "time", "peak", "keras", "overhead")
+    )
+    for n_samples in args.sizes:
+        for target in args.targets:
+            case = "%s-%d" % (target, n_samples)
+            results[case] = bench_case(target, n_samples, args.repeat, rng)
+            for name, (elapsed, peak, keras_time) in results[case].items():
+                if keras_time is None:
+                    keras, overhead = "-", "-"
+                else:
+                    keras = "%.4fs" % keras_time
+                    overhead = "%+.4fs" % (elapsed - keras_time)
+                print(
+                    "%-34s %-14s %10.4fs %9.2fMB %11s %11s"
+                    % (case, name, elapsed, peak / 2 ** 20, keras, overhead)
+                )
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for case, name, measure_name, ratio in regressions:
+            print(
+                "REGRESSION %s %s %s: %.2fx the baseline"
+                % (case, name, measure_name, ratio)
+            )
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,471 @@
+"""Hyperparameter search tuned for wrappers of TensorFlow models.
+"""
+import multiprocessing
+import os
+import tempfile
+import time
+import warnings
+from collections import defaultdict
+
+import numpy as np
+from scipy.stats import rankdata
+from sklearn.base import BaseEstimator, MetaEstimatorMixin, clone
+from sklearn.base import is_classifier
+from sklearn.exceptions import FitFailedWarning
+from sklearn.metrics import check_scoring
+from sklearn.model_selection import ParameterGrid, check_cv
+from sklearn.utils.validation import check_array, indexable
+from tensorflow.python.framework import config
+
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:  # Python < 3.8, fall back to memory-mapped files
+    resource_tracker = shared_memory = None
+
+
+# arrays shared with the workers of SharedMemorySearchCV, by name
+_SHARED_ARRAYS = dict()
+
+# shared memory blocks attached by a worker, kept open for its lifetime
+_ATTACHED = []
+
+
+def _share_array(array, tmp_dir):
+    """Copies `array` to memory that can be attached by other processes.
+
+    Arguments:
+        array : numpy array.
+        tmp_dir : directory for memory-mapped files, used when
+            `multiprocessing.shared_memory` is not available.
+
+    Returns:
+        spec : picklable description of the shared array, see `_attach_array`.
+        handle : `SharedMemory` block to release once the workers are done,
+            or None.
+    """
+    if array.dtype.hasobject:
+        # objects can not be shared, each worker gets a copy
+        return ("array", array), None
+    if shared_memory is not None:
+        shm = shared_memory.SharedMemory(
+            create=True, size=max(array.nbytes, 1)
+        )
+        shared = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+        shared[...] = array
+        return ("shm", shm.name, array.shape, array.dtype.str), shm
+    path = os.path.join(tmp_dir, "%d.npy" % len(os.listdir(tmp_dir)))
+    np.save(path, array)
+    return ("memmap", path), None
+
+
+def _attach_array(spec):
+    """Returns a numpy array for a `spec` created by `_share_array`, without
+    copying it.
+    """
+    kind = spec[0]
+    if kind == "array":
+        return spec[1]
+    if kind == "memmap":
+        return np.load(spec[1], mmap_mode="r")
+    _, name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    if os.name == "posix":
+        # the parent process owns the block, do not let this worker unlink
+        # it. POSIX blocks are tracked by their name with a leading "/",
+        # which `SharedMemory.name` strips
+        resource_tracker.unregister("/" + shm.name, "shared_memory")
+    _ATTACHED.append(shm)
+    array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    array.flags.writeable = False
+    return array
+
+
+def _take_rows(array, rows):
+    """Returns the `rows` of `array`, as a view if they are contiguous.
+
+    Arbitrary rows can only be gathered into a copy, so a fit on a fold of
+    shuffled or stratified splits still copies its samples; contiguous
+    folds, like the test folds of an unshuffled `KFold`, do not.
+    """
+    rows = np.asarray(rows)
+    if rows.dtype == bool:
+        rows = np.flatnonzero(rows)
+    if len(rows) and np.all(np.diff(rows) == 1):
+        return array[rows[0] : rows[-1] + 1]
+    return array[rows]
+
+
+def _init_worker(specs, intra_op_threads, inter_op_threads):
+    """Initializes a worker of `SharedMemorySearchCV`: pins the TensorFlow
+    thread pools and attaches the shared training data.
+    """
+    if intra_op_threads:
+        config.set_intra_op_parallelism_threads(intra_op_threads)
+    if inter_op_threads:
+        config.set_inter_op_parallelism_threads(inter_op_threads)
+    for name, spec in specs.items():
+        _SHARED_ARRAYS[name] = _attach_array(spec)
+
+
+def _fit_and_score(
+    estimator,
+    parameters,
+    train,
+    test,
+    scorers,
+    fit_params,
+    return_train_score,
+    error_score,
+):
+    """Fits a clone of `estimator` with `parameters` on the `train` samples
+    of the shared data and scores it on the `test` samples.
+
+    Returns:
+        result : dict with the `test_scores` (and `train_scores`) per scorer,
+            the `fit_time` and `score_time` in seconds.
+    """
+    X, y = _SHARED_ARRAYS["X"], _SHARED_ARRAYS.get("y")
+    X_train, X_test = _take_rows(X, train), _take_rows(X, test)
+    y_train = y_test = None
+    if y is not None:
+        y_train, y_test = _take_rows(y, train), _take_rows(y, test)
+    # per-sample fit parameters, like `sample_weight`, follow the split
+    fit_params = {
+        key: np.asarray(val)[train]
+        if hasattr(val, "__len__") and len(val) == len(X)
+        else val
+        for key, val in fit_params.items()
+    }
+    estimator = clone(estimator).set_params(**parameters)
+
+    result = dict()
+    start = time.time()
+    try:
+        estimator.fit(X_train, y_train, **fit_params)
+    except Exception as e:
+        if error_score == "raise":
+            raise
+        result["fit_time"] = time.time() - start
+        result["score_time"] = 0.0
+        result["test_scores"] = {name: error_score for name in scorers}
+        if return_train_score:
+            result["train_scores"] = {name: error_score for name in scorers}
+        warnings.warn(
+            "Estimator fit failed. The score on this train-test partition "
+            "for these parameters will be set to %f. Details: \n%r"
+            % (error_score, e),
+            FitFailedWarning,
+        )
+        return result
+    result["fit_time"] = time.time() - start
+
+    start = time.time()
+    result["test_scores"] = {
+        name: scorer(estimator, X_test, y_test)
+        for name, scorer in scorers.items()
+    }
+    result["score_time"] = time.time() - start
+    if return_train_score:
+        result["train_scores"] = {
+            name: scorer(estimator, X_train, y_train)
+            for name, scorer in scorers.items()
+        }
+    return result
+
+
+class SharedMemorySearchCV(MetaEstimatorMixin, BaseEstimator):
+    """Exhaustive search over a parameter grid, for wrappers of TensorFlow
+    models, with the cross validation fits run in a process pool.
+
+    Unlike `GridSearchCV(n_jobs=k)`, the training data is copied once into
+    shared memory, which all workers attach to instead of receiving their own
+    copy. Folds of contiguous samples are views of the shared data, other
+    folds are gathered into a copy for the duration of a single fit. The
+    TensorFlow thread pools of each worker are sized so that the workers
+    together do not oversubscribe the machine. Workers are
+    started with the "spawn" method since TensorFlow is not fork-safe, so the
+    estimator (including its `build_fn`) must be importable by the workers.
+
+    The attributes set by `fit` are those of `GridSearchCV`, with the same
+    `cv_results_` layout.
+
+    Arguments:
+        estimator : wrapper instance (or any scikit-learn estimator).
+        param_grid : dict or list of dicts
+            parameter names mapped to lists of values to try, see
+            `sklearn.model_selection.ParameterGrid`.
+        scoring : str, callable, list or dict, default=None
+            scorer(s) used to evaluate the candidates, see `GridSearchCV`.
+            None uses the `score` method of the estimator.
+        n_jobs : int, default=None
+            number of worker processes, `os.cpu_count()` if -1. None or 1
+            runs the fits in the current process.
+        refit : bool or str, default=True
+            refit the best candidate on the whole data. With multiple
+            scorers, the name of the scorer used to select the best candidate.
+        cv : int, cross-validation generator or iterable, default=None
+            determines the splits, see `sklearn.model_selection.check_cv`.
+        intra_op_threads : int, default=None
+            threads used by each TensorFlow operation in a worker. None
+            divides the CPUs of the machine between the workers.
+        inter_op_threads : int, default=None
+            threads used to run independent TensorFlow operations in a
+            worker. None uses 1 thread per worker.
+        error_score : "raise" or numeric, default=np.nan
+            score of the fits that fail, or "raise" to raise the error.
+        return_train_score : bool, default=False
+            whether to also score the candidates on their training data.
+    """
+
+    def __init__(
+        self,
+        estimator,
+        param_grid,
+        scoring=None,
+        n_jobs=None,
+        refit=True,
+        cv=None,
+        intra_op_threads=None,
+        inter_op_threads=None,
+        error_score=np.nan,
+        return_train_score=False,
+    ):
+        self.estimator = estimator
+        self.param_grid = param_grid
+        self.scoring = scoring
+        self.n_jobs = n_jobs
+        self.refit = refit
+        self.cv = cv
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.error_score = error_score
+        self.return_train_score = return_train_score
+
+    def _get_scorers(self):
+        """Returns a dictionary of scorers and whether scoring is multimetric.
+        """
+        if self.scoring is None or isinstance(self.scoring, str):
+            return (
+                {"score": check_scoring(self.estimator, self.scoring)},
+                False,
+            )
+        if callable(self.scoring):
+            return {"score": self.scoring}, False
+        if isinstance(self.scoring, dict):
+            scoring = self.scoring
+        else:
+            scoring = {name: name for name in self.scoring}
+        return (
+            {
+                name: check_scoring(self.estimator, scorer)
+                for name, scorer in scoring.items()
+            },
+            True,
+        )
+
+    def _n_workers(self):
+        if self.n_jobs is None or self.n_jobs == 1:
+            return 1
+        if self.n_jobs < 0:
+            return max((os.cpu_count() or 1) + 1 + self.n_jobs, 1)
+        return self.n_jobs
+
+    def fit(self, X, y=None, groups=None, **fit_params):
+        """Runs the fits of all the candidates and splits.
+
+        Arguments:
+            X : array-like, shape `(n_samples, n_features)`
+                Training samples.
+            y : array-like, shape `(n_samples,)` or `(n_samples, n_outputs)`
+                Target values.
+            groups : array-like, shape `(n_samples,)`, default=None
+                Group labels used by group-aware splitters.
+            **fit_params : dictionary arguments
+                passed to the `fit` method of the estimator.
+
+        Returns:
+            self : object
+        """
+        scorers, multimetric = self._get_scorers()
+        if multimetric and self.refit is not False:
+            if not isinstance(self.refit, str) or self.refit not in scorers:
+                raise ValueError(
+                    "For multi-metric scoring, `refit` must be the name of "
+                    "the scorer used to find the best parameters, got %r"
+                    % (self.refit,)
+                )
+        X, y, groups = indexable(X, y, groups)
+        # the wrapper validates the features, only densify and stack them
+        X = check_array(
+            X,
+            accept_sparse=False,
+            dtype=None,
+            force_all_finite=False,
+            allow_nd=True,
+        )
+        y = None if y is None else np.asarray(y)
+        cv = check_cv(self.cv, y, classifier=is_classifier(self.estimator))
+        splits = list(cv.split(X, y, groups))
+        candidates = list(ParameterGrid(self.param_grid))
+        tasks = [
+            (parameters, train, test)
+            for parameters in candidates
+            for train, test in splits
+        ]
+        n_workers = self._n_workers()
+
+        arrays = {"X": X} if y is None else {"X": X, "y": y}
+        if n_workers == 1:
+            results = self._run_local(tasks, arrays, scorers, fit_params)
+        else:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                specs, handles = dict(), []
+                try:
+                    for name, array in arrays.items():
+                        specs[name], handle = _share_array(array, tmp_dir)
+                        if handle is not None:
+                            handles.append(handle)
+                    results = self._run_pool(
+                        tasks, specs, scorers, fit_params, n_workers
+                    )
+                finally:
+                    for handle in handles:
+                        handle.close()
+                        handle.unlink()
+
+        self.multimetric_ = multimetric
+        self.scorer_ = scorers if multimetric else scorers["score"]
+        self.n_splits_ = len(splits)
+        self.cv_results_ = self._format_results(
+            candidates, list(scorers), len(splits), results
+        )
+
+        if self.refit is not False:
+            metric = self.refit if multimetric else "score"
+            self.best_index_ = int(
+                np.argmin(self.cv_results_["rank_test_%s" % metric])
+            )
+            self.best_params_ = candidates[self.best_index_]
+            self.best_score_ = self.cv_results_["mean_test_%s" % metric][
+                self.best_index_
+            ]
+            start = time.time()
+            self.best_estimator_ = clone(self.estimator).set_params(
+                **self.best_params_
+            )
+            if y is None:
+                self.best_estimator_.fit(X, **fit_params)
+            else:
+                self.best_estimator_.fit(X, y, **fit_params)
+            self.refit_time_ = time.time() - start
+        return self
+
+    def _run_local(self, tasks, arrays, scorers, fit_params):
+        """Runs `_fit_and_score` for all tasks in this process."""
+        args = (scorers, fit_params, self.return_train_score, self.error_score)
+        _SHARED_ARRAYS.update(arrays)
+        try:
+            return [
+                _fit_and_score(*((self.estimator,) + task + args))
+                for task in tasks
+            ]
+        finally:
+            _SHARED_ARRAYS.clear()
+
+    def _run_pool(self, tasks, specs, scorers, fit_params, n_workers):
+        """Runs `_fit_and_score` for all tasks in a pool of `n_workers`
+        processes attached to the shared arrays described by `specs`.
+        """
+        args = (scorers, fit_params, self.return_train_score, self.error_score)
+        intra_op_threads = self.intra_op_threads or max(
+            (os.cpu_count() or 1) // n_workers, 1
+        )
+        inter_op_threads = self.inter_op_threads or 1
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(
+            n_workers,
+            initializer=_init_worker,
+            initargs=(specs, intra_op_threads, inter_op_threads),
+        ) as pool:
+            return pool.starmap(
+                _fit_and_score,
+                [(self.estimator,) + task + args for task in tasks],
+                chunksize=1,
+            )
+
+    def _format_results(self, candidates, metrics, n_splits, results):
+        """Formats the results of the fits like `GridSearchCV.cv_results_`."""
+        n_candidates = len(candidates)
+        cv_results = dict()
+
+        def store(key, values, rank=False):
+            values = np.asarray(values, dtype=np.float64).reshape(
+                n_candidates, n_splits
+            )
+            for split in range(n_splits):
+                cv_results["split%d_%s" % (split, key)] = values[:, split]
+            means = values.mean(axis=1)
+            cv_results["mean_%s" % key] = means
+            cv_results["std_%s" % key] = values.std(axis=1)
+            if rank:
+                cv_results["rank_%s" % key] = np.asarray(
+                    rankdata(-means, method="min"), dtype=np.int32
+                )
+
+        def store_times(key, values):
+            values = np.asarray(values, dtype=np.float64).reshape(
+                n_candidates, n_splits
+            )
+            cv_results["mean_%s" % key] = values.mean(axis=1)
+            cv_results["std_%s" % key] = values.std(axis=1)
+
+        store_times("fit_time", [r["fit_time"] for r in results])
+        store_times("score_time", [r["score_time"] for r in results])
+
+        param_results = defaultdict(
+            lambda: np.ma.MaskedArray(
+                np.empty(n_candidates), mask=True, dtype=object
+            )
+        )
+        for i, parameters in enumerate(candidates):
+            for name, value in parameters.items():
+                param_results["param_%s" % name][i] = value
+        cv_results.update(param_results)
+        cv_results["params"] = candidates
+
+        for metric in metrics:
+            store(
+                "test_%s" % metric,
+                [r["test_scores"][metric] for r in results],
+                rank=True,
+            )
+            if self.return_train_score:
+                store(
+                    "train_%s" % metric,
+                    [r["train_scores"][metric] for r in results],
+                )
+        return cv_results
+
+    def _check_refit(self, method):
+        if not hasattr(self, "best_estimator_"):
+            raise AttributeError(
+                "This %s instance was not fit with refit=True, `%s` is not "
+                "available" % (type(self).__name__, method)
+            )
+        return self.best_estimator_
+
+    def predict(self, X):
+        """Calls `predict` on the best estimator."""
+        return self._check_refit("predict").predict(X)
+
+    def predict_proba(self, X):
+        """Calls `predict_proba` on the best estimator."""
+        return self._check_refit("predict_proba").predict_proba(X)
+
+    def score(self, X, y=None):
+        """Scores the best estimator with the scorer used to select it."""
+        estimator = self._check_refit("score")
+        scorer = (
+            self.scorer_[self.refit] if self.multimetric_ else self.scorer_
+        )
+        return scorer(estimator, X, y)
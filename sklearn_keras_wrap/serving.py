@@ -0,0 +1,396 @@
+"""Inference front-ends for serving fitted wrappers.
+"""
+import asyncio
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from sklearn.exceptions import NotFittedError
+from tensorflow.python.util import nest
+
+from .wrappers import (
+    _BUILD_CACHE,
+    _inference_fn,
+    _match_signature,
+    _overrides_predict,
+)
+
+
+# namedtuple returned by AsyncPredictor.stats
+BatchingStats = namedtuple(
+    "BatchingStats",
+    "n_requests n_batches mean_batch_size max_batch_size "
+    "mean_queue_wait max_queue_wait",
+)
+
+# a request waiting in the queue of an AsyncPredictor
+_Request = namedtuple("_Request", "X method future enqueued")
+
+
+class AsyncPredictor:
+    """Coalesces concurrent asyncio prediction requests against a fitted
+    wrapper into batched calls to its Keras model.
+
+    Requests are queued and run together once `max_batch_size` samples are
+    waiting or `max_wait` seconds after the first request of a batch arrived,
+    whichever comes first. The Keras model runs in `executor`, so that the
+    event loop keeps accepting requests while a batch is predicted. The
+    outputs of the model are split back per request and passed through the
+    `_post_process_y` method of the wrapper, so that each request gets the
+    same result as a call to `predict` or `predict_proba` with its own data.
+
+    Arguments:
+        estimator : fitted `KerasClassifier`, `KerasRegressor` or other
+            `BaseWrapper` instance. It must not be refit while requests are
+            being served.
+        max_batch_size : int, default=64
+            maximum number of samples predicted in a single call to the model.
+            Larger requests are predicted on their own.
+        max_wait : float, default=0.005
+            maximum time in seconds the first request of a batch waits for
+            other requests to join it.
+        executor : `concurrent.futures.Executor`, default=None
+            executor used to run the model, the default executor of the event
+            loop is used if None.
+
+    Example:
+        >>> predictor = AsyncPredictor(clf, max_batch_size=32)
+        >>> y = await predictor.predict(X)  # doctest: +SKIP
+    """
+
+    def __init__(
+        self, estimator, max_batch_size=64, max_wait=0.005, executor=None
+    ):
+        self.estimator = estimator
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.executor = executor
+        self._queue = None
+        self._task = None
+        self._carry = None
+        self.reset_stats()
+
+    async def predict(self, X):
+        """Returns predictions for `X`, see `BaseWrapper.predict`.
+
+        Arguments:
+            X: array-like, shape `(n_samples, n_features)`
+
+        Returns:
+            preds: array-like, shape `(n_samples,)`
+                Predictions.
+        """
+        return await self._submit(X, "predict")
+
+    async def predict_proba(self, X):
+        """Returns class probability estimates for `X`, see
+        `KerasClassifier.predict_proba`.
+
+        Arguments:
+            X: array-like, shape `(n_samples, n_features)`
+
+        Returns:
+            proba: array-like, shape `(n_samples, n_outputs)`
+                Class probability estimates.
+        """
+        return await self._submit(X, "predict_proba")
+
+    def stats(self):
+        """Reports batching statistics since creation or `reset_stats`.
+
+        Returns:
+            stats : BatchingStats namedtuple of `(n_requests, n_batches,
+                mean_batch_size, max_batch_size, mean_queue_wait,
+                max_queue_wait)`. Batch sizes are in samples and queue waits,
+                the time between the submission of a request and the start of
+                its batch, in seconds.
+        """
+        return BatchingStats(
+            n_requests=self._n_requests,
+            n_batches=self._n_batches,
+            mean_batch_size=self._n_samples / max(self._n_batches, 1),
+            max_batch_size=self._max_batch_size,
+            mean_queue_wait=self._total_wait / max(self._n_requests, 1),
+            max_queue_wait=self._max_wait,
+        )
+
+    def reset_stats(self):
+        """Resets the statistics reported by `stats`."""
+        self._n_requests = 0
+        self._n_batches = 0
+        self._n_samples = 0
+        self._max_batch_size = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    async def close(self):
+        """Stops the batching task, pending requests are cancelled."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        requests = [self._carry] if self._carry is not None else []
+        while self._queue is not None and not self._queue.empty():
+            requests.append(self._queue.get_nowait())
+        for request in requests:
+            request.future.cancel()
+        self._carry = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _submit(self, X, method):
+        """Validates `X` and queues it, returns the post-processed result."""
+        if not self.estimator.is_fitted_:
+            raise NotFittedError(
+                "Estimator %s needs to be fit before `%s` "
+                "can be called" % (self.estimator, method)
+            )
+        if not hasattr(self.estimator, method):
+            raise AttributeError(
+                "%s does not implement `%s`" % (self.estimator, method)
+            )
+        X = self.estimator._validate_X(X)
+        loop = asyncio.get_event_loop()
+        if self._task is None or self._task.done():
+            # (re)start the batching task in the running event loop
+            self._queue = asyncio.Queue()
+            self._carry = None
+            self._task = loop.create_task(self._run())
+        future = loop.create_future()
+        await self._queue.put(_Request(X, method, future, loop.time()))
+        return await future
+
+    async def _next_batch(self):
+        """Waits for the requests of the next batch."""
+        loop = asyncio.get_event_loop()
+        if self._carry is not None:
+            batch, self._carry = [self._carry], None
+        else:
+            batch = [await self._queue.get()]
+        n_samples = batch[0].X.shape[0]
+        deadline = loop.time() + self.max_wait
+        while n_samples < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                request = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if n_samples + request.X.shape[0] > self.max_batch_size:
+                # does not fit, starts the next batch
+                self._carry = request
+                break
+            batch.append(request)
+            n_samples += request.X.shape[0]
+        return batch
+
+    async def _run(self):
+        """Predicts batches of requests until cancelled."""
+        while True:
+            batch = await self._next_batch()
+            # requests with different shapes can not be stacked, which also
+            # keeps invalid requests from failing the others
+            groups = OrderedDict()
+            for request in batch:
+                if not request.future.cancelled():
+                    groups.setdefault(request.X.shape[1:], []).append(request)
+            for group in groups.values():
+                await self._predict_batch(group)
+
+    async def _predict_batch(self, batch):
+        """Predicts a batch of requests with a single call to the model."""
+        loop = asyncio.get_event_loop()
+        self._record(batch, loop.time())
+        try:
+            outputs = await loop.run_in_executor(
+                self.executor,
+                self.estimator._predict_raw,
+                np.concatenate([r.X for r in batch]),
+            )
+        except Exception as e:
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            return
+        offset = 0
+        for request in batch:
+            rows = slice(offset, offset + request.X.shape[0])
+            offset = rows.stop
+            if request.future.done():
+                continue
+            try:
+                result = self._post_process(
+                    nest.map_structure(lambda o: o[rows], outputs),
+                    request.method,
+                )
+            except Exception as e:
+                request.future.set_exception(e)
+            else:
+                request.future.set_result(result)
+
+    def _post_process(self, outputs, method):
+        """Post-processes the outputs of the model for a single request."""
+        y, extra_args = self.estimator._post_process_y(outputs)
+        if method == "predict_proba":
+            return extra_args["class_probabilities"]
+        return y
+
+    def _record(self, batch, start):
+        """Updates the statistics with a batch starting at `start`."""
+        n_samples = sum(r.X.shape[0] for r in batch)
+        waits = [start - r.enqueued for r in batch]
+        self._n_requests += len(batch)
+        self._n_batches += 1
+        self._n_samples += n_samples
+        self._max_batch_size = max(self._max_batch_size, n_samples)
+        self._total_wait += sum(waits)
+        self._max_wait = max([self._max_wait] + waits)
+
+
+class ReplicaPool:
+    """Thread-safe inference with the model of a fitted wrapper, running at
+    most `n_replicas` requests at once.
+
+    All requests call a single function of `model_`, traced once for the
+    input signature recorded during `fit`, which can be run from several
+    threads at once; a semaphore bounds the number of concurrent requests.
+    Requests do not read the mutable state of the wrapper: the model, its
+    input signature and a shallow copy of the attributes used to validate
+    inputs and post-process outputs (ex: `classes_`) are taken when the pool
+    is created. The model is detached from the build cache of `cache_models`
+    so that refitting the wrapper builds a new model rather than retraining
+    this one, but refitting with `warm_start` keeps training the served
+    model. TensorFlow releases the GIL while running the model, so requests
+    may run concurrently on several cores, but how throughput scales with
+    `n_replicas` depends on the model and the machine, see
+    `benchmarks/bench_replica_pool.py`.
+
+    Requests can be run in the calling threads with `predict` and
+    `predict_proba`, which block while all replicas are busy, or submitted to
+    the pool's own threads with `submit`.
+
+    Arguments:
+        estimator : fitted `KerasClassifier`, `KerasRegressor` or other
+            `BaseWrapper` instance. Create a new pool after refitting it.
+        n_replicas : int, default=None
+            maximum number of concurrent requests, `os.cpu_count()` if
+            None.
+
+    Example:
+        >>> with ReplicaPool(clf, n_replicas=4) as pool:
+        ...     futures = [pool.submit(X) for X in requests]  # doctest: +SKIP
+    """
+
+    def __init__(self, estimator, n_replicas=None):
+        if not estimator.is_fitted_:
+            raise NotFittedError(
+                "Estimator %s needs to be fit before creating a %s"
+                % (estimator, type(self).__name__)
+            )
+        self.estimator = estimator
+        self.n_replicas = n_replicas or os.cpu_count() or 1
+        # refitting the estimator replaces its attributes, but not those of
+        # this copy
+        self._estimator = estimator.__class__.__new__(estimator.__class__)
+        self._estimator.__dict__.update(estimator.__dict__)
+        self._model = estimator.model_
+        _BUILD_CACHE.detach(self._model)
+        self._signature = estimator.__dict__.get("_predict_signature")
+        if _overrides_predict(self._model):
+            self._fn = None  # the model customizes `predict`
+        else:
+            self._fn = _inference_fn(self._model, self._signature)
+        self._slots = threading.BoundedSemaphore(self.n_replicas)
+        self._executor = None
+
+    def predict(self, X):
+        """Returns predictions for `X`, see `BaseWrapper.predict`.
+
+        Arguments:
+            X: array-like, shape `(n_samples, n_features)`
+
+        Returns:
+            preds: array-like, shape `(n_samples,)`
+                Predictions.
+        """
+        y, _ = self._predict(X)
+        return y
+
+    def predict_proba(self, X):
+        """Returns class probability estimates for `X`, see
+        `KerasClassifier.predict_proba`.
+
+        Arguments:
+            X: array-like, shape `(n_samples, n_features)`
+
+        Returns:
+            proba: array-like, shape `(n_samples, n_outputs)`
+                Class probability estimates.
+        """
+        if not hasattr(self.estimator, "predict_proba"):
+            raise AttributeError(
+                "%s does not implement `predict_proba`" % self.estimator
+            )
+        _, extra_args = self._predict(X)
+        return extra_args["class_probabilities"]
+
+    def submit(self, X, method="predict"):
+        """Runs `method` on `X` in one of the threads of the pool.
+
+        Arguments:
+            X: array-like, shape `(n_samples, n_features)`
+            method : str, "predict" or "predict_proba"
+
+        Returns:
+            future : `concurrent.futures.Future` of the result.
+        """
+        if method not in ("predict", "predict_proba"):
+            raise ValueError("Unknown method %r" % method)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.n_replicas)
+        return self._executor.submit(getattr(self, method), X)
+
+    def close(self):
+        """Waits for submitted requests and stops the threads of the pool."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _predict(self, X):
+        """Runs the model on `X`, once a slot is free, and post-processes its
+        outputs.
+        """
+        X = self._estimator._validate_X(X)
+        X, _ = self._estimator._pre_process_X(X)
+        if self._signature is not None:
+            X_matched = _match_signature(X, self._signature)
+            if X_matched is None:
+                raise ValueError(
+                    "X does not match the inputs %s was fit on"
+                    % self.estimator
+                )
+            X = X_matched
+        with self._slots:
+            if self._fn is None:
+                outputs = self._model.predict(X)
+            else:
+                outputs = nest.map_structure(
+                    lambda output: output.numpy(), self._fn(X)
+                )
+        return self._estimator._post_process_y(outputs)
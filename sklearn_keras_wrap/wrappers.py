@@ -1,30 +1,54 @@
 """Wrapper for using the Scikit-Learn API with Keras models.
 """
 import copy
+import copyreg
+import functools
+import hashlib
 import inspect
+import json
+import logging
+import os
+import pickle
+import threading
+import time
 import warnings
-from collections import defaultdict, namedtuple
+import weakref
+from collections import OrderedDict, defaultdict, namedtuple
+from collections.abc import Iterator
 
 import numpy as np
+import scipy.sparse as sp
 from sklearn.exceptions import NotFittedError
 from sklearn.metrics import accuracy_score as sklearn_accuracy_score
 from sklearn.metrics import r2_score as sklearn_r2_score
+from sklearn.model_selection import train_test_split
 from sklearn.utils.multiclass import type_of_target
 from sklearn.utils.validation import (
     check_X_y,
     check_array,
     _check_sample_weight,
+    _num_samples,
 )
+from tensorflow.python.data.ops.dataset_ops import DatasetV2
+from tensorflow.python.eager import def_function
+from tensorflow.python.framework import dtypes
+from tensorflow.python.framework import ops
+from tensorflow.python.framework import tensor_shape
+from tensorflow.python.framework.tensor_spec import TensorSpec
 from tensorflow.python.keras import backend as K
+from tensorflow.python.keras.callbacks import Callback
 from tensorflow.python.keras.layers import deserialize, serialize
 from tensorflow.python.keras.losses import is_categorical_crossentropy
 from tensorflow.python.keras.models import Model, Sequential, clone_model
 from tensorflow.python.keras.saving import saving_utils
 from tensorflow.python.keras.utils.generic_utils import (
-    has_arg,
     register_keras_serializable,
 )
 from tensorflow.python.keras.utils.np_utils import to_categorical
+from tensorflow.python.ops import array_ops
+from tensorflow.python.util import nest
+from tensorflow.python.util import serialization
+from tensorflow.python.util import tf_inspect
 
 
 # namedtuple used for pickling Model instances
@@ -32,8 +56,21 @@ SavedKerasModel = namedtuple(
     "SavedKerasModel", "cls model training_config weights"
 )
 
-# known keras function names that will be added to _legal_params_fns if they
-# exist in the generated model
+# weight of a Keras model pickled with protocol 5, `buffer` is a
+# `pickle.PickleBuffer` that is serialized out-of-band
+_WeightBuffer = namedtuple("_WeightBuffer", "buffer dtype shape")
+
+# `pickle.PickleBuffer` is only available in Python >= 3.8, which is also
+# the first version to support protocol 5
+_PickleBuffer = getattr(pickle, "PickleBuffer", None)
+
+# files of an estimator saved by `save_estimator`
+MANIFEST_FILE = "manifest.json"
+ESTIMATOR_FILE = "estimator.pkl"
+SAVE_FORMAT_VERSION = 1
+
+# known keras function names that will be added to the legal parameters
+# registry if they exist in the generated model
 KNOWN_KERAS_FN_NAMES = (
     "fit",
     "evaluate",
@@ -46,6 +83,31 @@ ARGS_KWARGS_IDENTIFIERS = (
     inspect.Parameter.VAR_POSITIONAL,
 )
 
+# dtypes of X that are used as is, any other dtype is converted to the first
+# one. Keras casts inputs to the dtype of the model itself, there is no need to
+# upcast (and copy) float32 or float16 inputs beforehand.
+X_DTYPES = ("float64", "float32", "float16", "int")
+
+# number of samples predicted at a time by `predict_iter` and
+# `predict_proba_iter`
+PREDICT_CHUNK_SIZE = 10000
+
+# scipy sparse format of X, matrices in other formats (ex: CSC) are converted
+# to it. Keras layers need dense inputs, the rows of sparse matrices are
+# densified one batch at a time, see `_batch_dataset`.
+X_SPARSE_FORMAT = "csr"
+
+# namedtuple returned by signature_cache_info
+SignatureCacheInfo = namedtuple("SignatureCacheInfo", "hits misses currsize")
+
+# namedtuple returned by BaseWrapper.predict_latency_stats
+LatencyStats = namedtuple("LatencyStats", "count mean max percentiles")
+
+# namedtuple returned by build_cache_info
+BuildCacheInfo = namedtuple(
+    "BuildCacheInfo", "hits misses currsize build_time time_saved"
+)
+
 _DEFAULT_TAGS = {
     "non_deterministic": True,  # can't easily set random_state
     "requires_positive_X": False,
@@ -64,25 +126,1177 @@ _DEFAULT_TAGS = {
 }
 
 
-def _clone_prebuilt_model(build_fn):
-    """Clones and compiles a pre-built model when build_fn is an existing
-            Keras model instance.
+class _AnyName:
+    """Contains every argument name, returned by `_SignatureCache.arg_names`
+    for callables accepting `**kwargs` when `accept_all` is set.
+    """
+
+    def __contains__(self, name):
+        return True
+
+
+_ANY_NAME = _AnyName()
+
+
+class _SignatureCache:
+    """Caches the names of the arguments accepted by callables.
+
+    Bound methods are keyed on their underlying function, so the entry for
+    `Model.fit` is shared by every model instance. Keys are held by weak
+    reference, caching a function never keeps it alive.
+    """
+
+    def __init__(self):
+        self._arg_names = weakref.WeakKeyDictionary()
+        self.hits = 0
+        self.misses = 0
+
+    def arg_names(self, fn, accept_all=False):
+        """Returns the names of the arguments accepted by `fn`.
+
+        Mimics `has_arg(fn, name, accept_all)`: `**kwargs` only makes `fn`
+        accept arbitrary names if `accept_all` is set. Unlike `has_arg`,
+        keyword-only arguments are considered as well.
+        """
+        key = getattr(fn, "__func__", fn)
+        try:
+            arg_names, varkw = self._arg_names[key]
+        except (KeyError, TypeError):  # TypeError: key can't be weakref'd
+            self.misses += 1
+            spec = tf_inspect.getfullargspec(fn)
+            arg_names = frozenset(spec.args) | frozenset(spec.kwonlyargs)
+            varkw = spec.varkw is not None
+            try:
+                self._arg_names[key] = (arg_names, varkw)
+            except TypeError:
+                pass  # not cacheable, will be inspected on every call
+        else:
+            self.hits += 1
+        if accept_all and varkw:
+            return _ANY_NAME
+        return arg_names
+
+    def info(self):
+        return SignatureCacheInfo(
+            hits=self.hits, misses=self.misses, currsize=len(self._arg_names)
+        )
+
+    def clear(self):
+        self._arg_names.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+# shared by all wrappers so that clones made by GridSearchCV & co. reuse it
+_SIGNATURE_CACHE = _SignatureCache()
+
+# The per-estimator state below is filled in by `predict` and co., and is
+# kept outside of the estimators since sklearn requires that these methods do
+# not change their `__dict__`.
+
+# estimator -> routing tables used by BaseWrapper._filter_params
+_PARAMS_ROUTING = weakref.WeakKeyDictionary()
+
+# estimator -> (key, outputs) of the last call to `model_.predict`, used by
+# estimators with `memoize_predictions` set
+_PREDICT_MEMO = weakref.WeakKeyDictionary()
+
+# estimator -> (model, function) of the traced functions used by
+# `BaseWrapper._predict_fast`
+_FAST_PREDICT_FNS = weakref.WeakKeyDictionary()
+
+# estimator -> {method name: _LatencyHistogram} of the calls to the
+# prediction methods of estimators with `record_timings` set
+_LATENCY_HISTOGRAMS = weakref.WeakKeyDictionary()
+
+# per thread, estimator -> _PhaseTimer of the instrumented call in progress
+_ACTIVE_TIMERS = threading.local()
+
+# estimator -> `_build_key` of the arguments its model was built with, used
+# by `warm_start`. The key can reference those arguments (ex: a pre-built
+# model), which must not be pickled or cloned along with the estimator
+_BUILD_KEYS = weakref.WeakKeyDictionary()
+
+
+class _PhaseTimer:
+    """Accumulates the wall time spent in each phase of a call."""
+
+    def __init__(self):
+        self.timings = OrderedDict()
+
+    def phase(self, name):
+        return _Phase(self.timings, name)
+
+
+class _Phase:
+    """Context manager adding the time spent in its block to
+    `timings[name]`.
+    """
+
+    def __init__(self, timings, name):
+        self._timings = timings
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self._start
+        self._timings[self._name] = self._timings.get(self._name, 0) + elapsed
+
+
+class _NoPhase:
+    """Context manager used when timings are not recorded."""
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NO_PHASE = _NoPhase()
+
+
+def _active_timers():
+    timers = getattr(_ACTIVE_TIMERS, "timers", None)
+    if timers is None:
+        timers = _ACTIVE_TIMERS.timers = weakref.WeakKeyDictionary()
+    return timers
+
+
+class _LatencyHistogram:
+    """Histogram of latencies with logarithmic buckets, from 1us to 1000s
+    with 20 buckets per decade.
+    """
+
+    edges = np.logspace(-6, 3, 181)
+
+    def __init__(self):
+        self.counts = np.zeros(self.edges.size + 1, dtype=np.int64)
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, latency):
+        with self._lock:
+            self.counts[np.searchsorted(self.edges, latency)] += 1
+            self.total += latency
+            self.max = max(self.max, latency)
+
+    def stats(self, percentiles):
+        """Returns a `LatencyStats`, percentiles are the upper edges of the
+        buckets they fall in, capped to the largest latency.
+        """
+        with self._lock:
+            counts = self.counts.copy()
+            total, max_ = self.total, self.max
+        count = int(counts.sum())
+        cumulative = np.cumsum(counts)
+        values = OrderedDict()
+        for q in percentiles:
+            if not count:
+                values[q] = 0.0
+                continue
+            bucket = np.searchsorted(cumulative, q / 100 * count)
+            if bucket < self.edges.size:
+                values[q] = min(float(self.edges[bucket]), max_)
+            else:
+                values[q] = max_
+        return LatencyStats(
+            count=count,
+            mean=total / max(count, 1),
+            max=max_,
+            percentiles=values,
+        )
+
+
+def _instrumented(method):
+    """Records the timings of the phases of a call to `method` when the
+    estimator has `record_timings` set.
+
+    Nested instrumented calls (ex: `score` calling `predict`) are recorded as
+    part of the outermost call.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        timers = _active_timers()
+        if not self.record_timings or self in timers:
+            return method(self, *args, **kwargs)
+        timer = timers[self] = _PhaseTimer()
+        start = time.perf_counter()
+        try:
+            result = method(self, *args, **kwargs)
+        finally:
+            del timers[self]
+        timings = timer.timings
+        timings["total"] = time.perf_counter() - start
+        self._record_timings(method.__name__, timings)
+        return result
+
+    return wrapper
+
+
+def signature_cache_info():
+    """Reports the statistics of the signature cache used by `_filter_params`.
+
+    Returns:
+        info : SignatureCacheInfo namedtuple of `(hits, misses, currsize)`.
+    """
+    return _SIGNATURE_CACHE.info()
+
+
+def clear_signature_cache():
+    """Empties the signature cache used by `_filter_params` and resets its
+    statistics.
+    """
+    _SIGNATURE_CACHE.clear()
+
+
+class _LegalParamsRegistry:
+    """Deduplicated registry of the functions whose arguments are legal
+    parameters of a wrapper.
+
+    Entries are deduplicated on the underlying function: registering the
+    `fit` method of a new model replaces the entry of the previous model.
+    Bound methods are held through `weakref.WeakMethod` so that registering
+    the methods of a model never keeps that model alive.
+
+    Arguments:
+        base_fns : functions that are always part of the registry.
+    """
+
+    def __init__(self, base_fns=()):
+        self._base_fns = tuple(base_fns)
+        self._refs = OrderedDict()
+        for fn in self._base_fns:
+            self.add(fn)
+
+    def add(self, fn):
+        """Registers `fn`, replacing any entry for the same function."""
+        key = getattr(fn, "__func__", fn)
+        if hasattr(fn, "__self__") and hasattr(fn, "__func__"):
+            fn = weakref.WeakMethod(fn)
+        self._refs.pop(key, None)
+        self._refs[key] = fn
+
+    def __iter__(self):
+        """Iterates over the live registered functions."""
+        for fn in list(self._refs.values()):
+            if isinstance(fn, weakref.WeakMethod):
+                fn = fn()
+            if fn is not None:
+                yield fn
+
+    def __len__(self):
+        return len(self._refs)
+
+    def __reduce__(self):
+        # bound methods can't be pickled, they are registered again by `fit`
+        return self.__class__, (self._base_fns,)
+
+
+def _value_key(value):
+    """Returns a hashable key that identifies `value`.
+
+    Numpy arrays are identified by their content, lists, tuples and dicts
+    by the keys of their items and other hashable objects by themselves.
+    Unhashable objects are identified by their identity.
+    """
+    if isinstance(value, np.ndarray):
+        return ("ndarray", value.shape, value.dtype.str, value.tobytes())
+    if isinstance(value, (list, tuple)):
+        return (type(value).__name__,) + tuple(_value_key(v) for v in value)
+    if isinstance(value, dict):
+        return ("dict",) + tuple(
+            sorted(
+                ((key, _value_key(val)) for key, val in value.items()),
+                key=lambda item: repr(item[0]),
+            )
+        )
+    try:
+        hash(value)
+    except TypeError:
+        return ("id", id(value))
+    return value
+
+
+def _data_key(data):
+    """Returns a hashable key that identifies the dtype and the shape of
+    `data`, excluding the number of samples.
+    """
+    if isinstance(data, (list, tuple)):
+        return tuple(_data_key(d) for d in data)
+    if data is None:
+        return None
+    return ("data", tuple(data.shape[1:]), str(data.dtype))
+
+
+def _build_key(build_fn, build_args, data_args=("X", "y", "sample_weight")):
+    """Returns a hashable key that identifies a call to a model building
+    function.
+
+    Data arguments are only identified by their dtype and shape, excluding
+    the number of samples, since they normally only affect the
+    architecture of the model through those.
+
+    Arguments:
+        build_fn : model building function.
+        build_args : dictionary of arguments passed to `build_fn`.
+        data_args : names of the arguments that hold data.
+
+    Returns:
+        key : hashable key.
+    """
+    return (
+        getattr(build_fn, "__func__", build_fn),
+        tuple(
+            sorted(
+                (
+                    name,
+                    _data_key(val) if name in data_args else _value_key(val),
+                )
+                for name, val in build_args.items()
+            )
+        ),
+    )
+
+
+def _is_stable_key(key):
+    """Returns False if `key` identifies some of its values by their `id`,
+    which may be reused once these values are garbage collected.
+    """
+    if isinstance(key, tuple):
+        if len(key) == 2 and key[0] == "id":
+            return False
+        return all(_is_stable_key(k) for k in key)
+    return True
+
+
+def _reset_optimizer(optimizer, config, var_list):
+    """Resets the state of a Keras optimizer to that of a new optimizer
+    created from `config`.
+
+    The slots and hyperparameters are assigned in place, so that functions
+    already traced for the optimizer remain valid.
+
+    Arguments:
+        optimizer : Keras `OptimizerV2` instance.
+        config : config of `optimizer` before it was first used.
+        var_list : variables optimized by `optimizer`.
+    """
+    fresh = optimizer.__class__.from_config(config)
+    # slot initializers are not kept, take the initial values from the
+    # slots of a new optimizer
+    fresh._create_slots(var_list)
+    slot_names = optimizer.get_slot_names()
+    for var in var_list:
+        for slot_name in slot_names:
+            try:
+                slot = optimizer.get_slot(var, slot_name)
+            except KeyError:
+                continue  # the optimizer was never applied to var
+            slot.assign(fresh.get_slot(var, slot_name))
+    for name, value in fresh._hyper.items():
+        if name in optimizer._hyper and not callable(value):
+            optimizer._set_hyper(name, value)
+    optimizer.iterations.assign(0)
+
+
+def _reinitialize_model(model, initial_weights, optimizer_config):
+    """Re-initializes the weights and the optimizer state of `model`.
+
+    Weights are drawn again from the initializers of their layers
+    (ex: `kernel_initializer` for `kernel`), other weights are reset to
+    their values when the model was built.
+
+    Arguments:
+        model : compiled Keras model.
+        initial_weights : list of numpy arrays, weights of `model` when it
+            was built.
+        optimizer_config : config of the optimizer of `model` when it was
+            built, or None if it has no Keras optimizer.
+    """
+    weights = model.weights
+    index = {id(w): i for i, w in enumerate(weights)}
+    new_weights = list(initial_weights)
+    for layer in [model] + list(model.submodules):
+        for name, initializer in list(vars(layer).items()):
+            if not name.endswith("_initializer") or not callable(initializer):
+                continue
+            var_name = name[: -len("_initializer")]
+            if var_name == "recurrent":
+                var_name = "recurrent_kernel"
+            var = getattr(layer, var_name, None)
+            if id(var) in index:
+                new_weights[index[id(var)]] = np.asarray(
+                    initializer(var.shape, dtype=var.dtype.base_dtype)
+                )
+    model.set_weights(new_weights)
+    if optimizer_config is not None:
+        _reset_optimizer(
+            model.optimizer, optimizer_config, model.trainable_weights
+        )
+
+
+# state of a model kept by `_BuildCache`
+_BuiltModel = namedtuple(
+    "_BuiltModel", "initial_weights optimizer_config build_time"
+)
+
+
+class _BuildCache:
+    """Pool of compiled Keras models, keyed by the arguments they were built
+    with.
+
+    Models are added to the pool when the estimator that built them is
+    garbage collected or builds another model, and handed out again to
+    estimators that would build a model with the same arguments. The pool
+    holds at most `maxsize` models, the least recently released are
+    dropped first.
+
+    Arguments:
+        maxsize : int, maximum number of models in the pool.
+    """
+
+    def __init__(self, maxsize=8):
+        self.maxsize = maxsize
+        self._free = OrderedDict()
+        self._built = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.build_time = 0.0
+        self.time_saved = 0.0
+
+    def add(self, model, build_time):
+        """Records a newly built model, before it is trained."""
+        try:
+            optimizer_config = model.optimizer.get_config()
+        except AttributeError:  # not compiled or not a Keras optimizer
+            optimizer_config = None
+        built = _BuiltModel(
+            initial_weights=model.get_weights(),
+            optimizer_config=optimizer_config,
+            build_time=build_time,
+        )
+        with self._lock:
+            self._built[model] = built
+            self.misses += 1
+            self.build_time += build_time
+
+    def acquire(self, key):
+        """Takes a model built for `key` out of the pool.
+
+        Returns:
+            model : the model, its weights and optimizer state
+                re-initialized, or None if the pool holds no model for `key`.
+        """
+        with self._lock:
+            models = self._free.get(key)
+            if not models:
+                return None
+            model = models.pop()
+            if not models:
+                del self._free[key]
+            built = self._built[model]
+            self.hits += 1
+            self.time_saved += built.build_time
+        _reinitialize_model(
+            model, built.initial_weights, built.optimizer_config
+        )
+        return model
+
+    def release(self, key, model):
+        """Returns a model built for `key` to the pool."""
+        with self._lock:
+            if model not in self._built:
+                return  # the cache was cleared since the model was built
+            self._free.setdefault(key, []).append(model)
+            self._free.move_to_end(key)
+            while sum(len(models) for models in self._free.values()) > (
+                self.maxsize
+            ):
+                oldest = next(iter(self._free))
+                del self._free[oldest][0]
+                if not self._free[oldest]:
+                    del self._free[oldest]
+
+    def detach(self, model):
+        """Stops tracking `model`, so that it is never handed out again."""
+        with self._lock:
+            self._built.pop(model, None)
+            for key, models in list(self._free.items()):
+                if model in models:
+                    models.remove(model)
+                    if not models:
+                        del self._free[key]
+
+    def info(self):
+        with self._lock:
+            return BuildCacheInfo(
+                hits=self.hits,
+                misses=self.misses,
+                currsize=sum(len(models) for models in self._free.values()),
+                build_time=self.build_time,
+                time_saved=self.time_saved,
+            )
+
+    def clear(self):
+        with self._lock:
+            self._free.clear()
+            self._built.clear()
+            self.hits = 0
+            self.misses = 0
+            self.build_time = 0.0
+            self.time_saved = 0.0
+
+
+# shared by all wrappers with `cache_models` set
+_BUILD_CACHE = _BuildCache()
+
+# estimator -> finalizer returning its model to `_BUILD_CACHE`, kept outside
+# of the estimators so that they can be pickled and cloned
+_BUILD_CACHE_OWNERS = weakref.WeakKeyDictionary()
+
+
+def build_cache_info():
+    """Reports the statistics of the model build cache used by wrappers with
+    `cache_models` set.
+
+    Returns:
+        info : BuildCacheInfo namedtuple of `(hits, misses, currsize,
+            build_time, time_saved)`. `build_time` is the total time spent
+            building models, in seconds, and `time_saved` the time it would
+            have taken to build the models that were reused instead.
+    """
+    return _BUILD_CACHE.info()
+
+
+def clear_build_cache():
+    """Empties the model build cache and resets its statistics."""
+    _BUILD_CACHE.clear()
+
+
+def _input_signature(X):
+    """Returns the `TensorSpec`s of the inputs `X` of a Keras model, with an
+    unknown number of samples.
+
+    Arguments:
+        X : numpy array, list of numpy arrays or `tf.data.Dataset` of
+            `(X, y)` or `(X, y, sample_weight)` batches.
+
+    Returns:
+        signature : `TensorSpec` or list of `TensorSpec`s, matching the
+            structure of `X`.
+    """
+    if isinstance(X, DatasetV2):
+        return nest.map_structure(
+            lambda spec: TensorSpec(
+                tensor_shape.TensorShape([None]).concatenate(spec.shape[1:]),
+                spec.dtype,
+            ),
+            X.element_spec[0],
+        )
+    return nest.map_structure(
+        lambda x: TensorSpec((None,) + x.shape[1:], x.dtype), X
+    )
+
+
+def _match_signature(X, signature):
+    """Casts the inputs `X` to the dtypes of `signature`.
+
+    Arguments:
+        X : numpy array or list of numpy arrays, pre-processed inputs.
+        signature : input signature, see `_input_signature`.
+
+    Returns:
+        X : numpy array or list of numpy arrays, or None if `X` does not
+            match the structure and shapes of `signature`.
+    """
+    if signature is None:
+        return None
+    try:
+        nest.assert_same_structure(signature, X)
+    except (TypeError, ValueError):
+        return None
+    specs, inputs = nest.flatten(signature), nest.flatten(X)
+    if not all(
+        spec.shape.is_compatible_with(x.shape)
+        for spec, x in zip(specs, inputs)
+    ):
+        return None
+    return nest.pack_sequence_as(
+        signature,
+        [
+            np.asarray(x, dtype=spec.dtype.as_numpy_dtype)
+            for spec, x in zip(specs, inputs)
+        ],
+    )
+
+
+def _inference_fn(model, signature):
+    """Returns a function that runs `model` in inference mode, traced for
+    `signature` unless the model must run eagerly.
+    """
+
+    def fn(x):
+        return model(x, training=False)
+
+    if model.run_eagerly:
+        return fn
+    if signature is None:
+        return def_function.function(fn)
+    return def_function.function(fn, input_signature=[signature])
+
+
+def _overrides_predict(model):
+    """Returns True if the class of `model` customizes how `Model.predict`
+    runs the model, which `_inference_fn` would bypass.
+    """
+    model_cls = type(model)
+    return any(
+        getattr(model_cls, name) is not getattr(Model, name)
+        for name in ("predict", "predict_step", "make_predict_function")
+    )
+
+
+def _array_key(X):
+    """Returns a hashable key that identifies the content of the array or
+    sparse matrix `X`.
+    """
+    if sp.issparse(X):
+        X = X.tocsr()
+        return (
+            X.shape,
+            _array_key(X.data),
+            _array_key(X.indices),
+            _array_key(X.indptr),
+        )
+    X = np.ascontiguousarray(X)
+    return (
+        X.shape,
+        X.dtype.str,
+        hashlib.sha1(X).digest(),
+    )
+
+
+def _pack_out_of_band(obj, memo):
+    """Recursively packs Keras models in `obj` for pickling with protocol 5.
+
+    Unlike `BaseWrapper.__getstate__`, nothing is copied: the weights of Keras
+    models are wrapped in `pickle.PickleBuffer` so that they can be serialized
+    out-of-band, and objects holding Keras models are shallow copied, leaving
+    `obj` unmodified.
+
+    Arguments:
+        obj : object to pack.
+        memo : dictionary of already packed objects, keyed by `id`.
+
+    Returns:
+        packed : `obj` itself if it does not hold any Keras model.
+    """
+    if id(obj) in memo:
+        return memo[id(obj)]
+    memo[id(obj)] = obj  # break reference cycles
+    if isinstance(obj, Model):
+        weights = [np.ascontiguousarray(w) for w in obj.get_weights()]
+        packed = SavedKerasModel(
+            cls=obj.__class__,
+            model=serialize(obj),
+            weights=[
+                _WeightBuffer(_PickleBuffer(w), w.dtype.str, w.shape)
+                for w in weights
+            ],
+            training_config=saving_utils.model_metadata(obj)[
+                "training_config"
+            ],
+        )
+    elif isinstance(obj, (list, tuple)):
+        items = [_pack_out_of_band(o, memo) for o in obj]
+        if all(new is old for new, old in zip(items, obj)):
+            return obj
+        packed = type(obj)(items)
+    elif isinstance(getattr(obj, "__dict__", None), dict) and not (
+        inspect.isroutine(obj) or inspect.ismodule(obj)
+    ):
+        attrs = {
+            key: _pack_out_of_band(val, memo)
+            for key, val in obj.__dict__.items()
+        }
+        if all(attrs[key] is val for key, val in obj.__dict__.items()):
+            return obj
+        packed = copy.copy(obj)
+        packed.__dict__ = attrs
+    else:
+        return obj
+    memo[id(obj)] = packed
+    return packed
+
+
+def _unpack_weight(weight):
+    """Returns a numpy array for a weight packed by `_pack_out_of_band`,
+    without copying its buffer.
+    """
+    if isinstance(weight, _WeightBuffer):
+        return np.frombuffer(weight.buffer, dtype=weight.dtype).reshape(
+            weight.shape
+        )
+    return weight
+
+
+def _unique_inverse(y):
+    """Returns the sorted unique labels of `y` and the index of each label of
+    `y` in them.
+
+    Like `np.unique(y, return_inverse=True)`, but without sorting `y` when
+    the labels are small non-negative integers: the labels present are
+    found with `np.bincount` and encoded with a lookup table.
+
+    Arguments:
+        y : numpy array of labels.
+
+    Returns:
+        classes : sorted 1D numpy array of the unique labels.
+        y : 1D numpy array of 0 indexed labels.
+    """
+    y = np.ravel(y)
+    if y.dtype.kind in "iu" and y.size:
+        low, high = y.min(), y.max()
+        if low >= 0 and high < max(2 * y.size, 1024):
+            present = np.bincount(y) > 0
+            classes = np.flatnonzero(present).astype(y.dtype, copy=False)
+            return classes, (np.cumsum(present) - 1)[y]
+    return np.unique(y, return_inverse=True)
+
+
+def _encode_labels(y, classes):
+    """Maps labels to their index in `classes`.
+
+    Arguments:
+        y : numpy array of labels.
+        classes : sorted 1D numpy array of known labels.
+
+    Returns:
+        y : numpy array of the same shape as `y` with 0 indexed labels.
+
+    Raises:
+        ValueError : if `y` contains labels that are not in `classes`.
+    """
+    y_encoded = np.searchsorted(classes, y)
+    known = classes[np.minimum(y_encoded, classes.size - 1)] == y
+    if not np.all(known):
+        raise ValueError(
+            "y contains labels that are not in the known classes %s: %s"
+            % (classes, np.unique(np.asarray(y)[~known]))
+        )
+    return y_encoded
+
+
+def _classes_per_output(classes):
+    """Normalizes declared classes to a list of sorted arrays, one per output.
+
+    Arguments:
+        classes : array-like of labels for single output problems, or a list
+            of array-likes of labels for multi-output problems.
+
+    Returns:
+        classes : list of sorted 1D numpy arrays.
+    """
+    if len(classes) and np.ndim(classes[0]) > 0:
+        return [np.unique(classes_) for classes_ in classes]
+    return [np.unique(classes)]
+
+
+def _target_type_from_classes(classes):
+    """Infers the type of target, as returned by `type_of_target`, from
+    declared classes.
+
+    Arguments:
+        classes : list of sorted 1D numpy arrays, one per output.
+
+    Returns:
+        target_type : str
+    """
+    if len(classes) == 1:
+        return "binary" if classes[0].size <= 2 else "multiclass"
+    if all(np.array_equal(classes_, [0, 1]) for classes_ in classes):
+        return "multilabel-indicator"
+    return "multiclass-multioutput"
+
+
+def _y_from_classes(classes):
+    """Builds the smallest target whose columns contain exactly `classes`.
+
+    Used to infer the target attributes (`classes_`, `cls_type_`, etc.) with
+    `_pre_process_y` without having the whole target in memory.
+
+    Arguments:
+        classes : list of 1D numpy arrays, one per output.
+
+    Returns:
+        y : 2D numpy array, column `i` contains all labels of `classes[i]`.
+    """
+    n_rows = max(classes_.size for classes_ in classes)
+    return np.column_stack(
+        [np.resize(classes_, n_rows) for classes_ in classes]
+    )
+
+
+def _as_chunks_factory(chunks):
+    """Returns a callable that creates a new iterator over `chunks`.
+
+    Arguments:
+        chunks : `tf.data.Dataset`, callable returning an iterator, or
+            re-iterable (ex: a list) of chunks.
+
+    Raises:
+        TypeError : if `chunks` can only be iterated over once.
+    """
+    if isinstance(chunks, DatasetV2):
+        return chunks.as_numpy_iterator
+    if callable(chunks):
+        return chunks
+    if iter(chunks) is chunks:
+        raise TypeError(
+            "Chunks must be iterated over several times, pass a re-iterable "
+            "(ex: a list), a `tf.data.Dataset` or a callable returning a "
+            "new iterator (ex: a generator function) instead of %s" % chunks
+        )
+    return lambda: iter(chunks)
+
+
+def _dataset_from_chunks(chunks_factory, batch_size):
+    """Creates a `tf.data.Dataset` from a factory of numpy chunks.
+
+    Each chunk is cast to the dtypes of the first chunk, so that chunks with
+    slightly different dtypes can be used, and split into batches.
+
+    Arguments:
+        chunks_factory : callable returning an iterator over (nested tuples
+            of) numpy arrays with the samples in the first dimension.
+        batch_size : int, number of samples per batch.
+
+    Returns:
+        dataset : `tf.data.Dataset` of batches.
+    """
+    first_chunk = next(iter(chunks_factory()))
+    output_types = nest.map_structure(
+        lambda arr: dtypes.as_dtype(arr.dtype), first_chunk
+    )
+    output_shapes = nest.map_structure(
+        lambda arr: tensor_shape.TensorShape((None,) + arr.shape[1:]),
+        first_chunk,
+    )
+    np_dtypes = nest.map_structure(lambda arr: arr.dtype, first_chunk)
+
+    def generator():
+        for chunk in chunks_factory():
+            yield nest.map_structure(np.asarray, chunk, np_dtypes)
+
+    dataset = DatasetV2.from_generator(generator, output_types, output_shapes)
+    return dataset.unbatch().batch(batch_size)
+
+
+# compiled model -> _PrebuiltTemplate, used by `_clone_prebuilt_model`
+_PREBUILT_TEMPLATES = weakref.WeakKeyDictionary()
+
+# compilation of a pre-built model, valid as long as the model is not
+# recompiled with other arguments (optimizer, loss, metrics, weighted
+# metrics or loss weights)
+_PrebuiltTemplate = namedtuple(
+    "_PrebuiltTemplate", "compile_args training_config"
+)
+
+
+def _prebuilt_training_config(build_fn):
+    """Returns the training config of a compiled Keras model.
+
+    `saving_utils.model_metadata` serializes the whole model, the training
+    config is kept in `_PREBUILT_TEMPLATES` until `build_fn` is recompiled
+    with other arguments.
 
     Arguments:
         build_fn : instance of Keras Model.
 
-    Returns: copy of the input model with no training.
+    Raises:
+        ValueError : if `build_fn` is not compiled.
     """
-    model = clone_model(build_fn)
-    # clone_model does not compy over compilation parameters, do those manually
+    compile_args = None
+    if getattr(build_fn, "_is_compiled", False):
+        compile_args = build_fn._get_compile_args()
+    template = _PREBUILT_TEMPLATES.get(build_fn)
+    if (
+        compile_args is not None
+        and template is not None
+        and all(
+            template.compile_args.get(name) is value
+            for name, value in compile_args.items()
+        )
+    ):
+        return template.training_config
     model_metadata = saving_utils.model_metadata(build_fn)
     if "training_config" in model_metadata:
         training_config = model_metadata["training_config"]
     else:
         raise ValueError(
-            "To use %s as `build_fn`, you must compile" "it first." % build_fn
+            "To use %s as `build_fn`, you must compile it first." % build_fn
+        )
+    if compile_args is not None:
+        _PREBUILT_TEMPLATES[build_fn] = _PrebuiltTemplate(
+            compile_args=compile_args, training_config=training_config
         )
+    return training_config
+
+
+def _is_sparse(X):
+    """Returns True if `X`, or one of the inputs in `X`, is a scipy sparse
+    matrix.
+    """
+    return any(sp.issparse(x) for x in nest.flatten(X))
+
+
+def _densify(X):
+    """Converts the scipy sparse matrices in `X` to numpy arrays."""
+    return nest.map_structure(
+        lambda x: x.toarray() if sp.issparse(x) else x, X
+    )
+
+
+def _dataset_structure(X, y=None, sample_weight=None):
+    """Returns the structure of the elements of a dataset of `X`, `y` and
+    `sample_weight`, with lists converted to tuples since tf.data converts
+    lists to tensors.
+    """
+    if isinstance(X, list):
+        X = tuple(X)
+    if isinstance(y, list):
+        y = tuple(y)
+    if y is None:
+        return X
+    if sample_weight is None:
+        return (X, y)
+    return (X, y, sample_weight)
+
+
+def _tensor_dataset(
+    X, y=None, sample_weight=None, batch_size=32, shuffle=False, rows=None
+):
+    """Creates a `tf.data.Dataset` of batches of dense in-memory data.
+
+    The data is batched by tf.data, without running Python code per batch.
+    The samples selected by `rows`, or shuffled at every epoch, are
+    gathered one batch at a time, like `Model.fit` does for arrays.
+
+    Arguments:
+        X : numpy array or list of numpy arrays, with the samples in the
+            first dimension.
+        y, sample_weight, batch_size, shuffle, rows : see `_batch_dataset`.
+
+    Returns:
+        dataset : `tf.data.Dataset` of `X` batches if `y` is None, of
+            `(X, y)` or `(X, y, sample_weight)` batches otherwise.
+    """
+    structure = _dataset_structure(X, y, sample_weight)
+    if rows is None and not shuffle:
+        dataset = DatasetV2.from_tensor_slices(structure).batch(batch_size)
+        return dataset.prefetch(1)
+    tensors = nest.map_structure(ops.convert_to_tensor, structure)
+    if rows is None:
+        rows = np.arange(nest.flatten(X)[0].shape[0])
+    indices = DatasetV2.from_tensor_slices(rows)
+    if shuffle:
+        indices = indices.shuffle(len(rows), reshuffle_each_iteration=True)
+
+    def gather(batch_rows):
+        return nest.map_structure(
+            lambda tensor: array_ops.gather(tensor, batch_rows), tensors
+        )
+
+    return indices.batch(batch_size).map(gather).prefetch(1)
+
+
+def _batch_dataset(
+    X, y=None, sample_weight=None, batch_size=32, shuffle=False, rows=None
+):
+    """Creates a `tf.data.Dataset` of batches of in-memory, possibly sparse,
+    data with a generator.
+
+    Sparse inputs are densified one batch at a time, so that memory scales
+    with `batch_size` instead of with the number of samples. Likewise, a
+    subset of the samples selected by `rows` is gathered one batch at a
+    time, without copying the data. Dense inputs are better served by
+    `_tensor_dataset`.
+
+    Arguments:
+        X : numpy array, CSR matrix, or list of CSR matrices and numpy
+            arrays, with the samples in the first dimension.
+        y : numpy array or list of numpy arrays, default=None
+        sample_weight : numpy array, default=None
+        batch_size : int, number of samples per batch.
+        shuffle : bool, shuffles the samples at every epoch.
+        rows : 1D numpy array of sample indices, default=None
+            Samples to use, in this order, all samples if None.
+
+    Returns:
+        dataset : `tf.data.Dataset` of `X` batches if `y` is None, of
+            `(X, y)` or `(X, y, sample_weight)` batches otherwise.
+    """
+    structure = _dataset_structure(X, y, sample_weight)
+    n_samples = nest.flatten(X)[0].shape[0] if rows is None else len(rows)
+    output_types = nest.map_structure(
+        lambda arr: dtypes.as_dtype(arr.dtype), structure
+    )
+    output_shapes = nest.map_structure(
+        lambda arr: tensor_shape.TensorShape((None,) + arr.shape[1:]),
+        structure,
+    )
+
+    def generator():
+        if shuffle:
+            order = np.random.permutation(n_samples)
+            if rows is not None:
+                order = rows[order]
+        else:
+            order = rows
+        for start in range(0, n_samples, batch_size):
+            if order is None:
+                batch_rows = slice(start, start + batch_size)
+            else:
+                batch_rows = order[start : start + batch_size]
+            yield nest.map_structure(
+                lambda arr: _densify(arr[batch_rows]), structure
+            )
+
+    dataset = DatasetV2.from_generator(generator, output_types, output_shapes)
+    return dataset.prefetch(1)
 
+
+def _one_hot_dataset(dataset, one_hot):
+    """One-hot encodes integer labels in a `tf.data.Dataset` of batches.
+
+    Arguments:
+        dataset : `tf.data.Dataset` of `(X, y)` or `(X, y, sample_weight)`
+            batches, `y` being an array or a tuple of arrays, one per output.
+        one_hot : dictionary of output indices to number of classes, the
+            labels of these outputs are one-hot encoded.
+
+    Returns:
+        dataset : `tf.data.Dataset` of batches with one-hot encoded labels.
+    """
+
+    def encode(X, y, *sample_weight):
+        outputs = list(y) if isinstance(y, tuple) else [y]
+        for i, n_classes in one_hot.items():
+            labels = array_ops.reshape(outputs[i], [-1])
+            outputs[i] = array_ops.one_hot(labels, n_classes)
+        y = tuple(outputs) if isinstance(y, tuple) else outputs[0]
+        return (X, y) + sample_weight
+
+    return dataset.map(encode)
+
+
+class _EarlyStopping(Callback):
+    """Stops training once `monitor` did not improve for `n_iter_no_change`
+    consecutive epochs, or at the end of the first batch after `max_time`
+    seconds, and restores the weights of the epoch with the lowest
+    `monitor` when training ends.
+
+    Either criterion can be disabled by setting it to None. The weights
+    are only restored when training stopped early, unless
+    `n_iter_no_change` is set.
+    """
+
+    def __init__(self, n_iter_no_change=None, max_time=None, monitor="loss"):
+        super().__init__()
+        self.n_iter_no_change = n_iter_no_change
+        self.max_time = max_time
+        self.monitor = monitor
+
+    def on_train_begin(self, logs=None):
+        self.best = np.inf
+        self.best_epoch = None
+        self.best_weights = None
+        self.n_iter = 0
+        self.truncated = False
+        self.restored = False
+        if self.max_time is not None:
+            self.deadline = time.perf_counter() + self.max_time
+
+    def on_train_batch_end(self, batch, logs=None):
+        if self.max_time is not None and time.perf_counter() >= self.deadline:
+            self.model.stop_training = True
+            self.truncated = True
+
+    def on_epoch_end(self, epoch, logs=None):
+        current = (logs or dict()).get(self.monitor)
+        if current is None:
+            return
+        if current < self.best:
+            self.best = current
+            self.best_epoch = epoch
+            self.best_weights = self.model.get_weights()
+            self.n_iter = 0
+            return
+        self.n_iter += 1
+        if (
+            self.n_iter_no_change is not None
+            and self.n_iter >= self.n_iter_no_change
+        ):
+            self.model.stop_training = True
+
+    def on_train_end(self, logs=None):
+        if self.best_weights is None:
+            return
+        if self.n_iter_no_change is not None or self.truncated:
+            self.model.set_weights(self.best_weights)
+            self.restored = True
+
+
+def _iter_chunks(X, chunk_size):
+    """Yields the chunks of samples of `X`.
+
+    Arguments:
+        X : array-like (including memmaps, sparse matrices, DataFrames and
+            lists of samples), sliced into `chunk_size` samples, or iterator
+            (ex: generator) of chunks of samples.
+        chunk_size : int, number of samples per slice of an array-like.
+    """
+    if isinstance(X, Iterator):
+        yield from X
+        return
+    # DataFrames are sliced by position, arrays into views
+    rows = X.iloc if hasattr(X, "iloc") else X
+    for start in range(0, _num_samples(X), chunk_size):
+        yield rows[start : start + chunk_size]
+
+
+def _with_samples(y, n_samples):
+    """Restores the sample dimension squeezed out of the post-processed
+    predictions `y` of a single sample.
+    """
+    y = np.asarray(y)
+    if y.ndim == 0 or y.shape[0] != n_samples:
+        y = y.reshape((n_samples,) + y.shape)
+    return y
+
+
+def _clone_prebuilt_model(build_fn):
+    """Clones and compiles a pre-built model when build_fn is an existing
+            Keras model instance.
+
+    Arguments:
+        build_fn : instance of Keras Model.
+
+    Returns: copy of the input model with no training.
+    """
+    # check that the model is compiled before cloning it
+    training_config = _prebuilt_training_config(build_fn)
+
+    model = clone_model(build_fn)
+    # clone_model does not compy over compilation parameters, do those
+    # manually, optimizers and metrics are stateful and can't be shared
     model.compile(
         **saving_utils.compile_args_from_training_config(training_config)
     )
@@ -98,6 +1312,66 @@ class BaseWrapper:
 
     Arguments:
         build_fn: callable function or class instance
+        warm_start: bool, default=False
+            When set to True, `fit` reuses the model (and its weights) of the
+            previous call to `fit` if the arguments of `build_fn` did not
+            change, and simply continues training it. Whether the model was
+            rebuilt is reported in the `model_rebuilt_` attribute. Unpickled
+            estimators rebuild their model on the first call to `fit`.
+        memoize_predictions: bool, default=False
+            When set to True, the outputs of the Keras model for the last
+            `X` passed to `predict`, `predict_proba` or `score` are kept
+            until the next call to `fit`, so that calling several of these
+            methods on the same data only runs the network once. Changes
+            made to the weights of `model_` outside of `fit` are not
+            detected.
+        cache_models: bool, default=False
+            When set to True, `fit` reuses compiled models built by other
+            estimators (ex: the clones fitted by `GridSearchCV`) for the same
+            arguments of `build_fn` and the same input and output shapes,
+            re-initializing their weights and optimizer state instead of
+            calling `build_fn`. Models are returned to the cache when their
+            estimator is garbage collected or builds another model, and must
+            not be used afterwards. Statistics, including the build time
+            saved, are reported by `build_cache_info`.
+        record_timings: bool, default=False
+            When set to True, the wall time spent in each phase of `fit`,
+            `partial_fit` and `fit_stream` (`validation`, `pre_process`,
+            `build`, which includes compiling, and `train`) is recorded in
+            the `fit_timings_` attribute, and the latencies of the
+            prediction methods in histograms reported by
+            `predict_latency_stats`.
+        timings_sink: callable or `logging.Logger`, default=None
+            Receives the timings of every instrumented call when
+            `record_timings` is set. A callable is called with the name of
+            the method and a dictionary of phase names to seconds, a logger
+            logs them at the INFO level.
+        early_stopping: bool, default=False
+            When set to True, `fit` holds out `validation_fraction` of the
+            training samples, stratified by class for single-output
+            classifiers, and stops training once the loss on them did not
+            improve for `n_iter_no_change` consecutive epochs. The weights
+            of the best epoch are restored and its index in `history_` is
+            recorded in the `best_epoch_` attribute. The held out samples
+            are gathered one batch at a time, `X` is not copied.
+            `partial_fit` and `fit_stream` do not stop early.
+        validation_fraction: float, default=0.1
+            Proportion of the training samples held out when
+            `early_stopping` is set, strictly between 0 and 1.
+        n_iter_no_change: int, default=10
+            Number of epochs without improvement of the validation loss
+            after which training stops when `early_stopping` is set.
+        max_time: float, default=None
+            Wall-clock budget in seconds of each call to `fit`,
+            `partial_fit` or `fit_stream`. Once it is spent, training stops
+            at the end of the current batch and the weights of the epoch
+            with the lowest loss seen so far (validation loss if there is
+            validation data) are restored, its index in `history_` being
+            recorded in `best_epoch_`. Whether training was cut short is
+            recorded in the `truncated` attribute of `history_`. The
+            weights of the best epoch are copied whenever the loss
+            improves. The budget does not include validating and
+            pre-processing the data, nor building the model.
         **sk_params: model parameters & fitting parameters
 
     The `build_fn` should construct, compile and return a Keras model, which
@@ -134,22 +1408,49 @@ class BaseWrapper:
     """
 
     # basic legal parameter set, based on functions that will normally be
-    # called the model building function will be dynamically added
-    _legal_params_fns = [
+    # called the model building function will be dynamically added to the
+    # per-instance registry, see `_register_legal_params_fn`
+    _legal_params_fns = (
         Sequential.evaluate,
         Sequential.fit,
         Sequential.predict,
         Model.evaluate,
         Model.fit,
         Model.predict,
-    ]
+    )
 
     _sk_params = None
     is_fitted_ = False
 
-    def __init__(self, build_fn=None, **sk_params):
+    # `predict` calls a traced function of the Keras model directly, instead
+    # of `model_.predict`, for inputs of up to this many samples
+    fast_predict_max_samples = 64
+
+    def __init__(
+        self,
+        build_fn=None,
+        warm_start=False,
+        memoize_predictions=False,
+        cache_models=False,
+        record_timings=False,
+        timings_sink=None,
+        early_stopping=False,
+        validation_fraction=0.1,
+        n_iter_no_change=10,
+        max_time=None,
+        **sk_params
+    ):
 
         self.build_fn = build_fn
+        self.warm_start = warm_start
+        self.memoize_predictions = memoize_predictions
+        self.cache_models = cache_models
+        self.record_timings = record_timings
+        self.timings_sink = timings_sink
+        self.early_stopping = early_stopping
+        self.validation_fraction = validation_fraction
+        self.n_iter_no_change = n_iter_no_change
+        self.max_time = max_time
 
         if sk_params:
 
@@ -213,10 +1514,22 @@ class BaseWrapper:
         else:
             raise ValueError("`build_fn` must be a callable or None")
         # append legal parameters
-        self._legal_params_fns.append(final_build_fn)
+        self._register_legal_params_fn(final_build_fn)
 
         return final_build_fn
 
+    def _register_legal_params_fn(self, fn):
+        """Adds `fn` to this instance's registry of legal parameter sources.
+
+        The registry is created on first use so that `__init__` only sets
+        parameters, as required by the scikit-learn API.
+        """
+        registry = self.__dict__.get("_legal_params_registry")
+        if registry is None:
+            registry = _LegalParamsRegistry(self._legal_params_fns)
+            self._legal_params_registry = registry
+        registry.add(fn)
+
     def _build_keras_model(self, X, y, sample_weight, **kwargs):
         """Build the Keras model.
 
@@ -240,6 +1553,11 @@ class BaseWrapper:
         Raises:
             ValuError : In case sample_weight != None and the Keras model's
                 `fit` method does not support that parameter.
+
+        If `warm_start` is set and the arguments of `build_fn` did not change
+        since the model was last built, the existing model is returned. If
+        `cache_models` is set, a model built for the same arguments may be
+        taken from the build cache instead of calling `build_fn`.
         """
         # dynamically build model, i.e. final_build_fn builds a Keras model
 
@@ -267,17 +1585,116 @@ class BaseWrapper:
         # combine all arguments
         build_args = {**model_args, **X_y_args, **sample_weight_arg, **kwargs}
 
+        # reuse the existing model if warm starting and nothing changed
+        build_key = _build_key(final_build_fn, build_args)
+        if (
+            self.warm_start
+            and self.is_fitted_
+            and build_key == _BUILD_KEYS.get(self)
+        ):
+            self.model_rebuilt_ = False
+            return self.model_
+
         # build model
-        model = final_build_fn(**build_args)
+        if self.cache_models and _is_stable_key(build_key):
+            model = self._build_cached_model(
+                final_build_fn, build_args, (build_key, _data_key([X, y]))
+            )
+        else:
+            model = final_build_fn(**build_args)
+        _BUILD_KEYS[self] = build_key
+        self.model_rebuilt_ = True
 
         # append legal parameter names from model
         for known_keras_fn in KNOWN_KERAS_FN_NAMES:
             if hasattr(model, known_keras_fn):
-                self._legal_params_fns.append(getattr(model, known_keras_fn))
+                self._register_legal_params_fn(getattr(model, known_keras_fn))
+
+        return model
+
+    def _build_cached_model(self, build_fn, build_args, cache_key):
+        """Takes a model for `cache_key` from the build cache, or builds one
+        with `build_fn`.
 
+        The model previously built by this estimator is returned to the
+        cache first, so that refitting an estimator reuses its own model.
+        The model is returned to the cache when this estimator is garbage
+        collected.
+        """
+        finalizer = _BUILD_CACHE_OWNERS.pop(self, None)
+        if finalizer is not None:
+            finalizer()
+        model = _BUILD_CACHE.acquire(cache_key)
+        if model is None:
+            start = time.perf_counter()
+            model = build_fn(**build_args)
+            _BUILD_CACHE.add(model, time.perf_counter() - start)
+        finalizer = weakref.finalize(
+            self, _BUILD_CACHE.release, cache_key, model
+        )
+        finalizer.atexit = False
+        _BUILD_CACHE_OWNERS[self] = finalizer
         return model
 
-    def _fit_keras_model(self, X, y, sample_weight, **kwargs):
+    def _phase(self, name):
+        """Returns a context manager timing the phase `name` of the
+        instrumented call in progress, if any.
+        """
+        timer = _active_timers().get(self)
+        if timer is None:
+            return _NO_PHASE
+        return timer.phase(name)
+
+    def _record_timings(self, method_name, timings):
+        """Records the timings of an instrumented call and passes them to
+        `timings_sink`.
+        """
+        if method_name in ("fit", "partial_fit", "fit_stream"):
+            self.fit_timings_ = timings
+            # latencies of the previous model
+            _LATENCY_HISTOGRAMS.pop(self, None)
+        else:
+            histograms = _LATENCY_HISTOGRAMS.setdefault(self, dict())
+            histograms.setdefault(method_name, _LatencyHistogram()).record(
+                timings["total"]
+            )
+        sink = self.timings_sink
+        if isinstance(sink, logging.Logger):
+            sink.info(
+                "%s.%s timings: %s",
+                type(self).__name__,
+                method_name,
+                ", ".join("%s=%.6fs" % item for item in timings.items()),
+            )
+        elif sink is not None:
+            sink(method_name, timings)
+
+    def predict_latency_stats(
+        self, method="predict", percentiles=(50, 90, 99)
+    ):
+        """Reports the latencies of the calls to a prediction method since
+        the last call to `fit`, recorded when `record_timings` is set.
+
+        Arguments:
+            method : str, default="predict"
+                name of the method, ex: "predict", "predict_proba" or "score".
+            percentiles : sequence of floats in [0, 100], default=(50, 90, 99)
+
+        Returns:
+            stats : LatencyStats namedtuple of `(count, mean, max,
+                percentiles)`, where `percentiles` maps each requested
+                percentile to a latency. Latencies are in seconds, and
+                percentiles are read from a histogram with 20 buckets per
+                decade, so are accurate to about 12%.
+        """
+        histogram = _LATENCY_HISTOGRAMS.get(self, dict()).get(method)
+        if histogram is None:
+            histogram = _LatencyHistogram()
+        return histogram.stats(percentiles)
+
+    def _fit_keras_model(
+        self, X, y, sample_weight, validation_rows=None, **kwargs
+    ):
         """Fits the Keras model.
 
         This method will process all arguments and call the Keras
@@ -291,6 +1708,10 @@ class BaseWrapper:
                 True labels for `X`.
             sample_weight : array-like of shape (n_samples,)
                 Sample weights. The Keras Model must support this.
+            validation_rows : tuple of 1D numpy arrays, default=None
+                Indices of the training and validation samples, see
+                `_validation_split`. When given, training stops early on
+                the loss of the validation samples.
             **kwargs: dictionary arguments
                 Legal arguments are the arguments of the keras model's
                 `fit` method.
@@ -301,6 +1722,8 @@ class BaseWrapper:
         Raises:
             ValuError : In case sample_weight != None and the Keras model's
                         `fit` method does not support that parameter.
+            ValueError : In case `validation_rows` is given along with the
+                `validation_split` or `validation_data` arguments of `fit`.
         """
         # add `sample_weight` param, required to be explicit by some sklearn
         # functions that use inspect.signature on the `score` method
@@ -324,13 +1747,135 @@ class BaseWrapper:
         # order implies kwargs overwrites fit_args
         fit_args = {**fit_args, **kwargs}
 
-        self.history_ = self.model_.fit(x=X, y=y, **fit_args)
+        # memoized outputs and traced functions of the previous model are no
+        # longer valid
+        _PREDICT_MEMO.pop(self, None)
+        _FAST_PREDICT_FNS.pop(self, None)
+
+        # inputs accepted by the fast predict path
+        self._predict_signature = _input_signature(X)
+
+        has_validation = bool(fit_args.get("validation_split")) or (
+            fit_args.get("validation_data") is not None
+        )
+        if validation_rows is not None and has_validation:
+            raise ValueError(
+                "`validation_split` and `validation_data` can not be"
+                " used with `early_stopping`"
+            )
+        # only set if this call stops early
+        self.__dict__.pop("best_epoch_", None)
+        stopper = None
+        if validation_rows is not None or self.max_time is not None:
+            stopper = _EarlyStopping(
+                n_iter_no_change=(
+                    self.n_iter_no_change
+                    if validation_rows is not None
+                    else None
+                ),
+                max_time=self.max_time,
+                monitor=(
+                    "val_loss"
+                    if validation_rows is not None or has_validation
+                    else "loss"
+                ),
+            )
+            fit_args["callbacks"] = list(fit_args.get("callbacks") or [])
+            fit_args["callbacks"].append(stopper)
+
+        one_hot = self._one_hot_outputs()
+        if (
+            validation_rows is not None
+            or _is_sparse(X)
+            or (one_hot and not isinstance(X, DatasetV2))
+        ):
+            # the batches are gathered, densified and one-hot encoded by
+            # the dataset, which also carries the sample weights. Only
+            # sparse inputs need a generator to be densified per batch
+            make_dataset = _batch_dataset if _is_sparse(X) else _tensor_dataset
+            sample_weight = fit_args.pop("sample_weight", None)
+            batch_size = fit_args.pop("batch_size", None) or 32
+            train_rows, holdout_rows = validation_rows or (None, None)
+            validation_split = fit_args.pop("validation_split", None)
+            if validation_split:
+                # Keras does not split datasets, hold out the last samples
+                # like it does for arrays
+                n_samples = nest.flatten(X)[0].shape[0]
+                split_at = int(n_samples * (1.0 - validation_split))
+                train_rows = np.arange(split_at)
+                holdout_rows = np.arange(split_at, n_samples)
+            if holdout_rows is not None:
+                validation_data = make_dataset(
+                    X,
+                    y,
+                    sample_weight,
+                    batch_size=batch_size,
+                    rows=holdout_rows,
+                )
+                if one_hot:
+                    validation_data = _one_hot_dataset(
+                        validation_data, one_hot
+                    )
+                fit_args["validation_data"] = validation_data
+            X = make_dataset(
+                X,
+                y,
+                sample_weight,
+                batch_size=batch_size,
+                shuffle=bool(fit_args.pop("shuffle", True)),
+                rows=train_rows,
+            )
+            y = None
+        if one_hot:
+            X = _one_hot_dataset(X, one_hot)
+
+        with self._phase("train"):
+            self.history_ = self.model_.fit(x=X, y=y, **fit_args)
+        self.history_.truncated = stopper is not None and stopper.truncated
+        if stopper is not None and stopper.restored:
+            self.best_epoch_ = stopper.best_epoch
 
         self.is_fitted_ = True
 
         # return self to allow fit_transform and such to work
         return self
 
+    def _one_hot_outputs(self):
+        """Returns the outputs whose labels are one-hot encoded per batch
+        when fitting, as a dictionary of output indices to number of classes.
+
+        None by default.
+        """
+        return dict()
+
+    def _stratify_labels(self, y):
+        """Returns the labels the validation samples are stratified by, see
+        `_validation_split`.
+
+        None (no stratification) by default.
+        """
+        return None
+
+    def _validation_split(self, y):
+        """Splits the samples into training and validation samples for
+        early stopping.
+
+        Arguments:
+            y : pre-processed target, see `_pre_process_y`.
+
+        Returns:
+            rows : tuple of the sorted indices of the training samples and
+                of the validation samples.
+        """
+        n_samples = nest.flatten(y)[0].shape[0]
+        train_rows, validation_rows = train_test_split(
+            np.arange(n_samples),
+            test_size=self.validation_fraction,
+            stratify=self._stratify_labels(y),
+        )
+        # sorted indices gather rows in memory order
+        return np.sort(train_rows), np.sort(validation_rows)
+
     def _check_output_model_compatibility(self, y):
         """Checks that the model output number and y shape match, reshape as needed.
         """
@@ -371,6 +1916,46 @@ class BaseWrapper:
 
         return y, extra_args
 
+    def _pre_process_fit_y(self, y):
+        """Pre-processes the target passed to `fit`, see `_pre_process_y`.
+
+        Subclasses override this method to pass declared target attributes
+        to `_pre_process_y`.
+        """
+        return self._pre_process_y(y)
+
+    def _encode_y(self, y):
+        """Processes y like `_pre_process_y`, but using the target attributes
+        learned when fitting instead of inferring them from y.
+
+        Used to process chunks of targets, which may not be representative of
+        the whole target.
+
+        Arguments:
+            y : 1D or 2D numpy array
+
+        Returns:
+            y : processed y, see `_pre_process_y`.
+        """
+        y, _ = self._pre_process_y(y)
+        return y
+
+    def _y_summary(self, y_chunks, classes=None):
+        """Summarizes chunks of targets into a small target from which
+        `_pre_process_y` infers the same attributes as from the whole target.
+
+        By default, the first chunk is used: only the number of outputs is
+        inferred from the target.
+
+        Arguments:
+            y_chunks : iterator over 2D numpy arrays
+            classes : declared classes, unused by default.
+
+        Returns:
+            y : 2D numpy array
+        """
+        return next(y_chunks)
+
     @staticmethod
     def _post_process_y(y):
         """Handles manipulation of predicted `y` values.
@@ -413,6 +1998,7 @@ class BaseWrapper:
         extra_args = dict()
         return X, extra_args
 
+    @_instrumented
     def fit(self, X, y, sample_weight=None, **kwargs):
         """Constructs a new model with `build_fn` & fit the model to `(X, y)`.
 
@@ -426,51 +2012,242 @@ class BaseWrapper:
                 Sample weights. The Keras Model must support this.
             **kwargs: dictionary arguments
                 Legal arguments are the arguments of the keras model's `fit`
-                method.
+                method.
+        Returns:
+            self : object
+                a reference to the instance that can be chain called
+                (ex: instance.fit(X,y).transform(X) )
+        Raises:
+            ValueError : In case of invalid shape for `y` argument.
+            ValuError : In case sample_weight != None and the Keras model's
+                `fit` method does not support that parameter.
+        """
+        # basic checks
+        with self._phase("validation"):
+            X, y = check_X_y(
+                X,
+                y,
+                accept_sparse=X_SPARSE_FORMAT,
+                allow_nd=True,  # allow X to have more than 2 dimensions
+                multi_output=True,  # allow y to be 2D
+                dtype=list(X_DTYPES),
+            )
+
+            if sample_weight is not None:
+                sample_weight = _check_sample_weight(
+                    sample_weight, X, dtype=["float64", "int"]
+                )
+
+        # pre process X, y
+        with self._phase("pre_process"):
+            X, _ = self._pre_process_X(X)
+            y, extra_args = self._pre_process_fit_y(y)
+        # update self.classes_, self.n_outputs_, self.n_classes_ and
+        #  self.cls_type_
+        for attr_name, attr_val in extra_args.items():
+            setattr(self, attr_name, attr_val)
+
+        # build model
+        with self._phase("build"):
+            self.model_ = self._build_keras_model(
+                X, y, sample_weight=sample_weight, **kwargs
+            )
+
+        with self._phase("pre_process"):
+            validation_rows = None
+            if self.early_stopping:
+                validation_rows = self._validation_split(y)
+            y = self._check_output_model_compatibility(y)
+
+        # fit model
+        return self._fit_keras_model(
+            X,
+            y,
+            sample_weight=sample_weight,
+            validation_rows=validation_rows,
+            **kwargs
+        )
+
+    @_instrumented
+    def partial_fit(self, X, y, classes=None, sample_weight=None, **kwargs):
+        """Fits the model to `(X, y)` incrementally.
+
+        The first call (or any call before `fit`) builds the model with
+        `build_fn` like `fit`. Subsequent calls continue training `model_`
+        for `epochs` epochs and encode `y` with the target attributes
+        learned by the first call (`classes_`, `n_outputs_keras_`, etc.).
+
+        Arguments:
+            X : array-like, shape `(n_samples, n_features)`
+                Training samples where `n_samples` is the number of samples
+                and `n_features` is the number of features.
+            y : array-like, shape `(n_samples,)` or `(n_samples, n_outputs)`
+                True labels for `X`.
+            classes : array-like of all labels, or a list of array-likes for
+                multi-output problems, default=None
+                Classes across all calls to `partial_fit`, only used by
+                classifiers on the first call. If not given, the classes
+                are inferred from the `y` of the first call.
+            sample_weight : array-like of shape (n_samples,), default=None
+                Sample weights. The Keras Model must support this.
+            **kwargs: dictionary arguments
+                Legal arguments are the arguments of the keras model's `fit`
+                method.
+        Returns:
+            self : object
+                a reference to the instance that can be chain called
+                (ex: instance.partial_fit(X,y).predict(X) )
+        Raises:
+            ValueError : If `y` contains labels that were not seen in the
+                first call or declared via `classes`.
+        """
+        with self._phase("validation"):
+            X, y, *sample_weight = self._validate_chunk((X, y, sample_weight))
+            sample_weight = sample_weight[0] if sample_weight else None
+
+        with self._phase("pre_process"):
+            # pre process X
+            X, _ = self._pre_process_X(X)
+
+            if not self.is_fitted_:
+                # infer target attributes from y or the declared classes
+                y_summary = self._y_summary(
+                    iter([BaseWrapper._pre_process_y(y)[0]]), classes=classes
+                )
+                _, extra_args = self._pre_process_fit_y(y_summary)
+                for attr_name, attr_val in extra_args.items():
+                    setattr(self, attr_name, attr_val)
+
+            # encode y with the target attributes of the first call
+            y = self._encode_y(y)
+
+        if not self.is_fitted_:
+            with self._phase("build"):
+                self.model_ = self._build_keras_model(
+                    X, y, sample_weight=sample_weight, **kwargs
+                )
+
+        with self._phase("pre_process"):
+            y = self._check_output_model_compatibility(y)
+
+        # continue training the existing model
+        return self._fit_keras_model(
+            X, y, sample_weight=sample_weight, **kwargs
+        )
+
+    def _validate_chunk(self, chunk):
+        """Validates a chunk of `(X, y)` or `(X, y, sample_weight)`."""
+        if len(chunk) not in (2, 3):
+            raise ValueError(
+                "Chunks must be tuples of (X, y) or (X, y, sample_weight),"
+                " got a chunk of length %s" % len(chunk)
+            )
+        X, y = check_X_y(
+            chunk[0],
+            chunk[1],
+            accept_sparse=X_SPARSE_FORMAT,
+            allow_nd=True,
+            multi_output=True,
+            dtype=list(X_DTYPES),
+        )
+        if len(chunk) == 3 and chunk[2] is not None:
+            sample_weight = _check_sample_weight(
+                chunk[2], X, dtype=["float64", "int"]
+            )
+            return X, y, sample_weight
+        return X, y
+
+    def _prepare_chunk(self, chunk):
+        """Validates and processes a chunk so that it can be fed to the
+        Keras model.
+        """
+        X, y, *sample_weight = self._validate_chunk(chunk)
+        X, _ = self._pre_process_X(X)
+        # chunks are densified whole, their size bounds the memory used
+        X = _densify(X)
+        if isinstance(X, list):
+            X = tuple(X)  # tf.data converts lists to tensors
+        y = self._check_output_model_compatibility(self._encode_y(y))
+        if isinstance(y, list):
+            y = tuple(y)
+        return (X, y, *sample_weight)
+
+    @_instrumented
+    def fit_stream(self, chunks, classes=None, **kwargs):
+        """Constructs a new model with `build_fn` & fit it to data that is
+        streamed in chunks instead of being held in memory.
+
+        The chunks are validated and processed one at a time, exactly like
+        the data passed to `fit`, and then split into batches of
+        `batch_size` samples. Chunks are consumed in order, shuffle them
+        upstream if needed.
+
+        For classifiers, the classes are discovered in a first pass over the
+        chunks, unless they are declared via `classes`. The model building
+        function receives the `X` and `y` of the first chunk.
+
+        Arguments:
+            chunks : `tf.data.Dataset`, re-iterable (ex: a list), or callable
+                returning a new iterator (ex: a generator function) of
+                `(X, y)` or `(X, y, sample_weight)` tuples of arrays.
+                One-shot iterators are not supported since chunks are read
+                once per epoch.
+            classes : array-like of all labels, or a list of array-likes for
+                multi-output problems, default=None
+                Skips the discovery pass. Only used by classifiers.
+            **kwargs: dictionary arguments
+                Legal arguments are the arguments of the keras model's `fit`
+                method. `validation_split` is not supported.
         Returns:
             self : object
                 a reference to the instance that can be chain called
-                (ex: instance.fit(X,y).transform(X) )
+                (ex: instance.fit_stream(chunks).predict(X) )
         Raises:
-            ValueError : In case of invalid shape for `y` argument.
-            ValuError : In case sample_weight != None and the Keras model's
-                `fit` method does not support that parameter.
+            TypeError : If `chunks` can only be iterated over once.
+            ValueError : If a chunk contains labels that are not in
+                `classes`.
         """
-        # basic checks
-        X, y = check_X_y(
-            X,
-            y,
-            allow_nd=True,  # allow X to have more than 2 dimensions
-            multi_output=True,  # allow y to be 2D
-        )
-
-        X = check_array(X, allow_nd=True, dtype=["float64", "int"])
-
-        if sample_weight is not None:
-            sample_weight = _check_sample_weight(
-                sample_weight, X, dtype=["float64", "int"]
+        chunks_factory = _as_chunks_factory(chunks)
+
+        # validate the first chunk, used to build the model
+        with self._phase("validation"):
+            first_chunk = self._validate_chunk(next(iter(chunks_factory())))
+        X, y = first_chunk[:2]
+
+        # infer target attributes from a small summary of the targets
+        with self._phase("pre_process"):
+            y_chunks = (
+                BaseWrapper._pre_process_y(
+                    check_array(chunk[1], ensure_2d=False, dtype=None)
+                )[0]
+                for chunk in chunks_factory()
             )
-
-        # pre process X, y
-        X, _ = self._pre_process_X(X)
-        y, extra_args = self._pre_process_y(y)
-        # update self.classes_, self.n_outputs_, self.n_classes_ and
-        #  self.cls_type_
-        for attr_name, attr_val in extra_args.items():
-            setattr(self, attr_name, attr_val)
+            y_summary = self._y_summary(y_chunks, classes=classes)
+            _, extra_args = self._pre_process_fit_y(y_summary)
+            for attr_name, attr_val in extra_args.items():
+                setattr(self, attr_name, attr_val)
+            X, _ = self._pre_process_X(X)
+            y = self._encode_y(y)
 
         # build model
-        self.model_ = self._build_keras_model(
-            X, y, sample_weight=sample_weight, **kwargs
-        )
+        with self._phase("build"):
+            self.model_ = self._build_keras_model(
+                X, y, sample_weight=None, **kwargs
+            )
 
-        y = self._check_output_model_compatibility(y)
+        # stream processed chunks to Keras
+        batch_size = kwargs.get("batch_size", getattr(self, "batch_size", 32))
+        dataset = _dataset_from_chunks(
+            lambda: (self._prepare_chunk(chunk) for chunk in chunks_factory()),
+            batch_size=batch_size or 32,
+        )
 
         # fit model
         return self._fit_keras_model(
-            X, y, sample_weight=sample_weight, **kwargs
+            dataset, None, sample_weight=None, **kwargs
         )
 
+    @_instrumented
     def predict(self, X, **kwargs):
         """Returns predictions for the given test data.
 
@@ -485,6 +2262,99 @@ class BaseWrapper:
             preds: array-like, shape `(n_samples,)`
                 Predictions.
         """
+        y_pred = self._predict_raw(X, **kwargs)
+
+        # post process y
+        with self._phase("post_process"):
+            y, _ = self._post_process_y(y_pred)
+        return y
+
+    def predict_iter(
+        self, X, chunk_size=PREDICT_CHUNK_SIZE, out=None, **kwargs
+    ):
+        """Yields predictions for the given test data one chunk at a time.
+
+        Only the outputs of the Keras model for one chunk are held in
+        memory at once, so that data larger than memory (ex: a memmap) can
+        be predicted.
+
+        Arguments:
+            X: array-like (ex: a memmap, sparse matrix or DataFrame), shape
+                `(n_samples, n_features)`, predicted `chunk_size` samples at
+                a time, or iterator (ex: generator) of array-likes of samples
+                (chunks).
+            chunk_size : int, default=PREDICT_CHUNK_SIZE
+                Number of samples per chunk when `X` is an array-like.
+            out : array-like, shape `(n_samples,)`, default=None
+                Array (ex: a memmap) the predictions are written into, in
+                order. The yielded chunks are then views of `out`.
+            **kwargs: dictionary arguments
+                Legal arguments are the arguments of `self.model_.predict`.
+
+        Yields:
+            preds: array-like, shape `(n_chunk_samples,)`
+                Predictions for a chunk.
+
+        Raises:
+            ValueError: If `out` is smaller than the data.
+        """
+        return self._predict_chunks(
+            X, chunk_size, out, lambda y, extra_args: y, **kwargs
+        )
+
+    def _predict_chunks(self, X, chunk_size, out, select, **kwargs):
+        """Yields the post-processed predictions for each chunk of `X`.
+
+        Arguments:
+            X, chunk_size, out : see `predict_iter`.
+            select : callable returning the result of a chunk from the
+                outputs of `_post_process_y`.
+            **kwargs: arguments of `self.model_.predict`.
+        """
+        start = 0
+        for X_chunk in _iter_chunks(X, chunk_size):
+            n_samples = _num_samples(X_chunk)
+            if n_samples == 0:
+                continue
+            # chunks differ from each other, memoizing them is wasteful
+            outputs = self._predict_raw(X_chunk, memoize=False, **kwargs)
+            y_chunk = _with_samples(
+                select(*self._post_process_y(outputs)), n_samples
+            )
+            stop = start + n_samples
+            if out is not None:
+                if stop > len(out):
+                    raise ValueError(
+                        "`out` has %s samples, but X has more" % len(out)
+                    )
+                out[start:stop] = y_chunk
+                y_chunk = out[start:stop]
+            start = stop
+            yield y_chunk
+
+    def _predict_raw(self, X, memoize=None, **kwargs):
+        """Returns the raw outputs of the Keras model for the given test data.
+
+        If `memoize_predictions` is set and the outputs for the same `X` and
+        arguments were already computed since the last call to `fit`, the
+        network is not run again and a copy of those outputs is returned.
+
+        Arguments:
+            X: array-like, shape `(n_samples, n_features)`
+                Test samples where `n_samples` is the number of samples
+                and `n_features` is the number of features.
+            memoize: bool, default=None
+                Overrides `memoize_predictions` if not None.
+            **kwargs: dictionary arguments
+                Legal arguments are the arguments of `self.model_.predict`.
+
+        Returns:
+            outputs: array or list of arrays
+                Outputs of `self.model_.predict`.
+
+        Raises:
+            NotFittedError: If the estimator was not fit yet.
+        """
         # check if fitted
         if not self.is_fitted_:
             raise NotFittedError(
@@ -493,25 +2363,94 @@ class BaseWrapper:
             )
 
         # basic input checks
-        X = check_array(X, allow_nd=True, dtype=["float64", "int"])
+        with self._phase("validation"):
+            X = self._validate_X(X, accept_sparse=True)
+
+        # filter kwargs and get attributes for predict, `_filter_params`
+        # returns the attributes when there are no kwargs to check
+        if kwargs:
+            kwargs = self._filter_params(
+                self.model_.predict, params_to_check=kwargs
+            )
+        predict_args = self._filter_params(self.model_.predict)
+        pred_args = {**predict_args, **kwargs}
 
-        # pre process X
-        X, _ = self._pre_process_X(X)
+        if memoize is None:
+            memoize = self.memoize_predictions
+        if memoize:
+            key = (id(self.model_), _array_key(X), _value_key(pred_args))
+            memo = _PREDICT_MEMO.get(self)
+            if memo is not None and memo[0] == key:
+                # copy, so that the caller can not alter the memo
+                return nest.map_structure(np.copy, memo[1])
 
-        # filter kwargs and get attributes for predict
-        kwargs = self._filter_params(
-            self.model_.predict, params_to_check=kwargs
-        )
-        predict_args = self._filter_params(self.model_.predict)
+        # pre process X
+        with self._phase("pre_process"):
+            X, _ = self._pre_process_X(X)
 
         # predict with Keras model
-        pred_args = {**predict_args, **kwargs}
-        y_pred = self.model_.predict(X, **pred_args)
+        with self._phase("predict"):
+            if (
+                _is_sparse(X)
+                and nest.flatten(X)[0].shape[0]
+                <= self.fast_predict_max_samples
+            ):
+                X = _densify(X)
+            outputs = None
+            # arguments passed to `predict` are honored by `model_.predict`
+            if not kwargs and not pred_args.get("callbacks"):
+                outputs = self._predict_fast(X)
+            if outputs is None and _is_sparse(X):
+                pred_args = dict(pred_args)
+                batch_size = pred_args.pop("batch_size", None) or 32
+                outputs = self.model_.predict(
+                    _batch_dataset(X, batch_size=batch_size), **pred_args
+                )
+            if outputs is None:
+                outputs = self.model_.predict(X, **pred_args)
 
-        # post process y
-        y, _ = self._post_process_y(y_pred)
-        return y
+        if memoize:
+            _PREDICT_MEMO[self] = (key, nest.map_structure(np.copy, outputs))
+        return outputs
+
+    def _predict_fast(self, X):
+        """Runs the Keras model on small inputs without `model_.predict`.
+
+        `model_.predict` sets up a data adapter, callbacks and a progress
+        bar on every call, which dominates the latency of predicting a few
+        samples. Instead, a function of the model is traced once for the
+        input signature recorded during `fit` and called directly.
 
+        Models whose class overrides `predict`, `predict_step` or
+        `make_predict_function` always go through `model_.predict`.
+
+        Arguments:
+            X : numpy array or list of numpy arrays, pre-processed inputs.
+
+        Returns:
+            outputs : numpy array or list of numpy arrays, or None if `X` is
+                larger than `fast_predict_max_samples`, does not match the
+                input signature or the model customizes `predict`, in which
+                case `model_.predict` must be used.
+        """
+        signature = self.__dict__.get("_predict_signature")
+        if nest.flatten(X)[0].shape[0] > self.fast_predict_max_samples:
+            return None
+        model = self.model_
+        if _overrides_predict(model):
+            return None
+        X = _match_signature(X, signature)
+        if X is None:
+            return None
+
+        cached = _FAST_PREDICT_FNS.get(self)
+        if cached is None or cached[0] is not model:
+            cached = (model, _inference_fn(model, signature))
+            _FAST_PREDICT_FNS[self] = cached
+        outputs = cached[1](X)
+        return nest.map_structure(lambda output: output.numpy(), outputs)
+
+    @_instrumented
     def score(self, X, y, sample_weight=None, **kwargs):
         """Returns the mean accuracy on the given test data and labels.
 
@@ -541,15 +2480,38 @@ class BaseWrapper:
                 sample_weight, X, dtype=["float64", "int"]
             )
 
-        # pre process X, y
-        _, extra_args = self._pre_process_y(y)
-
-        # compute Keras model score
+        # compute Keras model score, y is compared with the predictions as
+        # is, there is no need to encode it
         y_pred = self.predict(X, **kwargs)
 
-        return self._scorer(y, y_pred, sample_weight=sample_weight)
+        with self._phase("score"):
+            return self._scorer(y, y_pred, sample_weight=sample_weight)
+
+    @staticmethod
+    def _validate_X(X, accept_sparse=False):
+        """Validates X for `predict` and similar methods.
+
+        Arrays with a dtype in `X_DTYPES` are returned as is, without copying
+        them, so that float32 and float16 inputs are passed to Keras directly.
+
+        Arguments:
+            X : array-like or scipy sparse matrix,
+                shape `(n_samples, n_features)`
+            accept_sparse : bool, default=False
+                whether sparse matrices are accepted, they are converted to
+                `X_SPARSE_FORMAT`.
+
+        Returns:
+            X : numpy array, or CSR matrix
+        """
+        return check_array(
+            X,
+            accept_sparse=X_SPARSE_FORMAT if accept_sparse else False,
+            allow_nd=True,
+            dtype=list(X_DTYPES),
+        )
 
-    def _filter_params(self, fn, params_to_check=None):
+    def _filter_params(self, fn, params_to_check=None, accept_all=False):
         """Filters all instance attributes (parameters) and
              returns those in `fn`'s arguments.
 
@@ -557,16 +2519,61 @@ class BaseWrapper:
             fn : arbitrary function
             params_to_check : dictionary, parameters to check.
                 Defaults to checking all attributes of this estimator.
+            accept_all : bool, default=False
+                Whether `**kwargs` in the signature of `fn` accepts all
+                parameters, see `has_arg`.
 
         Returns:
             res : dictionary containing variables
                 in both self and `fn`'s arguments.
         """
-        res = {}
-        for name, value in (params_to_check or self.__dict__).items():
-            if has_arg(fn, name):
-                res.update({name: value})
-        return res
+        if params_to_check:
+            arg_names = _SIGNATURE_CACHE.arg_names(fn, accept_all)
+            return {
+                name: value
+                for name, value in params_to_check.items()
+                if name in arg_names
+            }
+        return {
+            name: self.__dict__[name]
+            for name in self._routed_params(fn, accept_all)
+        }
+
+    def _routed_params(self, fn, accept_all=False):
+        """Returns the names of the instance attributes accepted by `fn`.
+
+        Results are kept in a routing table that is valid for as long as the
+        set of attribute names does not change. New fitted attributes or a
+        call to `set_params` invalidate it.
+
+        Arguments:
+            fn : arbitrary function
+            accept_all : bool, see `_filter_params`.
+
+        Returns:
+            names : tuple of attribute names.
+        """
+        routing = _PARAMS_ROUTING.get(self)
+        if routing is None or self.__dict__.keys() != routing[0]:
+            routing = (frozenset(self.__dict__), dict())
+            _PARAMS_ROUTING[self] = routing
+        attr_names, routing_table = routing
+        key = (getattr(fn, "__func__", fn), accept_all)
+        try:
+            return routing_table[key]
+        except (KeyError, TypeError):  # TypeError: unhashable key
+            pass
+        arg_names = _SIGNATURE_CACHE.arg_names(fn, accept_all)
+        names = tuple(name for name in attr_names if name in arg_names)
+        try:
+            routing_table[key] = names
+        except TypeError:
+            pass
+        return names
+
+    def _invalidate_params_routing(self):
+        """Clears the routing table used by `_filter_params`."""
+        _PARAMS_ROUTING.pop(self, None)
 
     def _get_param_names(self):
         """Get parameter names for the estimator"""
@@ -650,6 +2657,8 @@ class BaseWrapper:
         for key, sub_params in nested_params.items():
             valid_params[key].set_params(**sub_params)
 
+        self._invalidate_params_routing()
+
         return self
 
     def _more_tags(self):
@@ -717,6 +2726,29 @@ class BaseWrapper:
             state[key] = _pack_obj(val)
         return state
 
+    def __reduce_ex__(self, protocol):
+        """Reduces the instance for pickling.
+
+        With pickle protocol 5 and above, the state is not copied and the
+        weights of Keras models are serialized as out-of-band buffers, see
+        `_pack_out_of_band`. Pass a `buffer_callback` to `pickle.dumps` and
+        the collected buffers to `pickle.loads` to avoid copying them into
+        the pickle stream. Lower protocols (and `copy.deepcopy`) use
+        `__getstate__`.
+
+        Arguments:
+            protocol : int
+                pickle protocol version.
+        """
+        if protocol < 5 or _PickleBuffer is None:
+            return super().__reduce_ex__(protocol)
+        memo = dict()
+        state = {
+            key: _pack_out_of_band(val, memo)
+            for key, val in self.__dict__.items()
+        }
+        return copyreg.__newobj__, (type(self),), state
+
     def __setstate__(self, state):
         """Set state of live object from state saved via __getstate__.
 
@@ -741,7 +2773,9 @@ class BaseWrapper:
                         training_config
                     )
                 )
-                restored_model.set_weights(obj.weights)
+                restored_model.set_weights(
+                    [_unpack_weight(w) for w in obj.weights]
+                )
                 return restored_model
             if hasattr(obj, "__dict__"):
                 for key, val in obj.__dict__.items():
@@ -760,65 +2794,152 @@ class BaseWrapper:
 
 class KerasClassifier(BaseWrapper):
     """Implementation of the scikit-learn classifier API for Keras.
+
+    Arguments:
+        classes: array-like of labels, or a list of array-likes of labels
+            for multi-output problems, default=None
+            When set, `fit` uses these classes instead of discovering them
+            with `np.unique`, and raises if `y` contains other labels.
+        target_type: str, default=None
+            When set, `fit` uses this type of target ("binary",
+            "multiclass", "multilabel-indicator" or
+            "multiclass-multioutput") instead of inferring it with
+            `type_of_target`. If only `classes` is set, the type of target
+            is inferred from the declared classes.
+        other arguments: see `BaseWrapper`.
     """
 
     _estimator_type = "classifier"
     _scorer = staticmethod(sklearn_accuracy_score)
 
+    # targets of outputs with a categorical loss and more classes than this
+    # are kept as integer labels and one-hot encoded per batch when fitting,
+    # instead of being one-hot encoded whole
+    max_one_hot_classes = 256
+
+    def __init__(
+        self,
+        build_fn=None,
+        warm_start=False,
+        memoize_predictions=False,
+        cache_models=False,
+        record_timings=False,
+        timings_sink=None,
+        early_stopping=False,
+        validation_fraction=0.1,
+        n_iter_no_change=10,
+        max_time=None,
+        classes=None,
+        target_type=None,
+        **sk_params
+    ):
+        self.classes = classes
+        self.target_type = target_type
+        super().__init__(
+            build_fn=build_fn,
+            warm_start=warm_start,
+            memoize_predictions=memoize_predictions,
+            cache_models=cache_models,
+            record_timings=record_timings,
+            timings_sink=timings_sink,
+            early_stopping=early_stopping,
+            validation_fraction=validation_fraction,
+            n_iter_no_change=n_iter_no_change,
+            max_time=max_time,
+            **sk_params
+        )
+
     def _more_tags(self):
         return {"multilabel": True}
 
     @staticmethod
-    def _pre_process_y(y):
+    def _pre_process_y(y, classes=None, target_type=None):
         """Handles manipulation of y inputs to fit or score.
 
              For KerasClassifier, this handles interpreting classes from `y`.
 
         Arguments:
             y : 1D or 2D numpy array
+            classes : declared classes, see `KerasClassifier`, default=None
+                skips discovering the classes, `y` is checked to only
+                contain these classes instead.
+            target_type : declared type of target, default=None
+                skips `type_of_target`.
 
         Returns:
             y : modified 2D numpy array with 0 indexed integer class labels.
             classes_ : list of original class labels.
             n_classes_ : number of classes.
             one_hot_encoded : True if input y was one-hot-encoded.
+
+        Raises:
+            ValueError : if `y` contains labels that were not declared.
         """
         y, _ = super(KerasClassifier, KerasClassifier)._pre_process_y(y)
 
-        cls_type_ = type_of_target(y)
+        if classes is not None:
+            classes = _classes_per_output(classes)
+            if len(classes) != y.shape[1]:
+                raise ValueError(
+                    "y has %s outputs, but classes were declared for %s"
+                    % (y.shape[1], len(classes))
+                )
+
+        if target_type is not None:
+            cls_type_ = target_type
+        elif classes is not None:
+            cls_type_ = _target_type_from_classes(classes)
+        else:
+            cls_type_ = type_of_target(y)
 
         n_outputs_ = y.shape[1]
 
-        if cls_type_ == "binary":
-            # y = array([1, 0, 1, 0])
-            # single task, single label, binary classification
-            n_outputs_keras_ = 1  # single sigmoid output expected
-            classes_ = np.unique(y)
-            # convert to 0 indexed classes
-            y = np.searchsorted(classes_, y)
-            classes_ = [classes_]
-            y = [y]
-        elif cls_type_ == "multiclass":
-            # y = array([1, 5, 2])
-            n_outputs_keras_ = 1  # single softmax output expected
-            classes_ = np.unique(y)
-            # convert to 0 indexed classes
-            y = np.searchsorted(classes_, y)
-            classes_ = [classes_]
-            y = [y]
+        if cls_type_ in ("binary", "multiclass") and n_outputs_ > 1:
+            raise ValueError(
+                "y has %s outputs, but the declared type of target %r has 1"
+                % (n_outputs_, cls_type_)
+            )
+
+        if cls_type_ in ("binary", "multiclass"):
+            # y = array([1, 0, 1, 0]) or y = array([1, 5, 2])
+            # single sigmoid or softmax output expected
+            n_outputs_keras_ = 1
+            if classes is not None:
+                # check and convert to 0 indexed classes
+                classes_ = classes
+                y = [_encode_labels(y, classes_[0])]
+            else:
+                # find the classes and convert to 0 indexed classes in one
+                # pass
+                classes_, y_encoded = _unique_inverse(y)
+                classes_ = [classes_]
+                y = [y_encoded.reshape(y.shape)]
         elif cls_type_ == "multilabel-indicator":
             # y = array([1, 1, 1, 0], [0, 0, 1, 1])
-            # split into lists for multi-output Keras
+            # split into views of the columns for multi-output Keras
             # will be processed as multiple binary classifications
             classes_ = [np.array([0, 1])] * y.shape[1]
-            y = np.split(y, y.shape[1], axis=1)
+            if target_type is not None or classes is not None:
+                # not checked by type_of_target
+                _encode_labels(y, classes_[0])
+            y = [y[:, i : i + 1] for i in range(y.shape[1])]
             n_outputs_keras_ = len(y)
         elif cls_type_ == "multiclass-multioutput":
             # y = array([1, 0, 5], [2, 1, 3])
             # split into lists for multi-output Keras
             # each will be processesed as a seperate multiclass problem
-            y = np.split(y, y.shape[1], axis=1)
-            classes_ = [np.unique(y_) for y_ in y]
+            classes_, y_encoded = [], []
+            for i in range(y.shape[1]):
+                if classes is not None:
+                    classes_.append(classes[i])
+                    y_encoded.append(
+                        _encode_labels(y[:, i : i + 1], classes[i])
+                    )
+                    continue
+                classes_i, y_ = _unique_inverse(y[:, i])
+                classes_.append(classes_i)
+                y_encoded.append(y_.reshape(-1, 1))
+            y = y_encoded
             n_outputs_keras_ = len(y)
         else:
             raise ValueError("Unknown label type: %r" % cls_type_)
@@ -844,10 +2965,73 @@ class KerasClassifier(BaseWrapper):
 
         return y, extra_args
 
+    def _encode_y(self, y):
+        """Encodes y with the classes learned when fitting.
+
+        Arguments:
+            y : 1D or 2D numpy array
+
+        Returns:
+            y : list of 2D numpy arrays with 0 indexed integer class labels,
+                one per Keras output.
+
+        Raises:
+            ValueError : if y contains unknown labels or has the wrong number
+                of outputs.
+        """
+        y, _ = BaseWrapper._pre_process_y(y)
+        if self.n_outputs_ == 1:
+            classes_ = [self.classes_]
+        else:
+            classes_ = self.classes_
+        if y.shape[1] != len(classes_):
+            raise ValueError(
+                "y has %s outputs, but the estimator was fitted with %s"
+                % (y.shape[1], len(classes_))
+            )
+        return [
+            _encode_labels(y[:, i : i + 1], classes)
+            for i, classes in enumerate(classes_)
+        ]
+
+    def _pre_process_fit_y(self, y):
+        """Pre-processes the target passed to `fit` with the declared
+        `classes` and `target_type`, if any.
+        """
+        if self.classes is None and self.target_type is None:
+            return self._pre_process_y(y)
+        return self._pre_process_y(
+            y, classes=self.classes, target_type=self.target_type
+        )
+
+    def _y_summary(self, y_chunks, classes=None):
+        """Collects the classes of each output over all chunks of targets,
+        unless `classes` are declared, as an argument or a parameter.
+        """
+        if classes is None:
+            classes = self.classes
+        if classes is not None:
+            return _y_from_classes(_classes_per_output(classes))
+        for y in y_chunks:
+            chunk_classes = [np.unique(y[:, i]) for i in range(y.shape[1])]
+            if classes is None:
+                classes = chunk_classes
+            else:
+                classes = [
+                    np.union1d(known, new)
+                    for known, new in zip(classes, chunk_classes)
+                ]
+        return _y_from_classes(classes)
+
     def _post_process_y(self, y):
         """Reverts _pre_process_inputs to return predicted probabilites
              in formats sklearn likes as well as retrieving the original
              classes.
+
+        The predictions and probabilities are written into preallocated
+        arrays, without intermediate copies of the outputs. The outputs of
+        single-output models are returned as probabilities as is, unless
+        they come from a single sigmoid unit.
         """
         if not isinstance(y, list):
             # convert single-target y to a list for easier processing
@@ -860,63 +3044,143 @@ class KerasClassifier(BaseWrapper):
         else:
             cls_ = self.classes_
 
-        y = copy.deepcopy(y)
         cls_type_ = self.cls_type_
+        if cls_type_ not in (
+            "binary",
+            "multiclass",
+            "multilabel-indicator",
+            "multiclass-multioutput",
+        ):
+            raise ValueError(
+                "Unknown classification task type '%s'" % cls_type_
+            )
 
-        class_predictions = []
-        for i, (y_, classes_) in enumerate(zip(y, cls_)):
-            if cls_type_ == "binary":
-                if y_.shape[1] == 1:
-                    # result from a single sigmoid output
-                    class_predictions.append(
-                        classes_[np.where(y_ > 0.5, 1, 0)]
+        y = [y_.reshape(-1, 1) if y_.ndim == 1 else y_ for y_ in y]
+        n_samples = y[0].shape[0]
+
+        # a single sigmoid output is expanded to 2 columns
+        # array([0.9], [.2]) -> array([0.1, 0.9], [.8, .2])
+        expand = [cls_type_ == "binary" and y_.shape[1] == 1 for y_ in y]
+        if len(y) == 1 and not expand[0]:
+            class_probabilities = y[0]
+        else:
+            class_probabilities = np.empty(
+                (n_samples, sum(y_.shape[1] + e for y_, e in zip(y, expand))),
+                dtype=np.result_type(*y),
+            )
+            col = 0
+            for y_, e in zip(y, expand):
+                if e:
+                    np.subtract(
+                        1, y_, out=class_probabilities[:, col : col + 1]
                     )
-                    # reformat so that we have 2 columns
-                    y[i] = np.concatenate([1 - y_, y_], axis=1)
-                else:
-                    # array([0.9, 0.1], [.2, .8]) -> array(['yes', 'no'])
-                    class_predictions.append(
-                        classes_[np.argmax(np.where(y_ > 0.5, 1, 0), axis=1)]
+                    col += 1
+                class_probabilities[:, col : col + y_.shape[1]] = y_
+                col += y_.shape[1]
+
+        # each output is predicted into its own column(s)
+        if cls_type_ == "multilabel-indicator":
+            widths = [y_.shape[1] for y_ in y]
+            dtype = np.int_
+        else:
+            widths = [1] * len(y)
+            dtype = np.result_type(*(classes_.dtype for classes_ in cls_))
+        class_predictions = np.empty(
+            (n_samples, sum(widths)), dtype=dtype, order="F"
+        )
+        col = 0
+        for y_, classes_, width in zip(y, cls_, widths):
+            out = class_predictions[:, col : col + width]
+            if cls_type_ == "multilabel-indicator":
+                np.greater(y_, 0.5, out=out)
+            elif cls_type_ == "binary":
+                # array([0.9, 0.1], [.2, .8]) -> array(['yes', 'no'])
+                # picks the first column above 0.5, or the first class
+                out[:, 0] = classes_[0]
+                # if y had a single class when fit, it is always predicted
+                if len(classes_) > 1:
+                    positive = y_[:, -1] > 0.5
+                    if y_.shape[1] > 1:
+                        negative = y_[:, 0] > 0.5
+                        np.logical_and(
+                            positive,
+                            np.logical_not(negative, out=negative),
+                            out=positive,
+                        )
+                    np.copyto(
+                        out[:, 0],
+                        classes_[1],
+                        where=positive,
+                        casting="unsafe",
                     )
-            elif cls_type_ == "multiclass":
+            else:
                 # array([0.8, 0.1, 0.1], [.1, .8, .1]) ->
                 # array(['apple', 'orange'])
-                class_predictions.append(classes_[np.argmax(y_, axis=1)])
-            elif cls_type_ == "multilabel-indicator":
-                class_predictions.append(np.where(y_ > 0.5, 1, 0))
-            elif cls_type_ == "multiclass-multioutput":
-                # array([0.9, 0.1], [.2, .8]) -> array(['apple', 'fruit'])
-                class_predictions.append(classes_[np.argmax(y_, axis=1)])
-            else:
-                raise ValueError(
-                    "Unknown classification task type '%s'" % cls_
-                )
+                indices = np.argmax(y_, axis=1)
+                if classes_.dtype == dtype:
+                    np.take(classes_, indices, out=out[:, 0])
+                else:
+                    out[:, 0] = classes_[indices]
+            col += width
 
-        class_probabilities = np.squeeze(np.column_stack(y))
+        extra_args = {"class_probabilities": np.squeeze(class_probabilities)}
 
-        y = np.squeeze(np.column_stack(class_predictions))
+        return np.squeeze(class_predictions), extra_args
 
-        extra_args = {"class_probabilities": class_probabilities}
+    def _categorical_outputs(self):
+        """Returns the outputs with a categorical crossentropy loss, as a
+        dictionary of output indices to number of classes.
+        """
+        if isinstance(self.model_.loss, list):
+            losses = self.model_.loss
+        else:
+            losses = [self.model_.loss] * self.n_outputs_
+        if self.n_outputs_ == 1:
+            n_classes_ = [self.n_classes_]
+        else:
+            n_classes_ = self.n_classes_
+        return {
+            i: n_classes
+            for i, (loss, n_classes) in enumerate(zip(losses, n_classes_))
+            if is_categorical_crossentropy(loss)
+        }
 
-        return y, extra_args
+    def _one_hot_outputs(self):
+        """Returns the categorical outputs with more than
+        `max_one_hot_classes` classes.
+        """
+        return {
+            i: n_classes
+            for i, n_classes in self._categorical_outputs().items()
+            if n_classes > self.max_one_hot_classes
+        }
+
+    def _stratify_labels(self, y):
+        """Returns the encoded labels of single-output binary and multiclass
+        targets.
+        """
+        if self.cls_type_ in ("binary", "multiclass"):
+            return y[0].ravel()
+        return None
 
     def _check_output_model_compatibility(self, y):
         """Checks that the model output number and loss functions match y.
         """
         # check loss function to adjust the encoding of the input
         # we need to do this to mimick scikit-learn behavior
-        if isinstance(self.model_.loss, list):
-            losses = self.model_.loss
-        else:
-            losses = [self.model_.loss] * self.n_outputs_
-        for i, (loss, y_) in enumerate(zip(losses, y)):
-            if is_categorical_crossentropy(loss) and (
-                y_.ndim == 1 or y_.shape[1] == 1
-            ):
-                y[i] = to_categorical(y_)
+        for i, n_classes in self._categorical_outputs().items():
+            y_ = y[i]
+            if n_classes > self.max_one_hot_classes:
+                # one-hot encoded per batch, see `_one_hot_outputs`
+                continue
+            if y_.ndim == 1 or y_.shape[1] == 1:
+                # the number of classes is explicit since y may be a chunk
+                # of the target that does not contain all classes
+                y[i] = to_categorical(y_, num_classes=n_classes)
 
         return super()._check_output_model_compatibility(y)
 
+    @_instrumented
     def predict_proba(self, X, **kwargs):
         """Returns class probability estimates for the given test data.
 
@@ -936,36 +3200,73 @@ class KerasClassifier(BaseWrapper):
                 will return an array of shape `(n_samples, 2)`
                 (instead of `(n_sample, 1)` as in Keras).
         """
-        # check if fitted
-        if not self.is_fitted_:
-            raise NotFittedError(
-                "Estimator %s needs to be fit before `predict` "
-                "can be called" % self
-            )
-
-        # basic input checks
-        X = check_array(X, allow_nd=True, dtype=["float64", "int"])
-
-        # pre process X
-        X, _ = self._pre_process_X(X)
-
-        # filter kwargs and get attributes that are inputs to model.predict
-        kwargs = self._filter_params(
-            self.model_.predict, params_to_check=kwargs
-        )
-        predict_args = self._filter_params(self.model_.predict)
-
         # call the Keras model
-        predict_args = {**predict_args, **kwargs}
-        outputs = self.model_.predict(X, **predict_args)
+        outputs = self._predict_raw(X, **kwargs)
 
         # join list of outputs into single output array
-        _, extra_args = self._post_process_y(outputs)
+        with self._phase("post_process"):
+            _, extra_args = self._post_process_y(outputs)
 
         class_probabilities = extra_args["class_probabilities"]
 
         return class_probabilities
 
+    @_instrumented
+    def predict_with_proba(self, X, **kwargs):
+        """Returns class predictions and probability estimates for the given
+        test data, running the Keras model only once.
+
+        Arguments:
+            X: array-like, shape `(n_samples, n_features)`
+                Test samples where `n_samples` is the number of samples
+                and `n_features` is the number of features.
+            **kwargs: dictionary arguments
+                Legal arguments are the arguments of `self.model_.predict`.
+
+        Returns:
+            preds: array-like, shape `(n_samples,)`
+                Class predictions, as returned by `predict`.
+            proba: array-like, shape `(n_samples, n_outputs)`
+                Class probability estimates, as returned by `predict_proba`.
+        """
+        outputs = self._predict_raw(X, **kwargs)
+        with self._phase("post_process"):
+            y, extra_args = self._post_process_y(outputs)
+        return y, extra_args["class_probabilities"]
+
+    def predict_proba_iter(
+        self, X, chunk_size=PREDICT_CHUNK_SIZE, out=None, **kwargs
+    ):
+        """Yields class probability estimates for the given test data one
+        chunk at a time, see `predict_iter`.
+
+        Arguments:
+            X: array-like, shape `(n_samples, n_features)`, or iterator of
+                chunks.
+            chunk_size : int, default=PREDICT_CHUNK_SIZE
+                Number of samples per chunk when `X` is an array-like.
+            out : array-like, shape `(n_samples, n_outputs)`, default=None
+                Array (ex: a memmap) the probabilities are written into, in
+                order. The yielded chunks are then views of `out`.
+            **kwargs: dictionary arguments
+                Legal arguments are the arguments of `self.model_.predict`.
+
+        Yields:
+            proba: array-like, shape `(n_chunk_samples, n_outputs)`
+                Class probability estimates for a chunk, as returned by
+                `predict_proba`.
+
+        Raises:
+            ValueError: If `out` is smaller than the data.
+        """
+        return self._predict_chunks(
+            X,
+            chunk_size,
+            out,
+            lambda y, extra_args: extra_args["class_probabilities"],
+            **kwargs
+        )
+
 
 class KerasRegressor(BaseWrapper):
     """Implementation of the scikit-learn regressor API for Keras.
@@ -976,11 +3277,17 @@ class KerasRegressor(BaseWrapper):
 
     n_outputs_ = None
 
+    @_instrumented
     def fit(self, X, y, sample_weight=None, **kwargs):
         """Convert y to float, regressors cannot accept ints."""
         y = check_array(y, dtype="float64", ensure_2d=False)
         return super().fit(X, y, sample_weight=sample_weight, **kwargs)
 
+    def _encode_y(self, y):
+        """Convert y to float, regressors cannot accept ints."""
+        y = check_array(y, dtype="float64", ensure_2d=False)
+        return super()._encode_y(y)
+
     def _post_process_y(self, y):
         """Ensures output is float64 and squeeze."""
         return np.squeeze(y.astype("float64")), dict()
@@ -1003,6 +3310,7 @@ class KerasRegressor(BaseWrapper):
 
         return y, extra_args
 
+    @_instrumented
     def score(self, X, y, sample_weight=None, **kwargs):
         """Returns the mean loss on the given test data and labels.
 
@@ -1047,3 +3355,126 @@ class KerasRegressor(BaseWrapper):
         ss_res = K.sum(K.square(y_true - y_pred), axis=0)
         ss_tot = K.sum(K.square(y_true - K.mean(y_true, axis=0)), axis=0)
         return K.mean(1 - ss_res / (ss_tot + K.epsilon()), axis=-1)
+
+
+class _ModelPickler(pickle.Pickler):
+    """Pickles everything but Keras models, which are written to the weight
+    store of `save_estimator` and referenced by their index.
+    """
+
+    def __init__(self, file, path, manifest):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._path = path
+        self._manifest = manifest
+        self._model_ids = dict()
+
+    def persistent_id(self, obj):
+        if not isinstance(obj, Model):
+            return None
+        if id(obj) not in self._model_ids:
+            index = len(self._manifest["models"])
+            self._model_ids[id(obj)] = (index, obj)  # keep obj alive
+            model_dir = "model_%d" % index
+            os.makedirs(os.path.join(self._path, model_dir), exist_ok=True)
+            weight_files = []
+            for i, weight in enumerate(obj.get_weights()):
+                weight_file = os.path.join(model_dir, "weight_%d.npy" % i)
+                np.save(os.path.join(self._path, weight_file), weight)
+                weight_files.append(weight_file)
+            self._manifest["models"].append(
+                {
+                    "model": serialize(obj),
+                    "training_config": saving_utils.model_metadata(obj)[
+                        "training_config"
+                    ],
+                    "weights": weight_files,
+                }
+            )
+        return ("keras_model", self._model_ids[id(obj)][0])
+
+
+class _ModelUnpickler(pickle.Unpickler):
+    """Unpickles the state written by `_ModelPickler`, loading Keras models
+    from the weight store of `save_estimator`.
+    """
+
+    def __init__(self, file, path, manifest):
+        super().__init__(file)
+        self._path = path
+        self._manifest = manifest
+        self._models = dict()
+
+    def persistent_load(self, pid):
+        kind, index = pid
+        if kind != "keras_model":
+            raise pickle.UnpicklingError("Unknown persistent id %r" % (pid,))
+        if index not in self._models:
+            saved = self._manifest["models"][index]
+            model = deserialize(saved["model"])
+            model.compile(
+                **saving_utils.compile_args_from_training_config(
+                    saved["training_config"]
+                )
+            )
+            model.set_weights(
+                [
+                    np.load(os.path.join(self._path, weight_file))
+                    for weight_file in saved["weights"]
+                ]
+            )
+            self._models[index] = model
+        return self._models[index]
+
+
+def save_estimator(estimator, path):
+    """Saves an estimator to the directory `path`.
+
+    The architecture and compilation parameters of Keras models are written
+    to a small JSON manifest and their weights to one `.npy` file per weight.
+    All other attributes of the estimator are pickled.
+
+    Arguments:
+        estimator : BaseWrapper instance.
+        path : str
+            directory to save the estimator to, created if needed. Existing
+            files are overwritten.
+    """
+    os.makedirs(path, exist_ok=True)
+    manifest = {"format_version": SAVE_FORMAT_VERSION, "models": []}
+    with open(os.path.join(path, ESTIMATOR_FILE), "wb") as f:
+        _ModelPickler(f, path, manifest).dump(
+            (type(estimator), estimator.__dict__)
+        )
+    with open(os.path.join(path, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, default=serialization.get_json_type)
+
+
+def load_estimator(path):
+    """Loads an estimator saved by `save_estimator`.
+
+    The Keras models are rebuilt from the manifest and each weight file is
+    read into the variables of its model. Every process loading the files
+    holds its own copy of the weights.
+
+    Arguments:
+        path : str
+            directory the estimator was saved to.
+
+    Returns:
+        estimator : the loaded estimator.
+
+    Raises:
+        ValueError : If the directory was saved in an unsupported format.
+    """
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") != SAVE_FORMAT_VERSION:
+        raise ValueError(
+            "Unsupported format version %r in %s"
+            % (manifest.get("format_version"), path)
+        )
+    with open(os.path.join(path, ESTIMATOR_FILE), "rb") as f:
+        cls, state = _ModelUnpickler(f, path, manifest).load()
+    estimator = cls.__new__(cls)
+    estimator.__dict__.update(state)
+    return estimator
@@ -0,0 +1,183 @@
+"""Tests for the parallel hyperparameter search."""
+import multiprocessing
+
+import numpy as np
+import pytest
+from sklearn.model_selection import GridSearchCV
+from tensorflow.python.framework import random_seed
+from tensorflow.python.keras.layers import Dense
+from tensorflow.python.keras.models import Sequential
+
+from sklearn_keras_wrap import model_selection
+from sklearn_keras_wrap.model_selection import SharedMemorySearchCV
+from sklearn_keras_wrap.wrappers import KerasClassifier
+
+
+def build_fn_clf(X, n_classes_, hidden_dim=4):
+    """Builds a small classifier with deterministic initial weights."""
+    random_seed.set_seed(0)
+    model = Sequential(
+        [
+            Dense(hidden_dim, activation="relu", input_shape=X.shape[1:]),
+            Dense(n_classes_, activation="softmax"),
+        ]
+    )
+    model.compile("sgd", loss="categorical_crossentropy")
+    return model
+
+
+def read_shared(name, index):
+    """Reads an element of a shared array, in a worker."""
+    return model_selection._SHARED_ARRAYS[name][index]
+
+
+def make_data():
+    rng = np.random.RandomState(0)
+    X = rng.random_sample((60, 4))
+    y = np.array(["a", "b", "c"])[(X[:, 0] * 3).astype(int)]
+    return X, y
+
+
+PARAM_GRID = {"hidden_dim": [2, 8], "epochs": [1, 3]}
+
+
+def make_estimator():
+    return KerasClassifier(
+        build_fn=build_fn_clf, hidden_dim=4, epochs=1, shuffle=False, verbose=0
+    )
+
+
+@pytest.fixture(scope="module")
+def reference():
+    """Results of `GridSearchCV` for the same search."""
+    X, y = make_data()
+    return GridSearchCV(
+        make_estimator(), PARAM_GRID, cv=3, return_train_score=True
+    ).fit(X, y)
+
+
+def assert_same_results(search, reference):
+    """Checks that two searches have the same `cv_results_`, except for the
+    timings."""
+    assert set(search.cv_results_) == set(reference.cv_results_)
+    assert search.cv_results_["params"] == reference.cv_results_["params"]
+    for key, val in reference.cv_results_.items():
+        if "time" in key or key == "params":
+            continue
+        if key.startswith("param_"):
+            assert list(search.cv_results_[key]) == list(val)
+        else:
+            np.testing.assert_allclose(
+                search.cv_results_[key], val, rtol=1e-4, err_msg=key
+            )
+    assert search.best_params_ == reference.best_params_
+    assert search.best_index_ == reference.best_index_
+
+
+class TestSharedMemorySearchCV:
+    """Tests the shared-memory parallel search."""
+
+    def test_local(self, reference):
+        """With a single job, results match `GridSearchCV`."""
+        X, y = make_data()
+        search = SharedMemorySearchCV(
+            make_estimator(), PARAM_GRID, cv=3, return_train_score=True
+        ).fit(X, y)
+        assert_same_results(search, reference)
+        assert search.n_splits_ == 3
+        np.testing.assert_array_equal(
+            search.predict(X), search.best_estimator_.predict(X)
+        )
+        assert search.score(X, y) == search.best_estimator_.score(X, y)
+
+    def test_process_pool(self, reference):
+        """Spawned workers attached to the shared data give the same results
+        as `GridSearchCV`."""
+        X, y = make_data()
+        search = SharedMemorySearchCV(
+            make_estimator(),
+            PARAM_GRID,
+            cv=3,
+            n_jobs=2,
+            intra_op_threads=1,
+            return_train_score=True,
+        ).fit(X, y)
+        assert_same_results(search, reference)
+
+    def test_multimetric(self):
+        """Multiple scorers are reported, `refit` selects one of them."""
+        X, y = make_data()
+        search = SharedMemorySearchCV(
+            make_estimator(),
+            {"epochs": [1, 2]},
+            scoring=["accuracy", "f1_macro"],
+            refit="f1_macro",
+            cv=2,
+        )
+        search.fit(X, y)
+        assert "rank_test_accuracy" in search.cv_results_
+        assert search.best_score_ == max(
+            search.cv_results_["mean_test_f1_macro"]
+        )
+        with pytest.raises(ValueError, match="refit"):
+            search.set_params(refit=True).fit(X, y)
+
+    @pytest.mark.parametrize("use_shared_memory", [True, False])
+    def test_share_array(self, use_shared_memory, monkeypatch, tmp_path):
+        """Shared arrays are read-only views of the shared data."""
+        if not use_shared_memory:
+            monkeypatch.setattr(model_selection, "shared_memory", None)
+        elif model_selection.shared_memory is None:
+            pytest.skip("requires multiprocessing.shared_memory")
+        X = np.random.random((10, 3))
+        spec, handle = model_selection._share_array(X, str(tmp_path))
+        try:
+            shared = model_selection._attach_array(spec)
+            np.testing.assert_array_equal(shared, X)
+            assert not shared.flags.writeable
+            del shared
+        finally:
+            if handle is not None:
+                model_selection._ATTACHED.pop().close()
+                handle.close()
+                handle.unlink()
+
+    def test_workers_attach_without_copy(self, tmp_path):
+        """Workers see writes made to the shared data after they attached
+        to it, so they hold no copy of it."""
+        if model_selection.shared_memory is None:
+            pytest.skip("requires multiprocessing.shared_memory")
+        X = np.zeros((10, 3))
+        spec, handle = model_selection._share_array(X, str(tmp_path))
+        shared = np.ndarray(X.shape, dtype=X.dtype, buffer=handle.buf)
+        context = multiprocessing.get_context("spawn")
+        try:
+            with context.Pool(
+                1,
+                initializer=model_selection._init_worker,
+                initargs=({"X": spec}, 1, 1),
+            ) as pool:
+                assert pool.apply(read_shared, ("X", (2, 1))) == 0
+                shared[2, 1] = 5
+                assert pool.apply(read_shared, ("X", (2, 1))) == 5
+        finally:
+            del shared
+            handle.close()
+            handle.unlink()
+
+    def test_take_rows(self):
+        """Contiguous folds are views, other folds are copies."""
+        X = np.arange(20).reshape(10, 2)
+        view = model_selection._take_rows(X, np.arange(3, 7))
+        assert np.shares_memory(view, X)
+        np.testing.assert_array_equal(view, X[3:7])
+        mask = np.zeros(10, dtype=bool)
+        mask[[1, 2, 3]] = True
+        assert np.shares_memory(model_selection._take_rows(X, mask), X)
+        copy = model_selection._take_rows(X, np.array([0, 1, 5]))
+        assert not np.shares_memory(copy, X)
+        np.testing.assert_array_equal(copy, X[[0, 1, 5]])
+        assert model_selection._take_rows(X, np.array([], int)).shape == (
+            0,
+            2,
+        )
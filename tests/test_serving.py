@@ -0,0 +1,237 @@
+"""Tests for the serving front-ends."""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from sklearn.exceptions import NotFittedError
+from tensorflow.python.keras.layers import Dense
+from tensorflow.python.keras.models import Sequential
+
+from sklearn_keras_wrap import wrappers
+from sklearn_keras_wrap.serving import AsyncPredictor, ReplicaPool
+from sklearn_keras_wrap.wrappers import KerasClassifier, KerasRegressor
+
+
+def build_fn_clf(X, n_classes_):
+    """Builds a small multiclass classifier."""
+    model = Sequential(
+        [
+            Dense(8, activation="relu", input_shape=X.shape[1:]),
+            Dense(n_classes_, activation="softmax"),
+        ]
+    )
+    model.compile("sgd", loss="categorical_crossentropy")
+    return model
+
+
+def build_fn_reg(X):
+    """Builds a small regressor."""
+    model = Sequential([Dense(1, input_shape=X.shape[1:])])
+    model.compile("sgd", loss="mean_squared_error")
+    return model
+
+
+def run(coro):
+    """Runs `coro` in a new event loop, like `asyncio.run` (Python 3.7+)."""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+@pytest.fixture(scope="module")
+def clf():
+    X = np.random.random((30, 4))
+    y = np.array(["a", "b", "c"] * 10)
+    return KerasClassifier(build_fn=build_fn_clf, verbose=0).fit(X, y)
+
+
+class TestAsyncPredictor:
+    """Tests coalescing asyncio requests into batches."""
+
+    def test_coalesces_requests(self, clf):
+        """Concurrent requests are predicted in few batches and get the same
+        results as `predict` and `predict_proba`."""
+        X = [np.random.random((n, 4)) for n in (1, 3, 2, 1, 5, 1, 1, 2)]
+
+        async def serve():
+            async with AsyncPredictor(clf, max_wait=0.05) as predictor:
+                results = await asyncio.gather(
+                    *(predictor.predict(x) for x in X),
+                    *(predictor.predict_proba(x) for x in X)
+                )
+                return results, predictor.stats()
+
+        results, stats = run(serve())
+        for x, y_pred, proba in zip(X, results[: len(X)], results[len(X) :]):
+            np.testing.assert_array_equal(y_pred, clf.predict(x))
+            np.testing.assert_allclose(proba, clf.predict_proba(x), rtol=1e-5)
+        assert stats.n_requests == 2 * len(X)
+        assert stats.n_batches < stats.n_requests
+        assert stats.mean_batch_size > 1
+        assert stats.max_queue_wait >= stats.mean_queue_wait >= 0
+
+    def test_max_batch_size(self, clf):
+        """Batches do not exceed `max_batch_size`, larger requests are
+        predicted on their own."""
+        X = [np.random.random((n, 4)) for n in (3, 3, 3, 10)]
+
+        async def serve():
+            async with AsyncPredictor(
+                clf, max_batch_size=4, max_wait=0.05
+            ) as predictor:
+                results = await asyncio.gather(
+                    *(predictor.predict(x) for x in X)
+                )
+                return results, predictor.stats()
+
+        results, stats = run(serve())
+        assert [len(y) for y in results] == [3, 3, 3, 10]
+        assert stats.n_batches == 4
+        assert stats.max_batch_size == 10
+
+    def test_regressor(self):
+        """Regressors are supported, but not `predict_proba`."""
+        X = np.random.random((10, 3))
+        reg = KerasRegressor(build_fn=build_fn_reg, verbose=0)
+        reg.fit(X, np.random.random(10))
+
+        async def serve():
+            async with AsyncPredictor(reg) as predictor:
+                y_pred = await predictor.predict(X)
+                with pytest.raises(AttributeError):
+                    await predictor.predict_proba(X)
+                return y_pred
+
+        np.testing.assert_allclose(run(serve()), reg.predict(X))
+
+    def test_errors(self, clf):
+        """Invalid requests raise in the caller without affecting other
+        requests."""
+        unfitted = KerasClassifier(build_fn=build_fn_clf)
+
+        async def serve():
+            with pytest.raises(NotFittedError):
+                await AsyncPredictor(unfitted).predict(np.ones((1, 4)))
+            async with AsyncPredictor(clf) as predictor:
+                results = await asyncio.gather(
+                    predictor.predict(np.ones((1, 5))),
+                    predictor.predict(np.ones((1, 4))),
+                    return_exceptions=True,
+                )
+            return results
+
+        results = run(serve())
+        assert isinstance(results[0], ValueError)
+        np.testing.assert_array_equal(results[1], clf.predict(np.ones((1, 4))))
+
+
+class TestReplicaPool:
+    """Tests thread-safe inference with a pool of model replicas."""
+
+    def test_concurrent_predict(self, clf):
+        """Many threads get the same results as `predict`."""
+        X = [np.random.random((n, 4)) for n in range(1, 33)]
+        expected = [clf.predict(x) for x in X]
+        with ReplicaPool(clf, n_replicas=3) as pool:
+            with ThreadPoolExecutor(8) as executor:
+                results = list(executor.map(pool.predict, X))
+            futures = [pool.submit(x, "predict_proba") for x in X]
+            probas = [f.result() for f in futures]
+        for x, y_pred, y_true, proba in zip(X, results, expected, probas):
+            np.testing.assert_array_equal(y_pred, y_true)
+            np.testing.assert_allclose(proba, clf.predict_proba(x), rtol=1e-5)
+
+    def test_max_concurrency(self, clf):
+        """At most `n_replicas` requests run the model at once, all of them
+        with the same traced function."""
+        pool = ReplicaPool(clf, n_replicas=2)
+        fn, lock = pool._fn, threading.Lock()
+        running, max_running = [0], [0]
+
+        def slow_fn(X):
+            with lock:
+                running[0] += 1
+                max_running[0] = max(max_running[0], running[0])
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+            return fn(X)
+
+        pool._fn = slow_fn
+        with ThreadPoolExecutor(6) as executor:
+            list(executor.map(pool.predict, [np.ones((1, 4))] * 12))
+        assert max_running[0] == 2
+
+    def test_cache_models(self):
+        """Refitting a wrapper with `cache_models` builds a new model instead
+        of retraining the one served by the pool."""
+        X = np.random.random((10, 3))
+        reg = KerasRegressor(
+            build_fn=build_fn_reg, cache_models=True, verbose=0
+        )
+        reg.fit(X, np.random.random(10))
+        model = reg.model_
+        pool = ReplicaPool(reg, n_replicas=1)
+        expected = pool.predict(X)
+        reg.fit(X, np.random.random(10))
+        assert reg.model_ is not model
+        assert pool._model is model
+        np.testing.assert_allclose(pool.predict(X), expected, rtol=1e-5)
+        wrappers.clear_build_cache()
+
+    def test_overridden_predict_step(self):
+        """Models customizing `predict_step` run through `predict`."""
+
+        class ShiftedSequential(Sequential):
+            def predict_step(self, data):
+                return super().predict_step(data) + 1.0
+
+        def build_fn(X):
+            model = ShiftedSequential([Dense(1, input_shape=X.shape[1:])])
+            model.compile("sgd", loss="mean_squared_error")
+            return model
+
+        X = np.random.random((10, 3))
+        reg = KerasRegressor(build_fn=build_fn, verbose=0)
+        reg.fit(X, np.random.random(10))
+        with ReplicaPool(reg, n_replicas=2) as pool:
+            assert pool._fn is None
+            np.testing.assert_allclose(
+                pool.predict(X), reg.predict(X), rtol=1e-5
+            )
+
+    def test_captures_model(self):
+        """The pool keeps serving the model it was created with."""
+        X = np.random.random((10, 3))
+        reg = KerasRegressor(build_fn=build_fn_reg, verbose=0)
+        reg.fit(X, np.random.random(10))
+        pool = ReplicaPool(reg, n_replicas=2)
+        expected = reg.predict(X)
+        reg.fit(X, np.random.random(10))
+        np.testing.assert_allclose(pool.predict(X), expected, rtol=1e-5)
+        with pytest.raises(AttributeError):
+            pool.predict_proba(X)
+        with pytest.raises(ValueError, match="does not match"):
+            pool.predict(np.ones((2, 4)))
+        with pytest.raises(ValueError, match="Unknown method"):
+            pool.submit(X, "fit")
+
+    def test_captures_classes(self):
+        """Refitting a classifier with other classes does not change the
+        labels returned by the pool."""
+        X = np.random.random((12, 4))
+        clf = KerasClassifier(build_fn=build_fn_clf, verbose=0)
+        clf.fit(X, np.array(["a", "b", "c"] * 4))
+        pool = ReplicaPool(clf, n_replicas=1)
+        clf.fit(X, np.array([10, 20, 30] * 4))
+        assert set(pool.predict(X)) <= {"a", "b", "c"}
+
+    def test_not_fitted(self):
+        """Unfitted estimators are rejected."""
+        with pytest.raises(NotFittedError):
+            ReplicaPool(KerasClassifier(build_fn=build_fn_clf))
@@ -1,10 +1,18 @@
 """Tests for Scikit-learn API wrapper."""
 
 
+import copy
+import gc
+import logging
 import pickle
+import tracemalloc
+import weakref
+from types import SimpleNamespace
 
 import numpy as np
 import pytest
+import scipy.sparse as sp
+from sklearn.base import clone
 from sklearn.calibration import CalibratedClassifierCV
 from sklearn.datasets import load_boston, load_digits, load_iris
 from sklearn.ensemble import (
@@ -22,6 +30,7 @@ from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import MultiLabelBinarizer, StandardScaler
 from sklearn.utils.estimator_checks import check_estimator
 from tensorflow.python import keras
+from tensorflow.python.data.ops.dataset_ops import DatasetV2
 from tensorflow.python.framework.ops import convert_to_tensor
 from tensorflow.python.keras import backend as K
 from tensorflow.python.keras import testing_utils
@@ -33,6 +42,7 @@ from tensorflow.python.keras.layers import (
     Input,
 )
 from tensorflow.python.keras.models import Model, Sequential, clone_model
+from tensorflow.python.keras.optimizer_v2 import gradient_descent
 from tensorflow.python.keras.utils.np_utils import to_categorical
 
 from sklearn_keras_wrap import wrappers
@@ -717,6 +727,230 @@ class TestOutputShapes:
         assert y_pred_prob_keras.shape == y_pred_prob_sklearn.shape
 
 
+class TestLabelEncoding:
+    """Tests the encoding of targets by `KerasClassifier._pre_process_y`."""
+
+    @pytest.mark.parametrize(
+        "y",
+        [
+            np.array([3, 1, 3, 7]),
+            np.array([3, 1, 3, 7], dtype="uint8"),
+            np.array([-2, 5, 5]),
+            np.array([10 ** 9, 3, 3]),
+            np.array(["b", "a", "c"]),
+            np.array([0.5, 0.1, 0.5]),
+        ],
+    )
+    def test_unique_inverse(self, y):
+        classes, y_encoded = wrappers._unique_inverse(y)
+        expected_classes, expected_y = np.unique(y, return_inverse=True)
+        np.testing.assert_array_equal(classes, expected_classes)
+        assert classes.dtype == expected_classes.dtype
+        np.testing.assert_array_equal(y_encoded, expected_y)
+
+    def test_multiclass_multioutput(self):
+        y = np.array([[1, 10], [3, 20], [1, 20], [5, 10]])
+        y_encoded, extra_args = KerasClassifier._pre_process_y(y)
+        np.testing.assert_array_equal(extra_args["classes_"][0], [1, 3, 5])
+        np.testing.assert_array_equal(extra_args["classes_"][1], [10, 20])
+        np.testing.assert_array_equal(y_encoded[0], [[0], [1], [0], [2]])
+        np.testing.assert_array_equal(y_encoded[1], [[0], [1], [1], [0]])
+
+    def test_multilabel_views(self):
+        """The columns of multilabel targets are not copied."""
+        y = np.array([[1, 0, 1], [0, 1, 1]])
+        y_encoded, _ = KerasClassifier._pre_process_y(y)
+        assert len(y_encoded) == 3
+        assert all(np.shares_memory(y_, y) for y_ in y_encoded)
+
+
+def reference_post_process_y(self, y):
+    """The implementation of `KerasClassifier._post_process_y` that copied
+    the outputs of the model and stacked temporaries."""
+    if not isinstance(y, list):
+        y = [y]
+    if self.n_outputs_ == 1:
+        cls_ = [self.classes_]
+    else:
+        cls_ = self.classes_
+    y = copy.deepcopy(y)
+    cls_type_ = self.cls_type_
+    class_predictions = []
+    for i, (y_, classes_) in enumerate(zip(y, cls_)):
+        if cls_type_ == "binary":
+            if y_.shape[1] == 1:
+                class_predictions.append(classes_[np.where(y_ > 0.5, 1, 0)])
+                y[i] = np.concatenate([1 - y_, y_], axis=1)
+            else:
+                class_predictions.append(
+                    classes_[np.argmax(np.where(y_ > 0.5, 1, 0), axis=1)]
+                )
+        elif cls_type_ in ("multiclass", "multiclass-multioutput"):
+            class_predictions.append(classes_[np.argmax(y_, axis=1)])
+        elif cls_type_ == "multilabel-indicator":
+            class_predictions.append(np.where(y_ > 0.5, 1, 0))
+    class_probabilities = np.squeeze(np.column_stack(y))
+    y = np.squeeze(np.column_stack(class_predictions))
+    return y, {"class_probabilities": class_probabilities}
+
+
+class TestPostProcessY:
+    """Tests `KerasClassifier._post_process_y` against the implementation it
+    replaced."""
+
+    @staticmethod
+    def assert_same(est, outputs):
+        y, extra_args = KerasClassifier._post_process_y(est, outputs)
+        y_ref, ref_args = reference_post_process_y(est, outputs)
+        np.testing.assert_array_equal(y, y_ref)
+        assert y.dtype == y_ref.dtype
+        np.testing.assert_array_equal(
+            extra_args["class_probabilities"],
+            ref_args["class_probabilities"],
+        )
+
+    @pytest.mark.parametrize("n_columns", [1, 2])
+    @pytest.mark.parametrize(
+        "classes", [np.array(["no", "yes"]), np.array([3, 7])]
+    )
+    def test_binary(self, n_columns, classes):
+        outputs = np.random.random((50, n_columns)).astype("float32")
+        outputs[:5] = 0.5
+        est = SimpleNamespace(
+            n_outputs_=1, classes_=classes, cls_type_="binary"
+        )
+        self.assert_same(est, outputs)
+
+    def test_single_class(self):
+        """A target with a single class always predicts that class."""
+        est = SimpleNamespace(
+            n_outputs_=1, classes_=np.array(["only"]), cls_type_="binary"
+        )
+        outputs = np.random.random((50, 1)).astype("float32") / 2
+        self.assert_same(est, outputs)
+        outputs[::2] += 0.5
+        y, extra_args = KerasClassifier._post_process_y(est, outputs)
+        np.testing.assert_array_equal(y, ["only"] * 50)
+        np.testing.assert_allclose(
+            extra_args["class_probabilities"],
+            np.column_stack([1 - outputs, outputs]),
+        )
+
+    @pytest.mark.parametrize(
+        "classes", [np.arange(10), np.array(list("abcdefghij"))]
+    )
+    def test_multiclass(self, classes):
+        est = SimpleNamespace(
+            n_outputs_=1, classes_=classes, cls_type_="multiclass"
+        )
+        self.assert_same(est, np.random.random((50, 10)).astype("float32"))
+
+    def test_multilabel(self):
+        est = SimpleNamespace(
+            n_outputs_=1,
+            classes_=np.arange(5),
+            cls_type_="multilabel-indicator",
+        )
+        self.assert_same(est, np.random.random((50, 5)).astype("float32"))
+        outputs = [np.random.random((50, 1)) for _ in range(5)]
+        self.assert_same(
+            SimpleNamespace(
+                n_outputs_=5,
+                classes_=[np.arange(2)] * 5,
+                cls_type_="multilabel-indicator",
+            ),
+            outputs,
+        )
+
+    def test_multiclass_multioutput(self):
+        est = SimpleNamespace(
+            n_outputs_=3,
+            classes_=[np.arange(4), np.array(list("abc")), np.arange(2)],
+            cls_type_="multiclass-multioutput",
+        )
+        outputs = [
+            np.random.random((50, n)).astype("float32") for n in (4, 3, 2)
+        ]
+        self.assert_same(est, outputs)
+
+
+class TestDeclaredTarget:
+    """Tests skipping the inference of target attributes with the declared
+    `classes` and `target_type`.
+    """
+
+    @pytest.fixture
+    def no_inference(self, monkeypatch):
+        def fail(*args, **kwargs):
+            raise AssertionError("target attributes were inferred")
+
+        monkeypatch.setattr(wrappers, "type_of_target", fail)
+        monkeypatch.setattr(wrappers, "_unique_inverse", fail)
+
+    @pytest.mark.parametrize(
+        "y, classes, cls_type_",
+        [
+            (np.array(["a", "b", "a"]), ["b", "a"], "binary"),
+            (np.array([0, 4, 2]), [0, 1, 2, 3, 4], "multiclass"),
+            (np.array([[1, 0], [0, 1], [1, 1]]), [[0, 1], [0, 1]], None),
+            (np.array([[1, 7], [3, 8], [1, 7]]), [[1, 2, 3], [7, 8]], None),
+        ],
+    )
+    def test_matches_inferred(self, no_inference, y, classes, cls_type_):
+        y_declared, extra_args = KerasClassifier._pre_process_y(
+            y, classes=classes, target_type=cls_type_
+        )
+        if cls_type_ is not None:
+            assert extra_args["cls_type_"] == cls_type_
+        if y.ndim == 1:
+            np.testing.assert_array_equal(
+                extra_args["classes_"], np.unique(classes)
+            )
+        else:
+            for declared, classes_ in zip(classes, extra_args["classes_"]):
+                np.testing.assert_array_equal(classes_, declared)
+        assert len(y_declared) == extra_args["n_outputs_keras_"]
+
+    def test_fit(self, no_inference):
+        X = np.random.random((20, 4))
+        y = np.array([0, 1, 2, 0] * 5)
+        clf = KerasClassifier(
+            build_fn=dynamic_classifier,
+            classes=[0, 1, 2, 3],
+            target_type="multiclass",
+            verbose=0,
+        )
+        clf.fit(X, y)
+        np.testing.assert_array_equal(clf.classes_, [0, 1, 2, 3])
+        assert clf.n_classes_ == 4
+        assert clf.cls_type_ == "multiclass"
+        assert clf.predict_proba(X).shape == (20, 4)
+
+    def test_undeclared_label(self):
+        X = np.random.random((20, 4))
+        y = np.array([0, 1, 2, 5] * 5)
+        clf = KerasClassifier(
+            build_fn=dynamic_classifier, classes=[0, 1, 2], verbose=0
+        )
+        with pytest.raises(ValueError, match="not in the known classes"):
+            clf.fit(X, y)
+
+    def test_multilabel_checked(self):
+        y = np.array([[1, 0], [2, 1]])
+        with pytest.raises(ValueError, match="not in the known classes"):
+            KerasClassifier._pre_process_y(
+                y, target_type="multilabel-indicator"
+            )
+
+    def test_clone(self):
+        clf = KerasClassifier(
+            build_fn=dynamic_classifier, classes=["a", "b"], verbose=0
+        )
+        params = clone(clf).get_params()
+        assert params["classes"] == ["a", "b"]
+        assert params["target_type"] is None
+
+
 class TestPrebuiltModel:
     """Tests using a prebuilt model instance."""
 
@@ -745,6 +979,46 @@ class TestPrebuiltModel:
             estimator = model(build_fn=keras_model)
             check(estimator, loader)
 
+    def test_training_config_cached(self, monkeypatch):
+        """The training config of a pre-built model is only extracted again
+        after it is recompiled.
+        """
+        X = np.random.random((20, 3))
+        y = np.random.random((20,))
+        keras_model = build_fn_units_reg(X)
+        calls = []
+        model_metadata = wrappers.saving_utils.model_metadata
+
+        def counting_model_metadata(model, *args, **kwargs):
+            calls.append(model)
+            return model_metadata(model, *args, **kwargs)
+
+        monkeypatch.setattr(
+            wrappers.saving_utils, "model_metadata", counting_model_metadata
+        )
+        reg = KerasRegressor(build_fn=keras_model, epochs=1, verbose=0)
+        reg.fit(X, y)
+        first_model = reg.model_
+        reg.fit(X, y)
+        assert calls == [keras_model]
+        assert reg.model_ is not first_model
+        assert reg.model_.optimizer is not first_model.optimizer
+        keras_model.compile("adam", loss="mean_absolute_error")
+        reg.fit(X, y)
+        assert calls == [keras_model] * 2
+        assert reg.model_.loss.__name__ == "mean_absolute_error"
+        # same optimizer and loss, other metrics and loss weights
+        keras_model.compile(
+            keras_model.optimizer,
+            loss=keras_model.loss,
+            metrics=["mean_squared_error"],
+            loss_weights=[0.5],
+        )
+        reg.fit(X, y)
+        assert calls == [keras_model] * 3
+        assert "mean_squared_error" in reg.history_.history
+        assert reg.model_.compiled_loss._user_loss_weights == [0.5]
+
     def test_uncompiled_prebuilt_model_raises_error(self):
         """Tests that an uncompiled model cannot be used as build_fn param."""
 
@@ -771,7 +1045,7 @@ class TestPrebuiltModel:
             # clone to simulate uncompiled model
             keras_model = clone_model(keras_model)
             estimator = model(build_fn=keras_model)
-            with pytest.raises(ValueError):
+            with pytest.raises(ValueError, match="must compile it first"):
                 check(estimator, loader)
 
 
@@ -1090,3 +1364,1366 @@ class TestMultiInputOutput:
         reg_sklearn.score(X, y)
 
         assert y_pred_keras.shape == y_pred_sklearn.shape
+
+
+class TestFilterParams:
+    """Tests the signature cache and routing table used by `_filter_params`.
+    """
+
+    def test_filter_params_matches_has_arg(self):
+        """Routed parameters are the same as those found with `has_arg`."""
+        from tensorflow.python.keras.utils.generic_utils import has_arg
+
+        clf = wrappers.KerasClassifier(
+            build_fn=build_fn_clf,
+            hidden_dim=HIDDEN_DIM,
+            batch_size=BATCH_SIZE,
+            epochs=EPOCHS,
+        )
+        for fn in (build_fn_clf, Sequential.fit, Sequential.predict):
+            expected = {
+                name: val
+                for name, val in clf.__dict__.items()
+                if has_arg(fn, name)
+            }
+            assert clf._filter_params(fn) == expected
+            kwargs = {"verbose": 0, "not_an_arg": 1}
+            assert clf._filter_params(fn, params_to_check=kwargs) == {
+                name: val for name, val in kwargs.items() if has_arg(fn, name)
+            }
+
+    def test_keyword_only_build_fn(self):
+        """Keyword-only arguments of `build_fn` are routed."""
+
+        def build_fn_kwonly(X, *, hidden=4):
+            model = Sequential()
+            model.add(Dense(hidden, input_shape=X.shape[1:]))
+            model.add(Dense(1))
+            model.compile(loss="mse", optimizer="sgd")
+            return model
+
+        reg = wrappers.KerasRegressor(
+            build_fn=build_fn_kwonly, hidden=8, epochs=1, verbose=0
+        )
+        assert reg._filter_params(build_fn_kwonly) == {"hidden": 8}
+        reg.fit(np.ones((4, 3)), np.ones(4))
+        assert reg.model_.layers[0].units == 8
+
+    def test_accept_all_kwargs(self):
+        """`accept_all` lets `**kwargs` accept any parameter."""
+        from tensorflow.python.keras.utils.generic_utils import has_arg
+
+        def fn(a, **kwargs):
+            pass
+
+        clf = wrappers.KerasClassifier(build_fn=build_fn_clf, epochs=EPOCHS)
+        params = {"a": 1, "epochs": 2}
+        for accept_all in (False, True):
+            assert clf._filter_params(
+                fn, params_to_check=params, accept_all=accept_all
+            ) == {
+                name: val
+                for name, val in params.items()
+                if has_arg(fn, name, accept_all)
+            }
+        assert clf._filter_params(fn, accept_all=True) == clf.__dict__
+        assert clf._filter_params(fn) == {}
+
+    def test_signature_cache_hits(self):
+        """Repeated fits are served from the signature cache."""
+        wrappers.clear_signature_cache()
+        clf = wrappers.KerasClassifier(
+            build_fn=build_fn_clf,
+            hidden_dim=HIDDEN_DIM,
+            batch_size=BATCH_SIZE,
+            epochs=EPOCHS,
+        )
+        assert_classification_works(clf)
+        info = wrappers.signature_cache_info()
+        assert info.misses > 0 and info.currsize > 0
+        assert_classification_works(clf)
+        new_info = wrappers.signature_cache_info()
+        assert new_info.misses == info.misses
+        assert new_info.hits > info.hits
+
+    def test_set_params_invalidates_routing(self):
+        """`set_params` clears the routing table."""
+        clf = wrappers.KerasClassifier(
+            build_fn=build_fn_clf, hidden_dim=HIDDEN_DIM, epochs=EPOCHS
+        )
+        assert clf._filter_params(build_fn_clf) == {"hidden_dim": HIDDEN_DIM}
+        assert clf in wrappers._PARAMS_ROUTING
+        clf.set_params(hidden_dim=HIDDEN_DIM + 1)
+        assert clf not in wrappers._PARAMS_ROUTING
+        assert clf._filter_params(build_fn_clf) == {
+            "hidden_dim": HIDDEN_DIM + 1
+        }
+        # new attributes invalidate the routing table as well
+        assert "verbose" not in clf._filter_params(Sequential.fit)
+        clf.verbose = 0
+        assert clf._filter_params(Sequential.fit)["verbose"] == 0
+
+
+def build_fn_tiny_reg(X):
+    """Builds the smallest possible regressor, fast enough to fit hundreds
+    of times."""
+    model = Sequential([Dense(1, input_shape=X.shape[1:])])
+    model.compile("sgd", loss="mean_squared_error", run_eagerly=True)
+    return model
+
+
+class TestLegalParamsRegistry:
+    """Tests the per-instance registry of legal parameter sources."""
+
+    def test_registry_is_per_instance_and_deduplicated(self):
+        """Repeated fits do not grow the registry."""
+        X, y = np.random.random((4, 2)), np.random.random(4)
+        reg = KerasRegressor(build_fn=build_fn_tiny_reg, verbose=0)
+        other = KerasRegressor(build_fn=build_fn_tiny_reg, verbose=0)
+        reg.fit(X, y)
+        n_fns = len(reg._legal_params_registry)
+        for _ in range(3):
+            reg.fit(X, y)
+        assert len(reg._legal_params_registry) == n_fns
+        assert "_legal_params_registry" not in other.__dict__
+        assert isinstance(KerasRegressor._legal_params_fns, tuple)
+        # the registry only holds weak references to the models it inspected
+        model_ref = weakref.ref(reg.model_)
+        reg.fit(X, y)
+        gc.collect()
+        assert model_ref() is None
+        assert reg.model_.fit in list(reg._legal_params_registry)
+        # pickling drops the bound methods, they are re-registered by fit
+        reg = pickle.loads(pickle.dumps(reg))
+        reg.fit(X, y)
+        assert len(reg._legal_params_registry) == n_fns
+
+    def test_memory_flat_over_many_fits(self):
+        """Memory does not grow over hundreds of consecutive fits."""
+        X, y = np.random.random((4, 2)), np.random.random(4)
+        reg = KerasRegressor(build_fn=build_fn_tiny_reg, verbose=0)
+        for _ in range(20):  # warm up Keras' global state
+            reg.fit(X, y)
+        gc.collect()
+        tracemalloc.start()
+        try:
+            model_refs = []
+            for _ in range(200):
+                # Keras' global graph keeps layers alive, exclude that growth
+                K.clear_session()
+                reg.fit(X, y)
+                model_refs.append(weakref.ref(reg.model_))
+            gc.collect()
+            growth, _ = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        assert sum(ref() is not None for ref in model_refs) == 1
+        assert growth < 2 * 1024 ** 2
+
+
+class TestInputValidation:
+    """Tests that input validation neither upcasts nor copies X."""
+
+    @pytest.mark.parametrize("dtype", ["float32", "float16", "float64"])
+    def test_no_copy(self, dtype):
+        """C-contiguous arrays of supported dtypes reach Keras as is."""
+        seen = dict()
+
+        def build_fn(X):
+            seen["X"] = X
+            return build_fn_tiny_reg(X)
+
+        X = np.random.random((10, 3)).astype(dtype)
+        y = np.random.random(10)
+        reg = KerasRegressor(build_fn=build_fn, verbose=0)
+        reg.fit(X, y)
+        assert seen["X"] is X
+        assert reg._validate_X(X) is X
+        assert reg.predict(X).shape == (10,)
+
+    def test_other_dtypes_converted(self):
+        """Other dtypes are still converted to float64."""
+        X = np.random.randint(0, 2, size=(10, 3)).astype(bool)
+        assert KerasRegressor._validate_X(X).dtype == np.float64
+
+    def test_peak_memory(self):
+        """Validating a large float32 X does not allocate a copy of it."""
+        X = np.random.random((200000, 20)).astype("float32")
+        y = np.random.random(X.shape[0])
+        reg = KerasRegressor(
+            build_fn=build_fn_tiny_reg, verbose=0, batch_size=50000
+        )
+        for method, args in ((reg.fit, (X, y)), (reg.predict, (X,))):
+            tracemalloc.start()
+            try:
+                method(*args)
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            assert peak < X.nbytes / 2
+
+
+def iter_chunks(X, y, chunk_size):
+    """Splits X and y into a list of chunks."""
+    return [
+        (X[start : start + chunk_size], y[start : start + chunk_size])
+        for start in range(0, X.shape[0], chunk_size)
+    ]
+
+
+class TestStreamingFit:
+    """Tests fitting from chunks of data with `fit_stream`."""
+
+    @pytest.mark.parametrize(
+        "y",
+        [
+            np.array([0, 1, 2, 3] * 5),  # multiclass
+            np.array(["a", "b"] * 10),  # binary
+            np.array([[1, 0], [0, 1], [1, 1], [0, 0]] * 5),  # multilabel
+        ],
+    )
+    def test_attributes_match_fit(self, y):
+        """Streaming populates the same attributes as the in-memory path."""
+        X = np.random.random((20, 4)).astype("float32")
+        clf = KerasClassifier(build_fn=dynamic_classifier, verbose=0)
+        clf.fit(X, y)
+        clf_stream = KerasClassifier(build_fn=dynamic_classifier, verbose=0)
+        # the first chunk does not contain all classes
+        clf_stream.fit_stream(iter_chunks(X, y, chunk_size=3), batch_size=4)
+        for attr in ("cls_type_", "n_outputs_", "n_outputs_keras_"):
+            assert getattr(clf, attr) == getattr(clf_stream, attr)
+        np.testing.assert_equal(clf.classes_, clf_stream.classes_)
+        np.testing.assert_equal(clf.n_classes_, clf_stream.n_classes_)
+        assert clf_stream.predict(X).shape == clf.predict(X).shape
+        assert clf_stream.predict_proba(X).shape == clf.predict_proba(X).shape
+
+    def test_sources(self):
+        """Datasets, generator functions and declared classes."""
+        X = np.random.random((20, 4))
+        y = np.array([0, 1, 2, 3] * 5)
+        dataset = DatasetV2.from_tensor_slices((X, y)).batch(6)
+
+        def generator():
+            yield from iter_chunks(X, y, chunk_size=6)
+
+        for chunks in (dataset, generator):
+            clf = KerasClassifier(build_fn=dynamic_classifier, verbose=0)
+            clf.fit_stream(chunks, epochs=2)
+            np.testing.assert_equal(clf.classes_, np.arange(4))
+            assert clf.history_.history["loss"]
+
+        # declared classes skip the discovery pass, which generators that
+        # can be consumed only once would not support
+        clf = KerasClassifier(build_fn=dynamic_classifier, verbose=0)
+        chunks = iter_chunks(X, y, chunk_size=6)
+        clf.fit_stream(chunks, classes=[0, 1, 2, 3, 4])
+        np.testing.assert_equal(clf.classes_, np.arange(5))
+        assert clf.n_classes_ == 5
+
+        with pytest.raises(TypeError):
+            clf.fit_stream(generator())
+
+    def test_unknown_labels(self):
+        """Labels missing from the declared classes raise an error."""
+        X = np.random.random((20, 4))
+        y = np.array([0, 1, 2, 3] * 5)
+        clf = KerasClassifier(build_fn=dynamic_classifier, verbose=0)
+        with pytest.raises(ValueError, match="known classes"):
+            clf.fit_stream(iter_chunks(X, y, chunk_size=5), classes=[0, 1, 2])
+
+    def test_regressor(self):
+        """Streaming fit of a multi-output regressor with sample weights."""
+        X = np.random.random((20, INPUT_DIM))
+        y = np.random.random((20, 2))
+        chunks = [
+            (X_, y_, np.ones(X_.shape[0]))
+            for X_, y_ in iter_chunks(X, y, chunk_size=7)
+        ]
+        reg = FunctionAPIMultiOutputRegressor(verbose=0)
+        reg.fit_stream(chunks)
+        assert reg.n_outputs_ == 2
+        assert reg.predict(X).shape == (20, 2)
+
+
+class TestPartialFit:
+    """Tests incremental training with `partial_fit`."""
+
+    def test_classifier(self):
+        """The model is built once and the encoding of the first call is
+        reused."""
+        X = np.random.random((20, 4))
+        y = np.array(["a", "b", "c", "d"] * 5)
+        clf = KerasClassifier(build_fn=dynamic_classifier, verbose=0)
+        clf.partial_fit(X[:10], y[:10], classes=["a", "b", "c", "d", "e"])
+        model = clf.model_
+        np.testing.assert_equal(clf.classes_, ["a", "b", "c", "d", "e"])
+        weights = [w.copy() for w in model.get_weights()]
+        clf.partial_fit(X[10:], y[10:])
+        assert clf.model_ is model
+        assert any(
+            not np.allclose(w_old, w_new)
+            for w_old, w_new in zip(weights, model.get_weights())
+        )
+        assert set(clf.predict(X)) <= set(clf.classes_)
+        with pytest.raises(ValueError, match="known classes"):
+            clf.partial_fit(X[:2], np.array(["f", "a"]))
+
+    def test_classes_inferred(self):
+        """Without `classes`, the classes of the first call are used."""
+        X = np.random.random((10, 4))
+        y = np.array([0, 1] * 5)
+        clf = KerasClassifier(build_fn=dynamic_classifier, verbose=0)
+        clf.partial_fit(X, y)
+        assert clf.cls_type_ == "binary"
+        np.testing.assert_equal(clf.classes_, [0, 1])
+        with pytest.raises(ValueError):
+            clf.partial_fit(X, y + 1)
+
+    def test_regressor(self):
+        """Regressors continue training after `fit`."""
+        X = np.random.random((10, INPUT_DIM))
+        y = np.random.random((10, 2))
+        reg = FunctionAPIMultiOutputRegressor(verbose=0)
+        reg.fit(X, y)
+        model = reg.model_
+        reg.partial_fit(X, y, sample_weight=np.ones(10))
+        assert reg.model_ is model
+        assert reg.predict(X).shape == (10, 2)
+
+
+def build_fn_units_reg(X, units=4):
+    """Builds a small regressor with a configurable hidden layer."""
+    model = Sequential(
+        [Dense(units, input_shape=X.shape[1:], activation="relu"), Dense(1)]
+    )
+    model.compile("sgd", loss="mean_squared_error")
+    return model
+
+
+class TestWarmStart:
+    """Tests reusing the model across calls to `fit` with `warm_start`."""
+
+    def test_reuses_model(self):
+        """Changing fit parameters keeps the model and its weights."""
+        X = np.random.random((20, 3))
+        y = np.random.random((20,))
+        reg = KerasRegressor(
+            build_fn=build_fn_units_reg,
+            warm_start=True,
+            units=4,
+            epochs=1,
+            verbose=0,
+        )
+        reg.fit(X, y)
+        assert reg.model_rebuilt_
+        model = reg.model_
+        weights = [w.copy() for w in model.get_weights()]
+        reg.set_params(epochs=2)
+        reg.fit(X[:10], y[:10])
+        assert not reg.model_rebuilt_
+        assert reg.model_ is model
+        assert any(
+            not np.allclose(w_old, w_new)
+            for w_old, w_new in zip(weights, model.get_weights())
+        )
+
+    @pytest.mark.parametrize("change", ["units", "features"])
+    def test_rebuilds_on_change(self, change):
+        """Changing the arguments of `build_fn` rebuilds the model."""
+        X = np.random.random((20, 3))
+        y = np.random.random((20,))
+        reg = KerasRegressor(
+            build_fn=build_fn_units_reg,
+            warm_start=True,
+            units=4,
+            epochs=1,
+            verbose=0,
+        )
+        reg.fit(X, y)
+        model = reg.model_
+        if change == "units":
+            reg.set_params(units=8)
+        else:
+            X = np.random.random((20, 5))
+        reg.fit(X, y)
+        assert reg.model_rebuilt_
+        assert reg.model_ is not model
+
+    def test_build_key_not_in_state(self):
+        """The key of the build arguments is neither part of the state of
+        the estimator nor pickled with it."""
+        X = np.random.random((20, 3))
+        y = np.random.random((20,))
+        reg = KerasRegressor(
+            build_fn=build_fn_units_reg, warm_start=True, epochs=1, verbose=0
+        )
+        reg.fit(X, y)
+        assert reg in wrappers._BUILD_KEYS
+        assert not any("build_key" in name for name in reg.__dict__)
+        new_reg = pickle.loads(pickle.dumps(reg))
+        assert new_reg not in wrappers._BUILD_KEYS
+        new_reg.fit(X, y)
+        assert new_reg.model_rebuilt_
+        new_reg.fit(X, y)
+        assert not new_reg.model_rebuilt_
+
+    def test_cold_start(self):
+        """Without `warm_start`, every call to `fit` rebuilds the model."""
+        X = np.random.random((20, 3))
+        y = np.random.random((20,))
+        reg = KerasRegressor(build_fn=build_fn_units_reg, verbose=0)
+        reg.fit(X, y)
+        model = reg.model_
+        reg.fit(X, y)
+        assert reg.model_rebuilt_
+        assert reg.model_ is not model
+
+    def test_classifier_new_classes(self):
+        """A classifier rebuilds its model when the classes change."""
+        X = np.random.random((20, 4))
+        y = np.array([0, 1] * 10)
+        clf = KerasClassifier(
+            build_fn=dynamic_classifier, warm_start=True, verbose=0
+        )
+        clf.fit(X, y)
+        model = clf.model_
+        clf.fit(X, y)
+        assert clf.model_ is model
+        clf.fit(X, np.array([0, 1, 2, 3] * 5))
+        assert clf.model_ is not model
+        assert clf.predict(X).shape == (20,)
+
+
+def build_fn_adam_reg(X, units=4):
+    """Builds a small regressor trained with Adam, which has slots."""
+    model = Sequential(
+        [Dense(units, input_shape=X.shape[1:], activation="relu"), Dense(1)]
+    )
+    model.compile("adam", loss="mean_squared_error")
+    return model
+
+
+class TestBuildCache:
+    """Tests reusing compiled models across estimators with
+    `cache_models`.
+    """
+
+    def setup_method(self):
+        wrappers.clear_build_cache()
+
+    def teardown_method(self):
+        wrappers.clear_build_cache()
+
+    def test_reuses_model_across_clones(self):
+        """A clone fitted after the first estimator is gone reuses its
+        model, with a fresh optimizer state.
+        """
+        X = np.random.random((20, 3))
+        y = np.random.random((20,))
+        reg = KerasRegressor(
+            build_fn=build_fn_adam_reg, cache_models=True, epochs=1, verbose=0
+        )
+        reg.fit(X, y, batch_size=20)
+        model = reg.model_
+        reg2 = clone(reg)
+        del reg
+        gc.collect()
+        reg2.fit(X, y, batch_size=20)
+        assert reg2.model_ is model
+        assert K.get_value(model.optimizer.iterations) == 1
+        info = wrappers.build_cache_info()
+        assert (info.hits, info.misses, info.currsize) == (1, 1, 0)
+        assert info.time_saved > 0
+        assert reg2.predict(X).shape == (20,)
+
+    def test_refit_reuses_own_model(self):
+        """Refitting an estimator reuses its own model."""
+        X = np.random.random((20, 3))
+        y = np.random.random((20,))
+        reg = KerasRegressor(
+            build_fn=build_fn_adam_reg, cache_models=True, epochs=1, verbose=0
+        )
+        reg.fit(X, y)
+        model = reg.model_
+        reg.fit(X, y)
+        assert reg.model_ is model
+        assert wrappers.build_cache_info().hits == 1
+
+    @pytest.mark.parametrize("change", ["units", "features"])
+    def test_miss_on_change(self, change):
+        """Other arguments of `build_fn` or other input shapes build a new
+        model.
+        """
+        X = np.random.random((20, 3))
+        y = np.random.random((20,))
+        reg = KerasRegressor(
+            build_fn=build_fn_adam_reg,
+            cache_models=True,
+            units=4,
+            epochs=1,
+            verbose=0,
+        )
+        reg.fit(X, y)
+        model = reg.model_
+        if change == "units":
+            reg.set_params(units=8)
+        else:
+            X = np.random.random((20, 5))
+        reg.fit(X, y)
+        assert reg.model_ is not model
+        info = wrappers.build_cache_info()
+        assert (info.hits, info.misses, info.currsize) == (0, 2, 1)
+
+    def test_reinitialize_model(self):
+        """Weights are drawn again from their initializers."""
+        X = np.random.random((20, 3))
+        model = build_fn_adam_reg(X)
+        initial_weights = model.get_weights()
+        model.fit(X, np.random.random((20,)), epochs=2, verbose=0)
+        trained_weights = model.get_weights()
+        wrappers._reinitialize_model(
+            model, initial_weights, model.optimizer.get_config()
+        )
+        kernel, bias = model.get_weights()[:2]
+        assert not np.allclose(kernel, trained_weights[0])
+        assert not np.allclose(kernel, initial_weights[0])
+        np.testing.assert_array_equal(bias, np.zeros_like(bias))
+        assert K.get_value(model.optimizer.iterations) == 0
+        for var in model.trainable_weights:
+            m = K.get_value(model.optimizer.get_slot(var, "m"))
+            np.testing.assert_array_equal(m, np.zeros_like(m))
+
+    def test_disabled_by_default(self):
+        """Without `cache_models`, the cache is not used."""
+        X = np.random.random((20, 3))
+        y = np.random.random((20,))
+        KerasRegressor(build_fn=build_fn_adam_reg, verbose=0).fit(X, y)
+        gc.collect()
+        assert wrappers.build_cache_info() == (0, 0, 0, 0.0, 0.0)
+
+
+class TestTimings:
+    """Tests the per-phase timings recorded with `record_timings`."""
+
+    def test_fit_timings(self):
+        X = np.random.random((20, 4))
+        y = np.array([0, 1] * 10)
+        clf = KerasClassifier(
+            build_fn=dynamic_classifier, record_timings=True, verbose=0
+        )
+        clf.fit(X, y)
+        timings = clf.fit_timings_
+        assert list(timings) == [
+            "validation",
+            "pre_process",
+            "build",
+            "train",
+            "total",
+        ]
+        assert sum(timings.values()) - timings["total"] <= timings["total"]
+
+    def test_sink(self):
+        """The sink receives the timings of the outermost calls."""
+        X = np.random.random((20, 4))
+        y = np.array([0, 1] * 10)
+        calls = []
+        clf = KerasClassifier(
+            build_fn=dynamic_classifier,
+            record_timings=True,
+            timings_sink=lambda method, timings: calls.append(
+                (method, timings)
+            ),
+            verbose=0,
+        )
+        clf.fit(X, y)
+        clf.score(X, y)
+        assert [method for method, _ in calls] == ["fit", "score"]
+        assert set(calls[1][1]) == {
+            "validation",
+            "pre_process",
+            "predict",
+            "post_process",
+            "score",
+            "total",
+        }
+
+    def test_logger_sink(self, caplog):
+        X = np.random.random((20, 3))
+        y = np.random.random((20,))
+        logger = logging.getLogger("test_timings")
+        reg = KerasRegressor(
+            build_fn=build_fn_units_reg,
+            record_timings=True,
+            timings_sink=logger,
+            verbose=0,
+        )
+        with caplog.at_level(logging.INFO, logger="test_timings"):
+            reg.fit(X, y)
+        assert "KerasRegressor.fit timings: validation=" in caplog.text
+
+    def test_predict_latency_stats(self):
+        X = np.random.random((20, 3))
+        y = np.random.random((20,))
+        reg = KerasRegressor(
+            build_fn=build_fn_units_reg, record_timings=True, verbose=0
+        )
+        reg.fit(X, y)
+        for _ in range(5):
+            reg.predict(X)
+        stats = reg.predict_latency_stats(percentiles=(50, 99))
+        assert stats.count == 5
+        assert list(stats.percentiles) == [50, 99]
+        assert 0 < stats.percentiles[50] <= stats.percentiles[99]
+        assert stats.percentiles[99] <= stats.max
+        # refitting resets the latencies
+        reg.fit(X, y)
+        assert reg.predict_latency_stats().count == 0
+
+    def test_disabled_by_default(self):
+        X = np.random.random((20, 3))
+        y = np.random.random((20,))
+        reg = KerasRegressor(build_fn=build_fn_units_reg, verbose=0)
+        reg.fit(X, y)
+        reg.predict(X)
+        assert not hasattr(reg, "fit_timings_")
+        assert reg.predict_latency_stats().count == 0
+
+    def test_latency_histogram(self):
+        histogram = wrappers._LatencyHistogram()
+        for latency in [0.001] * 90 + [0.1] * 10:
+            histogram.record(latency)
+        stats = histogram.stats((50, 95))
+        assert stats.count == 100
+        assert stats.max == 0.1
+        assert 0.001 <= stats.percentiles[50] < 0.0012
+        assert stats.percentiles[95] == 0.1
+
+
+class DenseForbiddenCSR(sp.csr_matrix):
+    """CSR matrix that can only be densified in batches of up to 32 rows."""
+
+    def toarray(self, *args, **kwargs):
+        assert self.shape[0] <= 32, "more than a batch was densified"
+        return super().toarray(*args, **kwargs)
+
+
+class TestSparseInput:
+    """Tests fitting and predicting on scipy sparse matrices."""
+
+    @pytest.mark.parametrize("fmt", ["csr", "csc"])
+    def test_matches_dense(self, fmt):
+        X = sp.random(100, 30, density=0.1, format=fmt, random_state=0)
+        y = np.array([0, 1, 2, 3] * 25)
+        clf = KerasClassifier(
+            build_fn=dynamic_classifier, batch_size=16, verbose=0
+        )
+        clf.fit(X, y, sample_weight=np.ones(100))
+        dense_proba = clf.predict_proba(X.toarray())
+        # both the fast path and `model_.predict`
+        for max_samples in (0, 100):
+            clf.fast_predict_max_samples = max_samples
+            np.testing.assert_allclose(
+                clf.predict_proba(X), dense_proba, rtol=1e-5
+            )
+        assert clf.score(X, y) == clf.score(X.toarray(), y)
+
+    def test_never_densified(self):
+        X = DenseForbiddenCSR(
+            sp.random(200, 50, density=0.05, format="csr", random_state=0)
+        )
+        y = np.random.random((200,))
+        reg = KerasRegressor(
+            build_fn=build_fn_units_reg, batch_size=32, epochs=2, verbose=0
+        )
+        reg.fit(X, y)
+        reg.fast_predict_max_samples = 0
+        assert reg.predict(X).shape == (200,)
+
+    @pytest.mark.parametrize("shuffle", [False, True])
+    def test_batch_dataset(self, shuffle):
+        X = sp.random(10, 4, density=0.5, format="csr", random_state=0)
+        y = np.arange(10)
+        dataset = wrappers._batch_dataset(X, y, batch_size=4, shuffle=shuffle)
+        batches = list(dataset.as_numpy_iterator())
+        assert [len(batch[1]) for batch in batches] == [4, 4, 2]
+        X_out = np.concatenate([batch[0] for batch in batches])
+        y_out = np.concatenate([batch[1] for batch in batches])
+        np.testing.assert_array_equal(X_out, X.toarray()[y_out])
+        assert sorted(y_out) == list(y)
+
+
+class TestOneHotPerBatch:
+    """Tests one-hot encoding targets with many classes per batch."""
+
+    @pytest.fixture
+    def no_to_categorical(self, monkeypatch):
+        def to_categorical(*args, **kwargs):
+            raise AssertionError("the whole target was one-hot encoded")
+
+        monkeypatch.setattr(wrappers, "to_categorical", to_categorical)
+
+    @pytest.mark.parametrize("method", ["fit", "partial_fit", "fit_stream"])
+    def test_many_classes(self, no_to_categorical, method):
+        X = np.random.random((40, 4))
+        y = np.arange(40) % 8
+        clf = KerasClassifier(
+            build_fn=dynamic_classifier,
+            max_one_hot_classes=4,
+            batch_size=16,
+            verbose=0,
+        )
+        if method == "fit_stream":
+            clf.fit_stream(iter_chunks(X, y, 15))
+        else:
+            getattr(clf, method)(X, y, sample_weight=np.ones(40))
+        assert clf.n_classes_ == 8
+        assert clf.predict_proba(X).shape == (40, 8)
+
+    @pytest.mark.parametrize("sparse", [False, True])
+    def test_validation_split(self, no_to_categorical, monkeypatch, sparse):
+        """`validation_split` holds out the last samples, like Keras, and
+        only sparse inputs are batched by a generator."""
+        rows = []
+        name = "_batch_dataset" if sparse else "_tensor_dataset"
+        make_dataset = getattr(wrappers, name)
+
+        def recording_make_dataset(*args, **kwargs):
+            rows.append(kwargs.get("rows"))
+            return make_dataset(*args, **kwargs)
+
+        def batch_dataset(*args, **kwargs):
+            raise AssertionError("dense inputs were batched by a generator")
+
+        if not sparse:
+            monkeypatch.setattr(wrappers, "_batch_dataset", batch_dataset)
+        monkeypatch.setattr(wrappers, name, recording_make_dataset)
+        X = np.random.random((40, 4))
+        y = np.arange(40) % 8
+        if sparse:
+            X = sp.csr_matrix(X)
+        clf = KerasClassifier(
+            build_fn=dynamic_classifier,
+            max_one_hot_classes=4,
+            validation_split=0.25,
+            epochs=2,
+            verbose=0,
+        )
+        clf.fit(X, y)
+        assert len(clf.history_.history["val_loss"]) == 2
+        validation_rows, train_rows = rows
+        np.testing.assert_array_equal(train_rows, np.arange(30))
+        np.testing.assert_array_equal(validation_rows, np.arange(30, 40))
+
+    def test_few_classes_fit_with_arrays(self, monkeypatch):
+        """Below `max_one_hot_classes`, Keras gets numpy arrays."""
+
+        def batch_dataset(*args, **kwargs):
+            raise AssertionError("the target was one-hot encoded per batch")
+
+        monkeypatch.setattr(wrappers, "_batch_dataset", batch_dataset)
+        monkeypatch.setattr(wrappers, "_tensor_dataset", batch_dataset)
+        X = np.random.random((20, 4))
+        y = np.arange(20) % 4
+        clf = KerasClassifier(build_fn=dynamic_classifier, verbose=0)
+        clf.fit(X, y)
+        assert clf.predict_proba(X).shape == (20, 4)
+
+    def test_one_hot_dataset(self):
+        X = np.random.random((6, 2)).astype("float32")
+        y = (np.array([0, 2, 1, 2, 0, 1]), np.array([1, 0, 1, 0, 1, 0]))
+        dataset = wrappers._one_hot_dataset(
+            wrappers._batch_dataset(X, y, batch_size=4), {0: 3}
+        )
+        batches = list(dataset.as_numpy_iterator())
+        y0 = np.concatenate([batch[1][0] for batch in batches])
+        y1 = np.concatenate([batch[1][1] for batch in batches])
+        np.testing.assert_array_equal(y0, np.eye(3)[y[0]])
+        np.testing.assert_array_equal(y1, y[1])
+
+    @pytest.mark.parametrize("shuffle", [False, True])
+    @pytest.mark.parametrize("rows", [None, np.array([1, 3, 4, 6, 7])])
+    def test_tensor_dataset(self, shuffle, rows):
+        """Dense batches hold the selected rows of each array."""
+        X = [np.random.random((8, 2)), np.random.random((8, 3))]
+        y = np.arange(8)
+        sample_weight = np.arange(8) / 8
+        dataset = wrappers._tensor_dataset(
+            X, y, sample_weight, batch_size=3, shuffle=shuffle, rows=rows
+        )
+        batches = list(dataset.as_numpy_iterator())
+        expected = np.arange(8) if rows is None else rows
+        assert [len(batch[1]) for batch in batches] == [
+            min(3, len(expected) - start)
+            for start in range(0, len(expected), 3)
+        ]
+        y_seen = np.concatenate([batch[1] for batch in batches])
+        if shuffle:
+            y_seen = np.sort(y_seen)
+        np.testing.assert_array_equal(y_seen, expected)
+        for (X0, X1), y_, sw in batches:
+            np.testing.assert_array_equal(X0, X[0][y_])
+            np.testing.assert_array_equal(X1, X[1][y_])
+            np.testing.assert_array_equal(sw, sample_weight[y_])
+
+
+def build_fn_frozen_clf(X, n_classes_):
+    """Creates a classifier that does not learn, so that its validation loss
+    never improves.
+    """
+    inp = Input(shape=X.shape[1:])
+    out = Dense(n_classes_, activation="softmax")(inp)
+    model = Model([inp], [out])
+    model.compile(
+        optimizer=gradient_descent.SGD(learning_rate=0.0),
+        loss="sparse_categorical_crossentropy",
+    )
+    return model
+
+
+class FakeModel:
+    """Stands for a Keras model in callback tests."""
+
+    def __init__(self):
+        self.weights = [np.zeros(2)]
+        self.stop_training = False
+
+    def get_weights(self):
+        return [w.copy() for w in self.weights]
+
+    def set_weights(self, weights):
+        self.weights = weights
+
+
+class TestEarlyStopping:
+    """Tests stopping training on a held out validation fraction."""
+
+    def test_stops_after_n_iter_no_change(self):
+        X = np.random.random((60, 4))
+        y = np.arange(60) % 3
+        clf = KerasClassifier(
+            build_fn=build_fn_frozen_clf,
+            early_stopping=True,
+            n_iter_no_change=3,
+            epochs=50,
+            verbose=0,
+        )
+        clf.fit(X, y)
+        assert clf.best_epoch_ == 0
+        assert len(clf.history_.epoch) == 4
+        assert len(clf.history_.history["val_loss"]) == 4
+
+    @pytest.mark.parametrize("sparse", [False, True])
+    def test_fit(self, sparse):
+        X = np.random.random((50, 4))
+        y = np.arange(50) % 2
+        if sparse:
+            X = sp.csr_matrix(X)
+        clf = KerasClassifier(
+            build_fn=dynamic_classifier,
+            early_stopping=True,
+            validation_fraction=0.2,
+            epochs=5,
+            verbose=0,
+        )
+        clf.fit(X, y, sample_weight=np.ones(50))
+        assert 0 <= clf.best_epoch_ < 5
+        assert clf.predict(X).shape == (50,)
+
+    def test_regressor(self):
+        X, y = np.random.random((40, 3)), np.random.random(40)
+        reg = KerasRegressor(
+            build_fn=build_fn_regs, early_stopping=True, epochs=3, verbose=0
+        )
+        reg.fit(X, y)
+        assert 0 <= reg.best_epoch_ < 3
+
+    def test_stratified_split(self):
+        X = np.random.random((100, 4))
+        y = np.array([0] * 80 + [1] * 20)
+        clf = KerasClassifier(build_fn=dynamic_classifier, verbose=0)
+        clf.fit(X, y)
+        y_keras, _ = clf._pre_process_y(y)
+        train_rows, validation_rows = clf._validation_split(y_keras)
+        np.testing.assert_array_equal(
+            np.sort(np.concatenate([train_rows, validation_rows])),
+            np.arange(100),
+        )
+        assert np.all(np.diff(validation_rows) > 0)
+        np.testing.assert_array_equal(np.bincount(y[validation_rows]), [8, 2])
+
+    def test_batch_dataset_rows(self):
+        X = np.random.random((10, 2)).astype("float32")
+        y = np.arange(10)
+        rows = np.array([1, 4, 5, 8])
+        for shuffle in (False, True):
+            dataset = wrappers._batch_dataset(
+                X, y, batch_size=3, shuffle=shuffle, rows=rows
+            )
+            batches = list(dataset.as_numpy_iterator())
+            X_rows = np.concatenate([batch[0] for batch in batches])
+            y_rows = np.concatenate([batch[1] for batch in batches])
+            np.testing.assert_array_equal(X_rows, X[y_rows])
+            np.testing.assert_array_equal(np.sort(y_rows), rows)
+
+    def test_validation_split_conflict(self):
+        X, y = np.random.random((20, 4)), np.arange(20) % 2
+        clf = KerasClassifier(
+            build_fn=dynamic_classifier,
+            early_stopping=True,
+            validation_split=0.2,
+            verbose=0,
+        )
+        with pytest.raises(ValueError, match="early_stopping"):
+            clf.fit(X, y)
+
+    def test_callback_restores_best_weights(self):
+        stopper = wrappers._EarlyStopping(
+            n_iter_no_change=2, monitor="val_loss"
+        )
+        stopper.model = model = FakeModel()
+        stopper.on_train_begin()
+        for epoch, val_loss in enumerate([3.0, 1.0, 2.0, 1.5]):
+            model.weights = [np.full(2, epoch)]
+            stopper.on_epoch_end(epoch, {"val_loss": val_loss})
+            assert model.stop_training == (epoch == 3)
+        stopper.on_train_end()
+        assert stopper.best_epoch == 1
+        np.testing.assert_array_equal(model.weights[0], [1, 1])
+
+
+class TestMaxTime:
+    """Tests the wall-clock training budget."""
+
+    @pytest.mark.parametrize("method", ["fit", "partial_fit", "fit_stream"])
+    def test_truncates(self, method):
+        X = np.random.random((100, 4))
+        y = np.arange(100) % 3
+        clf = KerasClassifier(
+            build_fn=dynamic_classifier,
+            max_time=0,
+            epochs=50,
+            batch_size=10,
+            verbose=0,
+        )
+        if method == "fit_stream":
+            clf.fit_stream(iter_chunks(X, y, 30))
+        else:
+            getattr(clf, method)(X, y)
+        assert clf.history_.truncated
+        assert len(clf.history_.epoch) == 1
+        assert clf.best_epoch_ == 0
+        assert clf.predict(X).shape == (100,)
+
+    def test_within_budget(self):
+        X, y = np.random.random((20, 4)), np.arange(20) % 2
+        clf = KerasClassifier(
+            build_fn=dynamic_classifier, max_time=3600, epochs=3, verbose=0
+        )
+        clf.fit(X, y)
+        assert not clf.history_.truncated
+        assert len(clf.history_.epoch) == 3
+        assert not hasattr(clf, "best_epoch_")
+
+    def test_refit_resets(self):
+        """A later fit without budget does not report the previous one."""
+        X, y = np.random.random((20, 4)), np.arange(20) % 2
+        clf = KerasClassifier(
+            build_fn=dynamic_classifier,
+            max_time=0,
+            epochs=3,
+            batch_size=5,
+            verbose=0,
+        )
+        clf.fit(X, y)
+        assert clf.history_.truncated and clf.best_epoch_ == 0
+        clf.set_params(max_time=None)
+        clf.fit(X, y)
+        assert not clf.history_.truncated
+        assert not hasattr(clf, "best_epoch_")
+
+    def test_with_early_stopping(self):
+        X, y = np.random.random((60, 4)), np.arange(60) % 3
+        clf = KerasClassifier(
+            build_fn=build_fn_frozen_clf,
+            early_stopping=True,
+            max_time=0,
+            epochs=50,
+            verbose=0,
+        )
+        clf.fit(X, y)
+        assert clf.history_.truncated
+        assert len(clf.history_.history["val_loss"]) == 1
+
+    def test_callback_restores_best_weights(self):
+        stopper = wrappers._EarlyStopping(max_time=0)
+        stopper.model = model = FakeModel()
+        stopper.on_train_begin()
+        for epoch, loss in enumerate([2.0, 1.0, 3.0]):
+            model.weights = [np.full(2, epoch)]
+            stopper.on_epoch_end(epoch, {"loss": loss})
+        assert not model.stop_training
+        stopper.on_train_batch_end(0)
+        assert model.stop_training and stopper.truncated
+        stopper.on_train_end()
+        assert stopper.restored and stopper.best_epoch == 1
+        np.testing.assert_array_equal(model.weights[0], [1, 1])
+
+    def test_callback_keeps_weights_within_budget(self):
+        stopper = wrappers._EarlyStopping(max_time=3600)
+        stopper.model = model = FakeModel()
+        stopper.on_train_begin()
+        for epoch, loss in enumerate([1.0, 2.0]):
+            model.weights = [np.full(2, epoch)]
+            stopper.on_train_batch_end(0)
+            stopper.on_epoch_end(epoch, {"loss": loss})
+        stopper.on_train_end()
+        assert not model.stop_training and not stopper.restored
+        np.testing.assert_array_equal(model.weights[0], [1, 1])
+
+
+class TestPredictIter:
+    """Tests predicting one chunk at a time."""
+
+    @pytest.fixture
+    def clf(self):
+        X = np.random.random((30, 4))
+        clf = KerasClassifier(build_fn=dynamic_classifier, verbose=0)
+        return clf.fit(X, np.arange(30) % 3)
+
+    @pytest.mark.parametrize("n_samples", [25, 21])
+    def test_matches_predict(self, clf, n_samples):
+        X = np.random.random((n_samples, 4))
+        chunks = list(clf.predict_iter(X, chunk_size=10))
+        assert [len(chunk) for chunk in chunks] == [10, 10, n_samples - 20]
+        np.testing.assert_equal(np.concatenate(chunks), clf.predict(X))
+        proba = list(clf.predict_proba_iter(X, chunk_size=10))
+        assert proba[-1].shape == (n_samples - 20, 3)
+        np.testing.assert_allclose(
+            np.concatenate(proba), clf.predict_proba(X), rtol=1e-5
+        )
+
+    def test_regressor(self):
+        X, y = np.random.random((30, 3)), np.random.random(30)
+        reg = KerasRegressor(build_fn=build_fn_regs, verbose=0).fit(X, y)
+        chunks = list(reg.predict_iter(X, chunk_size=7))
+        assert len(chunks) == 5
+        np.testing.assert_allclose(
+            np.concatenate(chunks), reg.predict(X), rtol=1e-5
+        )
+
+    def test_chunk_iterator(self, clf):
+        X = np.random.random((25, 4))
+        chunks = (X[start : start + 8] for start in range(0, 25, 8))
+        y_pred = np.concatenate(list(clf.predict_iter(chunks)))
+        np.testing.assert_equal(y_pred, clf.predict(X))
+
+    def test_dataframe(self, clf):
+        """DataFrames are sliced by position, not iterated by column."""
+        pd = pytest.importorskip("pandas")
+        X = np.random.random((25, 4))
+        df = pd.DataFrame(X, index=np.arange(25)[::-1])
+        chunks = list(clf.predict_iter(df, chunk_size=10))
+        assert [len(chunk) for chunk in chunks] == [10, 10, 5]
+        np.testing.assert_equal(np.concatenate(chunks), clf.predict(X))
+
+    def test_list_of_samples(self, clf):
+        """Lists are sliced as samples, not treated as chunks."""
+        X = np.random.random((25, 4))
+        chunks = list(clf.predict_iter(X.tolist(), chunk_size=10))
+        assert [len(chunk) for chunk in chunks] == [10, 10, 5]
+        np.testing.assert_equal(np.concatenate(chunks), clf.predict(X))
+
+    def test_memmap_out(self, clf, tmp_path):
+        X = np.lib.format.open_memmap(
+            str(tmp_path / "X.npy"), mode="w+", dtype="float32", shape=(25, 4)
+        )
+        X[:] = np.random.random((25, 4))
+        out = np.lib.format.open_memmap(
+            str(tmp_path / "proba.npy"),
+            mode="w+",
+            dtype="float32",
+            shape=(25, 3),
+        )
+        for chunk in clf.predict_proba_iter(X, chunk_size=10, out=out):
+            assert np.shares_memory(chunk, out)
+        np.testing.assert_allclose(out, clf.predict_proba(X), rtol=1e-5)
+
+    def test_out_too_small(self, clf):
+        X = np.random.random((25, 4))
+        out = np.empty(20, dtype=int)
+        with pytest.raises(ValueError, match="out"):
+            list(clf.predict_iter(X, chunk_size=10, out=out))
+
+    def test_bounded_chunks(self, clf, monkeypatch):
+        """The Keras model never sees more than `chunk_size` samples."""
+        sizes = []
+        predict_raw = clf._predict_raw
+
+        def recording_predict_raw(X, **kwargs):
+            sizes.append(X.shape[0])
+            return predict_raw(X, **kwargs)
+
+        monkeypatch.setattr(clf, "_predict_raw", recording_predict_raw)
+        clf.memoize_predictions = True
+        list(clf.predict_iter(np.random.random((100, 4)), chunk_size=30))
+        assert sizes == [30, 30, 30, 10]
+        assert clf not in wrappers._PREDICT_MEMO
+
+
+class TestPredictWithProba:
+    """Tests sharing a single forward pass between prediction methods."""
+
+    @staticmethod
+    def count_predict_calls(estimator):
+        """Wraps `estimator.model_.predict` to count its calls."""
+        # always use `model_.predict`
+        estimator.fast_predict_max_samples = 0
+        calls = []
+        predict = estimator.model_.predict
+
+        def counting_predict(*args, **kwargs):
+            calls.append(1)
+            return predict(*args, **kwargs)
+
+        estimator.model_.predict = counting_predict
+        return calls
+
+    @pytest.mark.parametrize(
+        "y",
+        [
+            np.array([0, 1] * 10),
+            np.array(["a", "b", "c", "d"] * 5),
+            np.array([[0, 1], [1, 0], [1, 2], [2, 0]] * 5),
+        ],
+    )
+    def test_matches_predict(self, y):
+        """`predict_with_proba` returns the same arrays as `predict` and
+        `predict_proba`, with a single call to the Keras model."""
+        X = np.random.random((20, 4))
+        clf = KerasClassifier(build_fn=dynamic_classifier, verbose=0)
+        clf.fit(X, y)
+        calls = self.count_predict_calls(clf)
+        y_pred, proba = clf.predict_with_proba(X)
+        assert len(calls) == 1
+        np.testing.assert_equal(y_pred, clf.predict(X))
+        np.testing.assert_allclose(proba, clf.predict_proba(X))
+
+    def test_memo(self):
+        """With `memoize_predictions`, `score`, `predict` and `predict_proba`
+        share the outputs of the Keras model until the next `fit`."""
+        X = np.random.random((20, 4))
+        y = np.array([0, 1, 2, 3] * 5)
+        clf = KerasClassifier(
+            build_fn=dynamic_classifier, memoize_predictions=True, verbose=0
+        )
+        clf.fit(X, y)
+        calls = self.count_predict_calls(clf)
+        y_pred = clf.predict(X)
+        proba = clf.predict_proba(X)
+        clf.score(X, y)
+        assert len(calls) == 1
+        # returned arrays are copies of the memo
+        y_pred[:] = 0
+        proba[:] = 0
+        assert proba.shape == (20, 4)
+        assert clf.predict_proba(X).sum() > 0
+        assert len(calls) == 1
+        # new inputs are computed
+        clf.predict(X[:10])
+        assert len(calls) == 2
+        # fitting invalidates the memo
+        clf.fit(X, y)
+        calls = self.count_predict_calls(clf)
+        clf.predict(X[:10])
+        assert len(calls) == 1
+
+    def test_no_memo_by_default(self):
+        """Without `memoize_predictions`, every call runs the network."""
+        X = np.random.random((10, INPUT_DIM))
+        y = np.random.random((10, 2))
+        reg = FunctionAPIMultiOutputRegressor(verbose=0)
+        reg.fit(X, y)
+        calls = self.count_predict_calls(reg)
+        reg.predict(X)
+        reg.score(X, y)
+        assert len(calls) == 2
+
+
+@pytest.mark.skipif(
+    pickle.HIGHEST_PROTOCOL < 5, reason="requires pickle protocol 5"
+)
+class TestPickleProtocol5:
+    """Tests pickling with out-of-band weight buffers."""
+
+    def test_out_of_band(self):
+        """Weights are passed out-of-band and the estimator is restored."""
+        X = np.random.random((20, 4))
+        y = np.array([0, 1, 2, 3] * 5)
+        clf = KerasClassifier(build_fn=dynamic_classifier, verbose=0)
+        clf.fit(X, y)
+        weights = clf.model_.get_weights()
+        buffers = []
+        data = pickle.dumps(clf, protocol=5, buffer_callback=buffers.append)
+        weight_bytes = sum(w.nbytes for w in weights)
+        assert sum(b.raw().nbytes for b in buffers) >= weight_bytes
+        assert len(data) < weight_bytes
+        # the original estimator is not modified
+        assert isinstance(clf.history_.model, Model)
+        new_clf = pickle.loads(data, buffers=buffers)
+        for w_old, w_new in zip(weights, new_clf.model_.get_weights()):
+            np.testing.assert_array_equal(w_old, w_new)
+        np.testing.assert_array_equal(new_clf.predict(X), clf.predict(X))
+
+    def test_in_band(self):
+        """Without `buffer_callback`, weights are pickled in-band."""
+        X = np.random.random((10, INPUT_DIM))
+        y = np.random.random((10, 2))
+        reg = FunctionAPIMultiOutputRegressor(verbose=0)
+        reg.fit(X, y)
+        new_reg = pickle.loads(pickle.dumps(reg, protocol=5))
+        np.testing.assert_allclose(new_reg.predict(X), reg.predict(X))
+
+
+class TestWeightStore:
+    """Tests saving estimators to a manifest and weight files."""
+
+    def test_roundtrip(self, tmp_path):
+        """The loaded estimator predicts like the saved one and its history
+        refers to the loaded model."""
+        X = np.random.random((20, 4))
+        y = np.array(["a", "b", "c", "d"] * 5)
+        clf = KerasClassifier(build_fn=dynamic_classifier, verbose=0)
+        clf.fit(X, y)
+        wrappers.save_estimator(clf, str(tmp_path))
+        assert (tmp_path / wrappers.MANIFEST_FILE).exists()
+        assert len(list(tmp_path.glob("model_0/*.npy"))) == len(
+            clf.model_.get_weights()
+        )
+        assert isinstance(clf.history_.model, Model)
+        new_clf = wrappers.load_estimator(str(tmp_path))
+        assert isinstance(new_clf, KerasClassifier)
+        assert new_clf.history_.model is new_clf.model_
+        np.testing.assert_array_equal(new_clf.classes_, clf.classes_)
+        np.testing.assert_array_equal(new_clf.predict(X), clf.predict(X))
+        new_clf.partial_fit(X, y)
+
+    def test_unsupported_format(self, tmp_path):
+        """Unknown format versions are rejected."""
+        reg = KerasRegressor(build_fn=build_fn_tiny_reg)
+        wrappers.save_estimator(reg, str(tmp_path))
+        (tmp_path / wrappers.MANIFEST_FILE).write_text(
+            '{"format_version": 0, "models": []}'
+        )
+        with pytest.raises(ValueError, match="format version"):
+            wrappers.load_estimator(str(tmp_path))
+
+
+class TestFastPredict:
+    """Tests the low-latency predict path for small inputs."""
+
+    @pytest.mark.parametrize(
+        "estimator, y",
+        [
+            (
+                KerasClassifier(build_fn=dynamic_classifier, verbose=0),
+                np.array(["a", "b", "c"] * 10),
+            ),
+            (FunctionalAPIMultiInputClassifier(), np.array([0, 1, 2] * 10)),
+            (
+                FunctionalAPIMultiOutputClassifier(),
+                np.array([[0, 1], [1, 2], [1, 0]] * 10),
+            ),
+            (FunctionAPIMultiOutputRegressor(), np.random.random((30, 2))),
+        ],
+    )
+    def test_matches_predict(self, estimator, y):
+        """The fast path is used for small inputs and matches
+        `model_.predict`."""
+        n_features = INPUT_DIM if isinstance(estimator, KerasRegressor) else 4
+        X = np.random.random((30, n_features)).astype("float32")
+        estimator.fit(X, y)
+        calls = []
+        predict = estimator.model_.predict
+
+        def counting_predict(*args, **kwargs):
+            calls.append(1)
+            return predict(*args, **kwargs)
+
+        estimator.model_.predict = counting_predict
+        fast = estimator.predict(X[:8])
+        assert not calls
+        estimator.fast_predict_max_samples = 4
+        slow = estimator.predict(X[:8])
+        assert len(calls) == 1
+        if isinstance(estimator, KerasRegressor):
+            np.testing.assert_allclose(fast, slow, rtol=1e-5)
+        else:
+            np.testing.assert_array_equal(fast, slow)
+
+    def test_refit(self):
+        """The traced function follows the model rebuilt by `fit`, and
+        callbacks force `model_.predict`."""
+        X = np.random.random((20, 3))
+        y = np.random.random((20,))
+        reg = KerasRegressor(
+            build_fn=build_fn_units_reg, units=4, epochs=1, verbose=0
+        )
+        reg.fit(X, y)
+        reg.predict(X[:1])
+        reg.fit(X, y)
+        np.testing.assert_allclose(
+            reg.predict(X[:5]), reg.model_.predict(X[:5])[:, 0], rtol=1e-5
+        )
+        predict_batches = []
+        callback = keras.callbacks.LambdaCallback(
+            on_predict_batch_end=lambda batch, logs: predict_batches.append(1)
+        )
+        reg.predict(X[:5], callbacks=[callback])
+        assert predict_batches
+
+    def test_overridden_predict_step(self):
+        """Models customizing `predict_step` are not bypassed."""
+
+        class ShiftedSequential(Sequential):
+            def predict_step(self, data):
+                return super().predict_step(data) + 1.0
+
+        def build_fn(X):
+            model = ShiftedSequential([Dense(1, input_shape=X.shape[1:])])
+            model.compile("sgd", loss="mean_squared_error")
+            return model
+
+        X, y = np.random.random((20, 3)), np.random.random((20,))
+        reg = KerasRegressor(build_fn=build_fn, epochs=1, verbose=0)
+        reg.fit(X, y)
+        assert wrappers._overrides_predict(reg.model_)
+        np.testing.assert_allclose(
+            reg.predict(X[:5]),
+            reg.model_(X[:5]).numpy()[:, 0] + 1.0,
+            rtol=1e-5,
+        )
+        assert reg not in wrappers._FAST_PREDICT_FNS
+
+    def test_kwargs_use_model_predict(self, monkeypatch):
+        """Arguments passed to `predict` are not dropped by the fast path."""
+        X, y = np.random.random((20, 3)), np.random.random((20,))
+        reg = KerasRegressor(
+            build_fn=build_fn_units_reg, units=4, epochs=1, verbose=0
+        )
+        reg.fit(X, y)
+        calls = []
+        predict_fast = reg._predict_fast
+
+        def recording_predict_fast(X):
+            calls.append(1)
+            return predict_fast(X)
+
+        monkeypatch.setattr(reg, "_predict_fast", recording_predict_fast)
+        reg.predict(X[:5])
+        assert len(calls) == 1
+        np.testing.assert_allclose(
+            reg.predict(X[:5], batch_size=2),
+            reg.model_.predict(X[:5])[:, 0],
+            rtol=1e-5,
+        )
+        assert len(calls) == 1